@@ -1,9 +1,9 @@
 import logging
 import os
 from os.path import basename, join, splitext, isdir, exists, dirname
-from utils import cwd, copyfile, system_cmd, system_cmd_wait, copydir, mkdir, relpathshort, prompt_input_default
+from utils import cwd, system_cmd, system_cmd_wait, mkdir, relpathshort, prompt_input_default, parse_memory, parse_duration, hashlist
+from abaci.ContentStore import ContentStore
 import abaci.abaqus as abq
-from abaci.config import get_default_cluster_schema
 from datetime import datetime
 from exceptions import ValueError
 import cPickle as pkl
@@ -30,21 +30,37 @@ class AbaqusJob:
                 self.name = splitext(basename(self.job_file))[0]
             
             self.checks = job['check']
+            self.extract = job['extract']
             self.postprocess = job['post-process']
             self.mp_mode = job['mp-mode']
+            self.cpus = job['cpus']
+            self.memory = parse_memory(job['memory'])
+            self.watchdog = None
             self.cluster = job['cluster']
             self.abq_flags = job['abq-flags']
 
+            if job['watchdog']:
+
+                self.watchdog = dict(job['watchdog'])
+                self.watchdog['max-time'] = parse_duration(self.watchdog['max-time'])
+                self.watchdog['stall-time'] = parse_duration(self.watchdog['stall-time'])
+
         else:
 
+            from abaci.config import get_default_cluster_schema
+
             cluster_schema, cluster_defaults = get_default_cluster_schema()
 
             self.name = basename(job_file)
             self.include =[]
             self.job_file = job_file
             self.checks = None
+            self.extract = None
             self.postprocess = None
             self.mp_mode = 'threads'
+            self.cpus = None
+            self.memory = None
+            self.watchdog = None
             self.cluster = cluster_defaults
             self.abq_flags = []
 
@@ -56,6 +72,7 @@ class AbaqusJob:
             self.include.remove(self.job_file)
 
         self.job_dir = self.get_new_job_dir(output_dir)
+        self.store_dir = join(output_dir,'store')
 
         self.local_job_file = join(self.job_dir,basename(self.job_file))
         self.cache_file = join(self.job_dir,'abaci-cache.pkl')
@@ -63,8 +80,8 @@ class AbaqusJob:
         self.start_time = None
         self.end_time = None
         self.job_script = None
-        self.ofile_handle = None
-        self.efile_handle = None
+        self.ofile = None
+        self.efile = None
         self.nproc = None
 
     def get_new_job_dir(self,output_dir):
@@ -80,30 +97,62 @@ class AbaqusJob:
         return stem.format(counter=counter)
 
 
-    def launch_job(self,nproc,lib_dir):
-        """Launch job"""
+    def get_history_key(self,nproc):
+        """Key identifying this job in the job runtime history"""
+
+        store = ContentStore(self.store_dir)
+
+        digest = hashlist([store.digest(f) for f in [self.job_file]+sorted(self.include)])
+
+        store.save()
+
+        return (self.name, digest, nproc)
+
+
+    def get_cpus(self,nproc):
+        """Number of CPUs used by this job, given the default number of processors"""
+
+        if self.mp_mode == 'disable':
+
+            return 1
+
+        return self.cpus or nproc
+
+
+    def launch_job(self,nproc,lib_dir,cpu_list=None):
+        """Launch job, optionally pinned to the CPU cores in cpu_list"""
 
         log = logging.getLogger('abaci')
 
         self.nproc = nproc
-        
-        self.prepare_job(lib_dir)
+
+        if exists(self.cache_file):
+
+            # (Already prepared by abaci submit --bundle)
+            self.save_cache()
+
+        else:
+
+            self.prepare_job(lib_dir)
         
         log.info('Launching abaqus for job "%s"',self.name)
 
+        if cpu_list:
+            log.debug('Pinning job "%s" to cores %s',self.name,cpu_list)
+
         self.start_time = datetime.now()
 
         self.p, self.ofile, self.efile = abq.run(dir=self.job_dir,
                                           job_name=self.local_job_name,
                                           abq_flags=self.abq_flags,
                                           mp_mode=self.mp_mode,
-                                          nproc=nproc)
+                                          nproc=nproc,
+                                          cpu_list=cpu_list)
 
 
-    def poll(self, screen_output=None):
+    def poll(self):
         """
-        Check if job is currently running, dump latest output if requested,
-        and record end time at completion.
+        Check if job is currently running and record end time at completion.
         (The resolution of recorded end time is how frequently you call this function)
         """
 
@@ -112,31 +161,6 @@ class AbaqusJob:
         is_running = not isinstance(self.p.poll(),int)
 
         has_started = self.start_time
-
-        if has_started and not self.ofile_handle:
-
-            self.ofile_handle = open(self.ofile,'r')
-
-        if has_started and not self.efile_handle:
-
-            self.efile_handle = open(self.efile,'r')
-
-        # Print latest output from stdout & stderr logs
-        if has_started and screen_output:
-
-            for handle in [self.ofile_handle, self.efile_handle]:
-
-                while True:
-
-                    line = handle.readline()
-
-                    if line:
-
-                        print line.strip()
-
-                    else:
-
-                        break
         
         # Record end time
         if has_started and (not is_running) and \
@@ -152,6 +176,22 @@ class AbaqusJob:
         return is_running
 
 
+    def get_output_files(self):
+        """List the files that Abaqus writes progress and messages to while the job runs"""
+
+        files = [f for f in [self.ofile, self.efile] if f]
+
+        files.extend(join(self.job_dir,self.local_job_name+ext) for ext in ['.sta','.msg','.dat'])
+
+        return files
+
+
+    def get_sta_file(self):
+        """Get the path of the status file written by Abaqus"""
+
+        return join(self.job_dir,self.local_job_name+'.sta')
+
+
     def wait(self,verbose):
         """Wait for the running Abaqus job to finish"""
 
@@ -238,6 +278,26 @@ class AbaqusJob:
 
         self.job_script = join(self.job_dir,'sljob')
 
+        nproc = self.get_cluster_nproc()
+
+        if self.mp_mode == 'mpi':
+
+            cmd = abq.get_mpi_job_allocation_cmd()
+
+        else:
+
+            cmd = []
+
+
+        cmd.append(' '.join(abq.get_run_cmd(self.local_job_name,self.abq_flags,self.mp_mode,nproc)))
+
+        slurm.spool_job_script(self.job_script,env_modules,cmd,job_name=self.local_job_name,
+                               **self.get_sbatch_options())
+
+
+    def get_cluster_nproc(self):
+        """Apply the mp_mode to the cluster settings and get the number of processors they give"""
+
         if self.mp_mode == 'threads':
 
             self.cluster['tasks-per-node'] = 1
@@ -253,33 +313,24 @@ class AbaqusJob:
             self.cluster['nodes'] = 1
             self.cluster['cpus-per-task'] = 1
 
-        nproc = self.cluster['tasks-per-node'] * self.cluster['cpus-per-task'] * self.cluster['nodes']
+        return self.cluster['tasks-per-node'] * self.cluster['cpus-per-task'] * self.cluster['nodes']
 
-        if self.mp_mode == 'mpi':
 
-            cmd = abq.get_mpi_job_allocation_cmd()
+    def get_sbatch_options(self):
+        """Get the SLURM options for this job's cluster settings (see slurm.spool_job_script)"""
 
-        else:
-
-            cmd = []
-
-
-        cmd.append(' '.join(abq.get_run_cmd(self.local_job_name,self.abq_flags,self.mp_mode,nproc)))
-
-        slurm.spool_job_script(self.job_script,env_modules,cmd,job_name=self.local_job_name,
-                               time=self.cluster['time'],
-                               nodes=self.cluster['nodes'],
-                               partition=self.cluster['partition'],
-                               tasks_per_node=self.cluster['tasks-per-node'],
-                               cpus_per_task=self.cluster['cpus-per-task'],
-                               mem_per_cpu=self.cluster['mem-per-cpu'],
-                               email=self.cluster['email'],
-                               account=self.cluster['account']
-                               )
+        return {'time': self.cluster['time'],
+                'nodes': self.cluster['nodes'],
+                'partition': self.cluster['partition'],
+                'tasks_per_node': self.cluster['tasks-per-node'],
+                'cpus_per_task': self.cluster['cpus-per-task'],
+                'mem_per_cpu': self.cluster['mem-per-cpu'],
+                'email': self.cluster['email'],
+                'account': self.cluster['account']}
 
 
     def prepare_job(self,lib_dir):
-        """Create job directory and copy job files into it"""
+        """Create job directory and stage job files into it (via the content store)"""
 
         log = logging.getLogger('abaci')
 
@@ -287,19 +338,28 @@ class AbaqusJob:
 
         mkdir(self.job_dir)
 
-        copyfile(self.job_file,self.local_job_file)
+        store = ContentStore(self.store_dir)
+
+        store.stage_file(self.job_file,self.local_job_file)
 
         for inc in self.include:
             dest = join(self.job_dir,basename(inc))
-            copyfile(inc,dest)
+            store.stage_file(inc,dest)
 
         local_lib_dir = join(self.job_dir,'lib')
 
-        copydir(lib_dir,local_lib_dir)
+        store.stage_dir(lib_dir,local_lib_dir)
+
+        store.save()
 
         self.spool_env_file(local_lib_dir)
 
-        # Cache full job info to file for post-processing subcommand
+        self.save_cache()
+
+
+    def save_cache(self):
+        """Cache full job info to file for post-processing subcommand"""
+
         with open(self.cache_file,'w') as f:
             pkl.dump(self,f)
 
@@ -319,15 +379,73 @@ class AbaqusJob:
         return "AbaqusJob({name})".format(name=self.name)
 
 
+    def get_extract_config(self):
+        """Get the steps, frames, fields and elements to save in the field cache (defaults to the checks)"""
+
+        # (Jobs cached by older versions of abaci have no extract attribute)
+        extract = getattr(self,'extract',None)
+
+        if extract:
+
+            return extract
+
+        if self.checks:
+
+            return dict((key, self.checks[key]) for key in ('steps','fields','frames','elements'))
+
+        return None
+
+
+    def get_field_cache_file(self):
+        """Get the path of the field cache (a memory-mappable reference directory)"""
+
+        return join(self.job_dir,self.local_job_name+'-fields')
+
+
+    def extract_fields(self):
+        """Extract fields from the job odb into the field cache, if not already done"""
+
+        from odb_check import dump_ref
+        from shutil import rmtree
+
+        log = logging.getLogger('abaci')
+
+        extract = self.get_extract_config()
+
+        if not extract:
+            return
+
+        odb_out_file = join(self.job_dir,self.local_job_name+'.odb')
+        cache_file = self.get_field_cache_file()
+
+        if not exists(odb_out_file):
+            return
+
+        if exists(join(cache_file,'index.json')):
+
+            log.debug('Using existing field cache for job "%s"',self.name)
+
+            return
+
+        # (An incomplete cache from an interrupted extraction)
+        if exists(cache_file):
+            rmtree(cache_file)
+
+        log.info('Extracting fields for job "%s"',self.name)
+
+        dump_ref(cache_file,odb_out_file,self.name,extract)
+
+
     def run_checks(self):
-        """Run reference checks"""
+        """Run reference checks, returns False if any check failed"""
         
-        from odb_check import compare_odb, dump_ref
+        from odb_check import compare_odb, compare_field_cache, cache_covers_checks, dump_ref
+        from check_results import write_check_reports
 
         log = logging.getLogger('abaci')
 
         if not self.checks:
-            return
+            return True
 
         log.debug('Running regression checks for job "%s"', self.name)
 
@@ -338,18 +456,44 @@ class AbaqusJob:
             
             log.warn('Unable to find odb file (%s) for job "%s"',odb_out_file,self.name)
 
-            return
+            return True
 
         if not exists(odb_ref_file):
 
-            log.info('Reference file (%s) for job "%s" not found: creating from this run',
+            # (Reported as skipped rather than passed, so that a mistyped reference path is noticed)
+            log.warning('(!) Reference file (%s) for job "%s" not found: creating from this run, checks skipped',
                       odb_ref_file, self.name)
 
             dump_ref(odb_ref_file,odb_out_file,self.name,self.checks)
 
-            return
+            write_check_reports(self.job_dir,self.name,odb_ref_file,[],reference_created=True)
+
+            return True
 
-        compare_odb(odb_ref_file,odb_out_file,self.name,self.checks)
+        cache_file = self.get_field_cache_file()
+
+        if exists(cache_file) and cache_covers_checks(self.get_extract_config(),self.checks):
+
+            results = compare_field_cache(odb_ref_file,cache_file,self.name,self.checks)
+
+        else:
+
+            results = compare_odb(odb_ref_file,odb_out_file,self.name,self.checks)
+
+        write_check_reports(self.job_dir,self.name,odb_ref_file,results)
+
+        nfail = sum(1 for r in results if not r['passed'])
+
+        if nfail:
+
+            log.error('(!) Regression checks failed for job "%s" (%s of %s fields out of tolerance)',
+                       self.name, nfail, len(results))
+
+            return False
+
+        log.info('Regression checks passed for job "%s"',self.name)
+
+        return True
 
 
     def post_process(self,verbosity):
@@ -371,6 +515,12 @@ class AbaqusJob:
 
             ref = ''
 
+        cache_file = self.get_field_cache_file()
+
+        if not exists(cache_file):
+
+            cache_file = ''
+
         for cmd in self.postprocess:
 
             post_cmd = cmd.format(
@@ -379,6 +529,7 @@ class AbaqusJob:
                 ODB=join(self.job_dir,self.local_job_name+'.odb'),
                 DIR=self.job_dir,
                 REF=ref,
+                CACHE=cache_file,
                 NAME=self.name
             )
 
@@ -0,0 +1,155 @@
+import os
+import errno
+import select
+import signal
+import threading
+
+
+class ChildWatcher:
+    """
+    Block until a launched child process exits, without busy-polling.
+
+    On POSIX systems a SIGCHLD handler is installed and the signal module's
+    wakeup fd is pointed at a self-pipe which is then waited on with select.
+    On Windows (no SIGCHLD) each watched process is waited on by a helper
+    thread which sets an event when the process exits.
+    """
+
+    def __init__(self):
+        """Constructor"""
+
+        self.wakeup_r = None
+        self.wakeup_w = None
+        self.old_handler = None
+        self.old_wakeup_fd = None
+        self.exited = threading.Event()
+
+
+    def __enter__(self):
+
+        self.start()
+
+        return self
+
+
+    def __exit__(self, exc_type, exc_value, traceback):
+
+        self.stop()
+
+
+    def start(self):
+        """Install the SIGCHLD handler and self-pipe"""
+
+        if os.name == 'nt':
+            return
+
+        import fcntl
+
+        self.wakeup_r, self.wakeup_w = os.pipe()
+
+        for fd in (self.wakeup_r, self.wakeup_w):
+
+            flags = fcntl.fcntl(fd, fcntl.F_GETFL)
+            fcntl.fcntl(fd, fcntl.F_SETFL, flags | os.O_NONBLOCK)
+
+        self.old_handler = signal.signal(signal.SIGCHLD, self.handle_sigchld)
+
+        # Don't interrupt system calls elsewhere (e.g. file reads)
+        signal.siginterrupt(signal.SIGCHLD, False)
+
+        self.old_wakeup_fd = signal.set_wakeup_fd(self.wakeup_w)
+
+
+    def stop(self):
+        """Restore the previous SIGCHLD handler and close the self-pipe"""
+
+        if self.wakeup_r is None:
+            return
+
+        signal.set_wakeup_fd(self.old_wakeup_fd)
+
+        if self.old_handler is None:
+            self.old_handler = signal.SIG_DFL
+
+        signal.signal(signal.SIGCHLD, self.old_handler)
+
+        os.close(self.wakeup_r)
+        os.close(self.wakeup_w)
+
+        self.wakeup_r = None
+        self.wakeup_w = None
+
+
+    def handle_sigchld(self, signum, frame):
+        """Nothing to do: the wakeup fd is written to by the interpreter"""
+
+        pass
+
+
+    def watch(self, process):
+        """Register a newly launched process (subprocess.Popen) with the watcher"""
+
+        if os.name != 'nt':
+            return
+
+        def wait_for_process():
+            process.wait()
+            self.exited.set()
+
+        t = threading.Thread(target=wait_for_process)
+        t.daemon = True
+        t.start()
+
+
+    def wait(self, timeout=None, fds=None):
+        """
+        Block until a child process exits, any of fds is readable or
+        timeout (seconds) elapses, whichever happens first.
+        Spurious wakeups are possible: callers should poll their processes afterwards.
+        """
+
+        if os.name == 'nt':
+
+            # (A timeout is needed to keep the wait interruptible on Python 2)
+            self.exited.wait(timeout or 1.0)
+            self.exited.clear()
+
+            return
+
+        rlist = [self.wakeup_r]
+
+        if fds:
+            rlist.extend(fds)
+
+        try:
+
+            ready, _, _ = select.select(rlist, [], [], timeout)
+
+        except select.error as e:
+
+            if e.args[0] != errno.EINTR:
+                raise
+
+            ready = [self.wakeup_r]
+
+        if self.wakeup_r in ready:
+
+            self.drain()
+
+
+    def drain(self):
+        """Empty the self-pipe"""
+
+        while True:
+
+            try:
+
+                if not os.read(self.wakeup_r, 512):
+                    break
+
+            except OSError as e:
+
+                if e.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+                    break
+
+                raise
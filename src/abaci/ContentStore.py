@@ -0,0 +1,237 @@
+import os
+import stat
+import time
+import logging
+import tempfile
+import cPickle as pkl
+from shutil import copyfile
+from os.path import join, isfile, isdir, exists
+from abaci.utils import hashfile, mkdir, relpathshort
+
+# Minimum age (seconds) of unreferenced objects before they are pruned
+# (so that objects just added by a concurrent abaci process are not removed before they are linked)
+_PRUNE_AGE = 3600
+
+
+class ContentStore:
+    """
+    Content-addressed file store used to stage job files cheaply.
+
+    Each unique file is copied into the store once (named by its SHA1 digest)
+    and then hardlinked into job directories. Stored objects are read-only,
+    since every job directory shares them. Where hardlinks aren't available
+    (or on Windows, where read-only files can't be deleted by rmtree) files
+    are copied instead. File digests are cached against file size and
+    modification time so that unchanged files are not re-hashed.
+    Objects no longer linked from any job directory are removed by prune.
+    """
+
+    def __init__(self,store_dir):
+        """Constructor"""
+
+        self.store_dir = store_dir
+        self.index_file = join(store_dir,'index.pkl')
+
+        mkdir(store_dir)
+
+        if isfile(self.index_file):
+
+            with open(self.index_file,'rb') as f:
+                self.index = pkl.load(f)
+
+        else:
+
+            self.index = {}
+
+        self.modified = False
+
+
+    def save(self):
+        """Write the digest index to file if it has changed"""
+
+        if not self.modified:
+            return
+
+        # (A unique temporary file, since other abaci processes may share the store)
+        fh, tmp_file = tempfile.mkstemp(dir=self.store_dir,suffix='.tmp')
+
+        with os.fdopen(fh,'wb') as f:
+            pkl.dump(self.index,f,pkl.HIGHEST_PROTOCOL)
+
+        if os.name == 'nt' and exists(self.index_file):
+            os.remove(self.index_file)
+
+        os.rename(tmp_file,self.index_file)
+
+        self.modified = False
+
+
+    def digest(self,path):
+        """Get the SHA1 digest of a file, using the cached value if unchanged"""
+
+        path = os.path.realpath(path)
+
+        st = os.stat(path)
+
+        entry = self.index.get(path)
+
+        if entry and entry[0] == st.st_size and entry[1] == st.st_mtime:
+
+            return entry[2]
+
+        digest = hashfile(path)
+
+        self.index[path] = (st.st_size, st.st_mtime, digest)
+        self.modified = True
+
+        return digest
+
+
+    def add(self,path):
+        """Add a file to the store (if not already present) and return its path in the store"""
+
+        log = logging.getLogger('abaci')
+
+        digest = self.digest(path)
+
+        obj_dir = join(self.store_dir,digest[0:2])
+        obj_file = join(obj_dir,digest)
+
+        if not exists(obj_file):
+
+            log.debug('Adding "%s" to file store',relpathshort(path))
+
+            mkdir(obj_dir)
+
+            # Copy to a unique temporary file then rename, so that a partial copy is never
+            #  used, even if another abaci process is adding the same file
+            fh, tmp_file = tempfile.mkstemp(dir=obj_dir,suffix='.tmp')
+
+            os.close(fh)
+
+            copyfile(path,tmp_file)
+
+            # Objects are shared between job directories so make them read-only
+            os.chmod(tmp_file,stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
+
+            if os.name == 'nt' and exists(obj_file):
+
+                os.chmod(tmp_file,stat.S_IWRITE)
+                os.remove(tmp_file)
+
+            else:
+
+                os.rename(tmp_file,obj_file)
+
+        return obj_file
+
+
+    def stage_file(self,source,dest):
+        """Stage a single file at dest via the store"""
+
+        obj_file = self.add(source)
+
+        if exists(dest) or os.path.islink(dest):
+            os.remove(dest)
+
+        # (Copies are writable, unlike the shared objects)
+        if os.name == 'nt' or not hasattr(os,'link'):
+
+            copyfile(obj_file,dest)
+
+            return
+
+        try:
+
+            os.link(obj_file,dest)
+
+        except OSError:
+
+            # (e.g. the store is on a different filesystem)
+            copyfile(obj_file,dest)
+
+
+    def stage_dir(self,source,dest):
+        """Stage the contents of a directory (recursively) at dest via the store"""
+
+        mkdir(dest)
+
+        for item in sorted(os.listdir(source)):
+
+            src_item = join(source,item)
+            dest_item = join(dest,item)
+
+            if isdir(src_item):
+
+                self.stage_dir(src_item,dest_item)
+
+            else:
+
+                self.stage_file(src_item,dest_item)
+
+
+    def prune(self,min_age=_PRUNE_AGE):
+        """
+        Remove objects which are no longer linked from any job directory (e.g. after
+        old job directories have been deleted) and digests of files that no longer exist
+
+        Returns the number of objects removed.
+        """
+
+        log = logging.getLogger('abaci')
+
+        now = time.time()
+
+        removed = 0
+
+        for obj_dir in sorted(os.listdir(self.store_dir)):
+
+            obj_dir = join(self.store_dir,obj_dir)
+
+            if not isdir(obj_dir):
+                continue
+
+            for obj in os.listdir(obj_dir):
+
+                obj_file = join(obj_dir,obj)
+
+                try:
+                    st = os.stat(obj_file)
+                except OSError:
+                    continue
+
+                # (Linking an object updates its ctime)
+                if st.st_nlink > 1 or now - max(st.st_mtime,st.st_ctime) < min_age:
+                    continue
+
+                log.debug('Removing unused object "%s" from file store',obj)
+
+                try:
+
+                    os.chmod(obj_file,stat.S_IWRITE | stat.S_IRUSR)
+                    os.remove(obj_file)
+
+                except OSError:
+
+                    # (Already removed by another abaci process)
+                    continue
+
+                removed = removed + 1
+
+            try:
+
+                if not os.listdir(obj_dir):
+                    os.rmdir(obj_dir)
+
+            except OSError:
+                pass
+
+        for path in [path for path in self.index if not exists(path)]:
+
+            del self.index[path]
+
+            self.modified = True
+
+        self.save()
+
+        return removed
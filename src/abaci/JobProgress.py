@@ -0,0 +1,499 @@
+import re
+import os
+import sys
+import time
+import threading
+
+# Interval (seconds) between printing the progress table
+_DISPLAY_INTERVAL = 10
+
+# Time (seconds) without a new increment after which a job is shown as stalled
+_STALL_TIME = 300
+
+# Abaqus/Standard increment: step, increment, attempt(U), severe discon. iters, equil. iters,
+#  total iters, total time, step time, increment size (attempted, for cut back attempts)
+_STANDARD_INC = re.compile(r'^\s*(\d+)\s+(\d+)\s+(\d+)(U?)\s+\d+\s+\d+\s+\d+\s+(\S+)\s+(\S+)\s+(\S+)')
+
+# Abaqus/Explicit increment: increment, step time, total time, cpu time, stable increment
+_EXPLICIT_INC = re.compile(r'^\s*(\d+)\s+(\S+)\s+(\S+)\s+\d+:\d\d:\d\d\s+(\S+)')
+
+_EXPLICIT_STEP = re.compile(r'^\s*STEP\s+(\d+)\s+ORIGIN')
+
+# Procedure keywords whose second data line value is the step time period
+_PROCEDURES = ['*static', '*visco', '*dynamic', '*heat transfer', '*coupled temperature-displacement',
+               '*coupled thermal-electric', '*soils', '*mass diffusion']
+
+
+class StaProgress:
+    """
+    Incrementally parse the status (.sta) file of a running Abaqus job,
+    reading only the output added since the last update
+    """
+
+    def __init__(self, sta_file):
+        """Constructor"""
+
+        self.sta_file = sta_file
+        self.pos = 0
+        self.partial = ''
+
+        self.step = None
+        self.increment = None
+        self.attempt = None
+        self.cutbacks = 0
+        self.step_time = 0.0
+        self.total_time = 0.0
+        self.inc_size = None
+        self.last_increment = None
+        self.completed = False
+        self.failed = False
+
+
+    def update(self):
+        """Read new lines from the status file, returns True if there are new increments"""
+
+        if not os.path.isfile(self.sta_file):
+            return False
+
+        with open(self.sta_file,'r') as f:
+
+            size = os.fstat(f.fileno()).st_size
+
+            if size < self.pos:
+
+                # File has been rewritten
+                self.__init__(self.sta_file)
+
+            if size == self.pos:
+                return False
+
+            f.seek(self.pos)
+
+            data = self.partial + f.read()
+
+            self.pos = f.tell()
+
+        lines = data.split('\n')
+
+        self.partial = lines.pop()
+
+        new_increment = False
+
+        for line in lines:
+
+            new_increment = self.parse_line(line) or new_increment
+
+        if new_increment:
+
+            self.last_increment = time.time()
+
+        return new_increment
+
+
+    def parse_line(self, line):
+        """Parse a line of the status file, returns True if it records an increment"""
+
+        if 'HAS COMPLETED SUCCESSFULLY' in line:
+
+            self.completed = True
+
+            return False
+
+        if 'HAS NOT BEEN COMPLETED' in line:
+
+            self.failed = True
+
+            return False
+
+        match = _EXPLICIT_STEP.match(line)
+
+        if match:
+
+            self.step = int(match.group(1))
+
+            return False
+
+        match = _STANDARD_INC.match(line)
+
+        try:
+
+            if match:
+
+                self.step = int(match.group(1))
+                self.increment = int(match.group(2))
+                self.attempt = int(match.group(3))
+
+                self.inc_size = float(match.group(7))
+
+                # (Unconverged attempts are cut back)
+                if match.group(4):
+
+                    self.cutbacks = self.cutbacks + 1
+
+                    return True
+
+                self.total_time = float(match.group(5))
+                self.step_time = float(match.group(6))
+
+                return True
+
+            match = _EXPLICIT_INC.match(line)
+
+            if match:
+
+                self.increment = int(match.group(1))
+                self.step_time = float(match.group(2))
+                self.total_time = float(match.group(3))
+                self.inc_size = float(match.group(4))
+
+                return True
+
+        except ValueError:
+
+            pass
+
+        return False
+
+
+class JobWatchdog:
+    """
+    Check a running job against its watchdog rules (max-time, max-cutbacks,
+    min-increment and stall-time, with times in seconds) using its status file
+    """
+
+    def __init__(self, rules, sta_file):
+        """Constructor"""
+
+        self.rules = rules
+        self.progress = StaProgress(sta_file)
+        self.start = time.time()
+
+
+    def check(self):
+        """Returns the reason for aborting the job if it has broken a rule, otherwise None"""
+
+        rules = self.rules
+        progress = self.progress
+
+        now = time.time()
+
+        progress.update()
+
+        if progress.completed or progress.failed:
+            return None
+
+        if rules['max-time'] is not None and now - self.start > rules['max-time']:
+
+            return 'exceeded maximum run time of {t}'.format(t=format_duration(rules['max-time']))
+
+        if rules['max-cutbacks'] is not None and progress.cutbacks > rules['max-cutbacks']:
+
+            return '{n} increment cutbacks (maximum {m})'.format(n=progress.cutbacks,m=rules['max-cutbacks'])
+
+        if rules['min-increment'] is not None and progress.inc_size is not None and \
+            progress.inc_size < rules['min-increment']:
+
+            return 'time increment {dt:.3g} below minimum of {m:.3g}'.format(dt=progress.inc_size,m=rules['min-increment'])
+
+        idle = now - (progress.last_increment or self.start)
+
+        if rules['stall-time'] is not None and idle > rules['stall-time']:
+
+            return 'no new increments for {t}'.format(t=format_duration(idle))
+
+        return None
+
+
+def get_step_periods(inp_file):
+    """
+    Get the time period of each step from an Abaqus input file (best-effort:
+    returns None if the file can't be read)
+
+    The list has an entry for every step, which is None for steps without
+    a time period (e.g. linear perturbation steps)
+    """
+
+    periods = []
+
+    in_step = False
+    has_procedure = False
+    expect_data = False
+
+    try:
+
+        with open(inp_file,'r') as f:
+
+            for line in f:
+
+                line = line.strip()
+
+                if not line or line.startswith('**'):
+                    continue
+
+                if line.startswith('*'):
+
+                    keyword = line.split(',')[0].strip().lower()
+
+                    expect_data = False
+
+                    if keyword == '*step':
+
+                        periods.append(None)
+
+                        in_step = True
+                        has_procedure = False
+
+                    elif keyword == '*end step':
+
+                        in_step = False
+
+                    elif in_step and not has_procedure and any(keyword.startswith(p) for p in _PROCEDURES):
+
+                        # (Default period, if not given in the data line)
+                        periods[-1] = 1.0
+
+                        has_procedure = True
+                        expect_data = True
+
+                elif expect_data:
+
+                    values = [v.strip() for v in line.split(',')]
+
+                    if len(values) > 1 and values[1]:
+
+                        periods[-1] = float(values[1])
+
+                    expect_data = False
+
+    except (IOError, ValueError):
+
+        return None
+
+    return periods or None
+
+
+def format_duration(seconds):
+    """Format a duration in seconds as h:mm:ss"""
+
+    seconds = int(seconds)
+
+    return '{h}:{m:02d}:{s:02d}'.format(h=seconds//3600,m=(seconds//60)%60,s=seconds%60)
+
+
+class ProgressDisplay:
+    """
+    Periodically print a table of the progress of running jobs from their status
+    files, with the estimated time remaining extrapolated from the progress through
+    the step time periods, from a background thread
+
+    On a terminal, the table is redrawn in place. Otherwise (e.g. when the output
+    is logged to a file) only the rows of jobs whose progress has changed are printed.
+    """
+
+    def __init__(self, interval=_DISPLAY_INTERVAL, stall_time=_STALL_TIME, stream=None, in_place=None):
+        """Constructor"""
+
+        self.interval = interval
+        self.stall_time = stall_time
+        self.stream = stream or sys.stdout
+
+        # (ANSI cursor movement isn't supported by older Windows consoles)
+        if in_place is None:
+            in_place = os.name != 'nt' and hasattr(self.stream,'isatty') and self.stream.isatty()
+
+        self.in_place = in_place
+
+        self.jobs = {}
+        self.ncompleted = 0
+
+        self.lines_drawn = 0
+        self.last_states = {}
+        self.last_counts = None
+        self.lock = threading.Lock()
+        self.stopping = threading.Event()
+        self.thread = None
+
+
+    def __enter__(self):
+
+        return self
+
+
+    def __exit__(self, exc_type, exc_value, traceback):
+
+        self.stop()
+
+
+    def start(self):
+        """Start the background thread (done automatically when the first job is added)"""
+
+        if self.thread:
+            return
+
+        self.thread = threading.Thread(target=self.run)
+        self.thread.daemon = True
+        self.thread.start()
+
+
+    def stop(self):
+        """Stop the background thread"""
+
+        if not self.thread:
+            return
+
+        self.stopping.set()
+
+        self.thread.join()
+
+        self.thread = None
+
+
+    def add(self, key, name, sta_file, inp_file=None):
+        """Start monitoring the progress of a job"""
+
+        with self.lock:
+
+            self.jobs[key] = {'name': name,
+                              'progress': StaProgress(sta_file),
+                              'periods': get_step_periods(inp_file) if inp_file else None,
+                              'start': time.time()}
+
+        self.start()
+
+
+    def remove(self, key):
+        """Stop monitoring a job"""
+
+        with self.lock:
+
+            if self.jobs.pop(key,None) is not None:
+
+                self.ncompleted = self.ncompleted + 1
+
+            self.last_states.pop(key,None)
+
+
+    def run(self):
+        """Background thread: print the progress table every interval"""
+
+        while not self.stopping.wait(self.interval):
+
+            with self.lock:
+
+                if self.jobs:
+
+                    self.display()
+
+
+    def display(self):
+        """Redraw the progress table in place, or print the rows of jobs whose progress has changed"""
+
+        rows = self.get_rows(time.time())
+
+        if self.in_place:
+
+            text = self.format_table([row for key, row, state in rows])
+
+            # (Move the cursor back to the start of the previous table and clear it)
+            if self.lines_drawn:
+                self.stream.write('\r\x1b[{n}A\x1b[J'.format(n=self.lines_drawn))
+
+            self.lines_drawn = text.count('\n')
+
+        else:
+
+            changed = [row for key, row, state in rows if self.last_states.get(key) != state]
+
+            counts = (len(self.jobs), self.ncompleted)
+
+            if not changed and counts == self.last_counts:
+                return
+
+            self.last_states = dict((key, state) for key, row, state in rows)
+            self.last_counts = counts
+
+            text = self.format_table(changed)
+
+        self.stream.write(text)
+        self.stream.flush()
+
+
+    def get_eta(self, job, now):
+        """Estimate the time remaining for a job (None if unknown)"""
+
+        progress = job['progress']
+        periods = job['periods']
+
+        if not periods or progress.step is None or progress.step > len(periods):
+            return None
+
+        # (Can't estimate the remaining time across steps without a time period)
+        if None in periods:
+            return None
+
+        total = sum(periods)
+
+        done = sum(periods[:progress.step-1]) + min(progress.step_time,periods[progress.step-1])
+
+        if done <= 0 or total <= 0:
+            return None
+
+        return (now - job['start'])*(total - done)/done
+
+
+    def get_rows(self, now):
+        """
+        Get the progress table row of each running job, as (key, row, state) where
+        state only changes when the job makes progress (or stalls)
+        """
+
+        rows = []
+
+        for key, job in sorted(self.jobs.items(), key=lambda item: item[1]['name']):
+
+            progress = job['progress']
+
+            progress.update()
+
+            if progress.increment is None:
+
+                rows.append((key, [job['name'], '-', '-', '-', '-', '-', '-', 'starting', '-'], 'starting'))
+
+                continue
+
+            eta = self.get_eta(job,now)
+
+            idle = now - (progress.last_increment or job['start'])
+
+            stalled = idle > self.stall_time
+
+            if stalled:
+                status = '(!) stalled {t}'.format(t=format_duration(idle))
+            else:
+                status = 'running'
+
+            state = (progress.step, progress.increment, progress.attempt, progress.cutbacks, stalled)
+
+            rows.append((key, [job['name'], progress.step, progress.increment, progress.attempt,
+                               progress.cutbacks, '{t:.4g}'.format(t=progress.step_time),
+                               '{t:.4g}'.format(t=progress.total_time),
+                               status, format_duration(eta) if eta is not None else '-'], state))
+
+        return rows
+
+
+    def format_table(self, table):
+        """Format progress table rows with a header and a count of running and completed jobs"""
+
+        from redist.tabulate import tabulate
+
+        text = tabulate(table,headers=['Job','Step','Inc','Att','Cutbacks','Step time','Total time','Status','ETA'],
+                        tablefmt='simple')
+
+        return '\n{table}\n ({n} running, {c} completed)\n\n'.format(table=text,n=len(self.jobs),c=self.ncompleted)
+
+
+    def get_table(self):
+        """Render the progress table for the running jobs"""
+
+        return self.format_table([row for key, row, state in self.get_rows(time.time())])
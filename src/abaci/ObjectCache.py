@@ -0,0 +1,181 @@
+import os
+import json
+import logging
+import tempfile
+import threading
+from hashlib import sha1
+from shutil import rmtree
+from os.path import join, isdir, exists, dirname
+from abaci.utils import copyfile, relpathshort
+
+
+class ObjectCache:
+    """
+    Local, size-bounded cache of compiler outputs shared between projects.
+
+    Each cache entry is a directory (named by the entry key) containing the
+    output files of a compilation step, stored by their path relative to the
+    compile directory. Entries are evicted least-recently-used first once
+    the total size of the cache exceeds max_size (megabytes).
+    """
+
+    def __init__(self,cache_dir,max_size):
+        """Constructor"""
+
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+
+    @staticmethod
+    def get_key(parts):
+        """Compute a cache key from a list of (json-serialisable) parts"""
+
+        m = sha1()
+
+        m.update(json.dumps(parts,sort_keys=True))
+
+        return m.hexdigest()
+
+
+    def get_entry_dir(self,key):
+
+        return join(self.cache_dir,key[0:2],key)
+
+
+    def fetch(self,key,dest_dir):
+        """Restore the files of a cache entry into dest_dir, returns True if found"""
+
+        log = logging.getLogger('abaci')
+
+        entry_dir = self.get_entry_dir(key)
+        manifest_file = join(entry_dir,'manifest.json')
+
+        try:
+
+            with open(manifest_file,'r') as f:
+                manifest = json.load(f)
+
+        except (IOError, ValueError):
+
+            with self.lock:
+                self.misses = self.misses + 1
+
+            return False
+
+        for rel_path in manifest['files']:
+
+            dest = join(dest_dir,rel_path)
+
+            if not isdir(dirname(dest)):
+                os.makedirs(dirname(dest))
+
+            copyfile(join(entry_dir,'files',rel_path),dest)
+
+        # Mark as recently used
+        os.utime(manifest_file,None)
+
+        log.debug('Compilation cache hit (%s)',key)
+
+        with self.lock:
+            self.hits = self.hits + 1
+
+        return True
+
+
+    def store(self,key,src_dir,files):
+        """Add files (paths relative to src_dir) to the cache under key"""
+
+        log = logging.getLogger('abaci')
+
+        entry_dir = self.get_entry_dir(key)
+
+        if exists(entry_dir):
+            return
+
+        if not isdir(dirname(entry_dir)):
+
+            try:
+                os.makedirs(dirname(entry_dir))
+            except OSError:
+                pass
+
+        # Populate a temporary directory then rename it, so that partial
+        #  entries are never visible to other processes
+        tmp_dir = tempfile.mkdtemp(dir=dirname(entry_dir))
+
+        size = 0
+
+        for rel_path in files:
+
+            dest = join(tmp_dir,'files',rel_path)
+
+            if not isdir(dirname(dest)):
+                os.makedirs(dirname(dest))
+
+            copyfile(join(src_dir,rel_path),dest)
+
+            size = size + os.path.getsize(dest)
+
+        with open(join(tmp_dir,'manifest.json'),'w') as f:
+            json.dump({'files': files, 'size': size},f)
+
+        try:
+
+            os.rename(tmp_dir,entry_dir)
+
+            log.debug('Added compilation cache entry (%s)',key)
+
+        except OSError:
+
+            # (Another process stored the same entry first)
+            rmtree(tmp_dir,ignore_errors=True)
+
+
+    def trim(self):
+        """Evict least-recently-used entries until the cache is within its maximum size"""
+
+        log = logging.getLogger('abaci')
+
+        if not isdir(self.cache_dir):
+            return
+
+        entries = []
+
+        for prefix in os.listdir(self.cache_dir):
+
+            prefix_dir = join(self.cache_dir,prefix)
+
+            if not isdir(prefix_dir):
+                continue
+
+            for key in os.listdir(prefix_dir):
+
+                manifest_file = join(prefix_dir,key,'manifest.json')
+
+                try:
+
+                    with open(manifest_file,'r') as f:
+                        size = json.load(f)['size']
+
+                    entries.append((os.path.getmtime(manifest_file), size, join(prefix_dir,key)))
+
+                except (IOError, OSError, ValueError, KeyError):
+
+                    continue
+
+        total = sum(e[1] for e in entries)
+        max_bytes = self.max_size*1024*1024
+
+        for mtime, size, entry_dir in sorted(entries):
+
+            if total <= max_bytes:
+                break
+
+            log.debug('Evicting compilation cache entry "%s"',relpathshort(entry_dir))
+
+            rmtree(entry_dir,ignore_errors=True)
+
+            total = total - size
@@ -0,0 +1,360 @@
+import os
+import sys
+import errno
+import select
+import struct
+import threading
+import time
+
+# Minimum interval (seconds) between printing batches of output
+_FLUSH_INTERVAL = 0.1
+
+# Maximum rate (lines per second, over all jobs) of printing output
+_MAX_RATE = 200
+
+# inotify events for files being written to or created
+_IN_MODIFY = 0x2
+_IN_MOVED_TO = 0x80
+_IN_CREATE = 0x100
+_IN_NONBLOCK = os.O_NONBLOCK
+
+
+class OutputTailer:
+    """
+    Print the output files of running jobs to the screen, prefixed by job name,
+    from a background thread.
+
+    On Linux the job directories are watched with inotify so that files are only
+    read when they change; elsewhere the files are polled every flush interval.
+    Output is printed in batches and limited to max_rate lines per second shared
+    between jobs: when there is more output than that, only the most recent lines
+    of each job are printed (the full output remains in the job directory).
+    """
+
+    def __init__(self, flush_interval=_FLUSH_INTERVAL, max_rate=_MAX_RATE, stream=None):
+        """Constructor"""
+
+        self.flush_interval = flush_interval
+        self.max_rate = max_rate
+        self.stream = stream or sys.stdout
+
+        self.jobs = {}
+        self.watches = {}
+        self.lock = threading.RLock()
+        self.stopping = threading.Event()
+        self.thread = None
+        self.inotify = None
+        self.inotify_fd = None
+        self.tokens = max_rate
+        self.last_flush = time.time()
+
+
+    def __enter__(self):
+
+        return self
+
+
+    def __exit__(self, exc_type, exc_value, traceback):
+
+        self.stop()
+
+
+    def start(self):
+        """Start the background thread (done automatically when the first job is added)"""
+
+        if self.thread:
+            return
+
+        self.init_inotify()
+
+        self.thread = threading.Thread(target=self.run)
+        self.thread.daemon = True
+        self.thread.start()
+
+
+    def stop(self):
+        """Stop the background thread, printing any remaining output"""
+
+        if not self.thread:
+            return
+
+        self.stopping.set()
+
+        self.thread.join()
+
+        self.thread = None
+
+        for key in list(self.jobs.keys()):
+
+            self.remove(key)
+
+        if self.inotify_fd is not None:
+
+            os.close(self.inotify_fd)
+
+            self.inotify_fd = None
+
+
+    def add(self, key, name, paths):
+        """Start tailing the output files (paths) of a job, prefixed by name"""
+
+        with self.lock:
+
+            self.jobs[key] = {'name': name,
+                              'files': [{'path': path, 'handle': None, 'pos': 0, 'partial': ''} for path in paths],
+                              'changed': True}
+
+            self.add_watch(key)
+
+        self.start()
+
+
+    def remove(self, key):
+        """Print the remaining output of a job and stop tailing it"""
+
+        with self.lock:
+
+            job = self.jobs.pop(key,None)
+
+            if job is None:
+                return
+
+            self.remove_watch(key)
+
+            self.emit([(job, self.read_job(job,final=True))])
+
+            for f in job['files']:
+
+                if f['handle']:
+                    f['handle'].close()
+
+
+    def run(self):
+        """Background thread: wait for changes and print new output in batches"""
+
+        while not self.stopping.is_set():
+
+            self.wait_for_changes()
+
+            # (Batch output from many small writes)
+            delay = self.last_flush + self.flush_interval - time.time()
+
+            if delay > 0:
+                self.stopping.wait(delay)
+
+            with self.lock:
+
+                output = []
+
+                for job in self.jobs.values():
+
+                    if job['changed'] or self.inotify_fd is None:
+
+                        job['changed'] = False
+
+                        output.append((job, self.read_job(job)))
+
+                self.emit(output)
+
+
+    def wait_for_changes(self):
+        """Block until a job output file changes (or the flush interval elapses if not using inotify)"""
+
+        if self.inotify_fd is None:
+
+            self.stopping.wait(self.flush_interval)
+
+            return
+
+        try:
+
+            # (Wake up occasionally to check for stopping)
+            ready, _, _ = select.select([self.inotify_fd], [], [], 1.0)
+
+        except select.error as e:
+
+            if e.args[0] != errno.EINTR:
+                raise
+
+            return
+
+        if ready:
+
+            self.read_events()
+
+
+    def read_job(self, job, final=False):
+        """Read the new complete lines (or all remaining output if final) from the files of a job"""
+
+        lines = []
+
+        for f in job['files']:
+
+            if not f['handle']:
+
+                if not os.path.isfile(f['path']):
+                    continue
+
+                try:
+                    f['handle'] = open(f['path'],'r')
+                except IOError:
+                    continue
+
+            size = os.fstat(f['handle'].fileno()).st_size
+
+            # File has been truncated or rewritten
+            if size < f['pos']:
+
+                f['handle'].seek(0)
+                f['pos'] = 0
+                f['partial'] = ''
+
+            if size == f['pos'] and not final:
+                continue
+
+            data = f['partial'] + f['handle'].read()
+
+            f['pos'] = f['handle'].tell()
+
+            file_lines = data.split('\n')
+
+            # (Keep incomplete lines until they are finished)
+            f['partial'] = '' if final else file_lines.pop()
+
+            label = os.path.splitext(f['path'])[1].lstrip('.')
+
+            lines.extend((label, line.rstrip()) for line in file_lines if line.strip())
+
+        return lines
+
+
+    def emit(self, output):
+        """Print lines from jobs, limited to the available rate"""
+
+        now = time.time()
+
+        self.tokens = min(self.max_rate, self.tokens + (now - self.last_flush)*self.max_rate)
+        self.last_flush = now
+
+        output = [(job, lines) for job, lines in output if lines]
+
+        if not output:
+            return
+
+        total = sum(len(lines) for job, lines in output)
+
+        # Share the available lines between jobs
+        share = max(1, int(self.tokens)//len(output)) if total > self.tokens else total
+
+        text = []
+
+        for job, lines in output:
+
+            if len(lines) > share:
+
+                text.append('[{name}] ... {n} lines not shown\n'.format(name=job['name'],n=len(lines)-share))
+
+                lines = lines[-share:]
+
+            for label, line in lines:
+
+                text.append('[{name} {label}] {line}\n'.format(name=job['name'],label=label,line=line))
+
+        self.tokens = self.tokens - min(total,share*len(output))
+
+        self.stream.write(''.join(text))
+        self.stream.flush()
+
+
+    def init_inotify(self):
+        """Set up inotify if available (Linux), otherwise files are polled"""
+
+        if not sys.platform.startswith('linux'):
+            return
+
+        try:
+
+            import ctypes
+            import ctypes.util
+
+            libc = ctypes.CDLL(ctypes.util.find_library('c'),use_errno=True)
+
+            fd = libc.inotify_init1(_IN_NONBLOCK)
+
+        except (OSError, AttributeError):
+
+            return
+
+        if fd < 0:
+            return
+
+        self.inotify = libc
+        self.inotify_fd = fd
+
+
+    def add_watch(self, key):
+        """Watch the directories containing the output files of a job"""
+
+        if self.inotify_fd is None:
+            return
+
+        for path in set(os.path.dirname(os.path.abspath(f['path'])) for f in self.jobs[key]['files']):
+
+            wd = self.inotify.inotify_add_watch(self.inotify_fd, path.encode('utf-8') if isinstance(path,unicode) else path,
+                                                _IN_MODIFY | _IN_CREATE | _IN_MOVED_TO)
+
+            if wd >= 0:
+
+                self.watches.setdefault(wd,[]).append(key)
+
+
+    def remove_watch(self, key):
+        """Stop watching the directories of a job"""
+
+        for wd in list(self.watches.keys()):
+
+            if key in self.watches[wd]:
+
+                self.watches[wd].remove(key)
+
+                if not self.watches[wd]:
+
+                    del self.watches[wd]
+
+                    self.inotify.inotify_rm_watch(self.inotify_fd, wd)
+
+
+    def read_events(self):
+        """Read pending inotify events and mark the jobs whose files changed"""
+
+        while True:
+
+            try:
+
+                data = os.read(self.inotify_fd, 65536)
+
+            except OSError as e:
+
+                if e.errno in (errno.EAGAIN, errno.EWOULDBLOCK, errno.EINTR):
+                    break
+
+                raise
+
+            if not data:
+                break
+
+            i = 0
+
+            with self.lock:
+
+                while i + 16 <= len(data):
+
+                    wd, mask, cookie, name_len = struct.unpack_from('iIII', data, i)
+
+                    i = i + 16 + name_len
+
+                    for key in self.watches.get(wd,[]):
+
+                        if key in self.jobs:
+
+                            self.jobs[key]['changed'] = True
@@ -1,12 +1,25 @@
 import os
+import re
+import json
+import logging
 from os.path import join
 import subprocess
-from abaci.utils import cwd, system_cmd, system_cmd_wait
+from abaci.utils import cwd, system_cmd, system_cmd_wait, get_cache_dir
 
-def check_for_abaqus():
+# File (in the cache directory) recording detected Abaqus installations
+_INFO_CACHE_FILE = 'abaqus-info.json'
+
+# Settings recorded from the Abaqus environment
+_ENV_SETTINGS = ['compile_fortran', 'compile_cpp', 'link_sl', 'link_exe']
+
+# Detected Abaqus installation for this invocation
+_abaqus_info = None
+
+
+def check_for_abaqus(refresh=False):
     """Check for Abaqus and raise Exception if not found"""
 
-    if not have_abaqus():
+    if not get_abaqus_info(refresh):
 
         raise Exception('Abaqus not found, cannot continue.')
 
@@ -14,26 +27,207 @@ def check_for_abaqus():
 def have_abaqus():
     """Check if abaqus is available in current environment"""
 
+    return get_abaqus_info() is not None
+
+
+def get_abaqus_path():
+    """Get the resolved path of the abaqus executable (None if not found)"""
+
+    from distutils.spawn import find_executable
+
+    cmd = abaqus_cmd([],noshell=True)[0]
+
+    if os.path.isabs(cmd):
+
+        path = cmd if os.path.isfile(cmd) else None
+
+    else:
+
+        path = find_executable(cmd)
+
+    return os.path.realpath(path) if path else None
+
+
+def get_abaqus_info(refresh=False):
+    """
+    Get details of the Abaqus installation (None if Abaqus is not available)
+
+    Abaqus is slow to start, so the details are cached between invocations
+    keyed by the path and modification time of the abaqus executable.
+    Returns a dict with the executable 'path' and 'mtime', the Abaqus 'version'
+    and 'environment' (a dict of compiler and linker settings).
+    """
+
+    global _abaqus_info
+
+    log = logging.getLogger('abaci')
+
+    if _abaqus_info and not refresh:
+
+        return _abaqus_info
+
+    path = get_abaqus_path()
+
+    if not path:
+
+        log.debug('Unable to find abaqus executable')
+
+        return None
+
+    mtime = os.path.getmtime(path)
+
+    cache_file = join(get_cache_dir(),_INFO_CACHE_FILE)
+
+    cache = load_info_cache(cache_file)
+
+    info = cache.get(path)
+
+    if refresh or not info or info['mtime'] != mtime:
+
+        info = detect_abaqus(path,mtime)
+
+        if not info:
+
+            return None
+
+        cache[path] = info
+
+        save_info_cache(cache_file,cache)
+
+    else:
+
+        log.debug('Using cached details of abaqus installation "%s"',path)
+
+    _abaqus_info = info
+
+    return info
+
+
+def detect_abaqus(path,mtime):
+    """Run abaqus to check that it works and get its version and compiler environment"""
+
+    log = logging.getLogger('abaci')
+
+    log.info('Detecting abaqus installation "%s"',path)
+
+    stat, output = get_abaqus_output(['information=version'])
+
+    if stat != 0:
+
+        return None
+
+    match = re.search(r'Abaqus\S*\s+(?:[Vv]ersion:?\s*)?(\d\S*)',output)
+
+    version = match.group(1) if match else None
+
+    stat, output = get_abaqus_output(['information=environment'])
+
+    environment = parse_environment(output) if stat == 0 else {}
+
+    log.debug('Found abaqus version %s',version)
+
+    return {'path': path, 'mtime': mtime, 'version': version, 'environment': environment}
+
+
+def get_abaqus_output(args):
+    """Run an abaqus command and return its exit status and output"""
+
     devnull = open(os.devnull,'w')
 
-    cmd = abaqus_cmd(['information=version'])
-    
     try:
 
-        stat =  subprocess.call(cmd,stdout=devnull,stderr=devnull)
+        p = subprocess.Popen(abaqus_cmd(args),stdout=subprocess.PIPE,stderr=devnull)
+
+    except OSError:
+
+        return -1, ''
+
+    output = p.communicate()[0]
+
+    return p.returncode, output
+
+
+def parse_environment(output):
+    """Get the compiler and linker settings from the output of abaqus information=environment"""
+
+    environment = {}
+
+    for line in output.splitlines():
+
+        match = re.match(r'^\s*(\w+)\s*[:=]\s*(.+?)\s*$',line)
+
+        if match and match.group(1) in _ENV_SETTINGS:
+
+            environment[match.group(1)] = match.group(2)
+
+    return environment
+
+
+def get_fortran_compiler(default='ifort'):
+    """Get the Intel Fortran compiler configured in the Abaqus environment (default if unknown)"""
+
+    info = _abaqus_info or get_abaqus_info()
 
-    except:
+    if not info:
+        return default
 
-        stat = -1
+    match = re.search(r'[\'"]?([^\'"\s,\[]+)',info['environment'].get('compile_fortran',''))
 
-    return stat == 0
+    if not match:
+        return default
 
+    fc = os.path.splitext(os.path.basename(match.group(1)))[0]
 
-def run(dir,job_name,abq_flags,mp_mode,nproc):
-    """Helper to launch an Abaqus job"""
+    return fc if fc in ('ifort','ifx') else default
+
+
+def load_info_cache(cache_file):
+    """Load the cached details of abaqus installations"""
+
+    try:
+
+        with open(cache_file,'r') as f:
+            return json.load(f)
+
+    except (IOError, ValueError):
+
+        return {}
+
+
+def save_info_cache(cache_file,cache):
+    """Save the cached details of abaqus installations"""
+
+    log = logging.getLogger('abaci')
+
+    try:
+
+        if not os.path.isdir(os.path.dirname(cache_file)):
+
+            os.makedirs(os.path.dirname(cache_file))
+
+        temp_file = '{f}.{pid}'.format(f=cache_file,pid=os.getpid())
+
+        with open(temp_file,'w') as f:
+            json.dump(cache,f,indent=1,sort_keys=True)
+
+        if os.name == 'nt' and os.path.exists(cache_file):
+            os.remove(cache_file)
+
+        os.rename(temp_file,cache_file)
+
+    except (IOError, OSError) as e:
+
+        log.debug('Unable to save abaqus details to "%s": %s',cache_file,e)
+
+
+def run(dir,job_name,abq_flags,mp_mode,nproc,cpu_list=None):
+    """Helper to launch an Abaqus job, optionally pinned to specific CPU cores"""
 
     cmd = get_run_cmd(job_name,abq_flags,mp_mode,nproc)
 
+    if cpu_list:
+        cmd = ['taskset','-c',','.join(str(c) for c in cpu_list)] + cmd
+
     with cwd(dir):
 
         p, ofile, efile = system_cmd(cmd,output=join(dir,'abaqus'))
@@ -0,0 +1,196 @@
+import logging
+import os
+import Queue
+import json
+from hashlib import sha1
+from multiprocessing.pool import ThreadPool
+from abaci.fortran_parsing import parse_fortran_dependencies, fortran_suffixes
+from abaci.utils import hashfile
+
+# (A timeout is needed for blocking queue gets to remain interruptible on Python 2)
+_MAX_WAIT = 1e6
+
+
+def get_source_dependencies(sources):
+    """
+    Build the dependency graph between source files based on Fortran module usage
+
+    Returns a dict mapping each source file to the set of source files
+    that define modules used by it.
+    """
+
+    log = logging.getLogger('abaci')
+
+    provided_by = {}
+    requires = {}
+
+    for src in sources:
+
+        if not src.endswith(fortran_suffixes):
+
+            requires[src] = set()
+
+            continue
+
+        provides, requires[src] = parse_fortran_dependencies(src)
+
+        for mod in provides:
+
+            if mod in provided_by:
+
+                log.warning('(!) Module "%s" is defined in both "%s" and "%s"',
+                            mod, os.path.basename(provided_by[mod]), os.path.basename(src))
+
+            else:
+
+                provided_by[mod] = src
+
+    dependencies = {}
+
+    for src in sources:
+
+        # (Modules not defined by these sources are external, e.g. intrinsic)
+        dependencies[src] = set(provided_by[mod] for mod in requires[src]
+                                 if mod in provided_by and provided_by[mod] != src)
+
+        log.debug('Source "%s" depends on %s', os.path.basename(src),
+                   [os.path.basename(d) for d in dependencies[src]])
+
+    check_circular_dependencies(sources, dependencies)
+
+    return dependencies
+
+
+def check_circular_dependencies(sources, dependencies):
+    """Raise an exception if the dependency graph contains a cycle"""
+
+    done = set()
+    remaining = list(sources)
+
+    while remaining:
+
+        ready = [src for src in remaining if dependencies[src] <= done]
+
+        if not ready:
+
+            raise Exception('Circular module dependency between source files: {srcs}'.format(
+                             srcs=', '.join(os.path.basename(s) for s in remaining)))
+
+        for src in ready:
+
+            remaining.remove(src)
+            done.add(src)
+
+
+def get_build_digests(sources, dependencies, get_options, get_includes=None):
+    """
+    Compute a digest for each source file that changes whenever its compiled
+    output could change: i.e. its contents, its compile options (given by
+    get_options(source)), the digests of the files it includes (given by
+    get_includes(source)) or the digest of any of its dependencies
+    """
+
+    digests = {}
+    remaining = list(sources)
+
+    # (Dependencies are hashed first, so the graph must be acyclic)
+    while remaining:
+
+        ready = [src for src in remaining if dependencies[src] <= set(digests)]
+
+        if not ready:
+
+            raise Exception('Unable to compute build digests due to unresolved dependencies')
+
+        for src in ready:
+
+            m = sha1()
+            m.update(hashfile(src))
+            m.update(json.dumps(get_options(src)))
+
+            if get_includes:
+                m.update(json.dumps(get_includes(src)))
+
+            for dep in sorted(dependencies[src]):
+                m.update(digests[dep])
+
+            digests[src] = m.hexdigest()
+
+            remaining.remove(src)
+
+    return digests
+
+
+def parallel_build(sources, dependencies, build_fn, njob):
+    """
+    Call build_fn for each source file using up to njob concurrent threads,
+    building each source only once all of its dependencies have been built
+
+    (Threads suffice here since the actual work is done by compiler subprocesses)
+    """
+
+    remaining = list(sources)
+    done = set()
+    failed = []
+    results = Queue.Queue()
+    n_active = 0
+
+    def build_task(src):
+        """Run build_fn, returning any exception rather than raising it"""
+
+        try:
+
+            build_fn(src)
+
+            return src, None
+
+        except Exception as e:
+
+            return src, e
+
+    pool = ThreadPool(max(1,njob))
+
+    try:
+
+        while (remaining and not failed) or n_active:
+
+            if not failed:
+
+                ready = [src for src in remaining if dependencies[src] <= done]
+
+                for src in ready:
+
+                    remaining.remove(src)
+
+                    pool.apply_async(build_task, (src,), callback=results.put)
+
+                    n_active = n_active + 1
+
+            if not n_active:
+
+                raise Exception('Unable to build sources due to unresolved dependencies')
+
+            src, error = results.get(True, _MAX_WAIT)
+
+            n_active = n_active - 1
+
+            if error:
+
+                failed.append(error)
+
+            else:
+
+                done.add(src)
+
+    except:
+
+        pool.terminate()
+
+        raise
+
+    pool.close()
+    pool.join()
+
+    if failed:
+
+        raise failed[0]
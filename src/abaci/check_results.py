@@ -0,0 +1,157 @@
+import json
+import math
+import xml.etree.ElementTree as ET
+from os.path import join
+import numpy as np
+
+
+def get_tolerance(tol,field):
+    """Get the tolerance for a field from a check tolerance setting (number or table by field)"""
+
+    if isinstance(tol,dict):
+
+        return tol.get(field)
+
+    return tol
+
+
+def evaluate_field(ref_data,out_data,atol=None,rtol=None):
+    """
+    Compare output field data with reference data
+
+    Computes the RMS and maximum absolute differences and the maximum
+    difference relative to the largest reference magnitude from a single
+    array of absolute differences. The field passes if every value is within
+    atol + rtol*|reference| (or always, if no tolerance is given).
+    """
+
+    ref_data = np.asarray(ref_data,dtype=float)
+    out_data = np.asarray(out_data,dtype=float)
+
+    result = {'atol': atol, 'rtol': rtol}
+
+    if ref_data.shape != out_data.shape:
+
+        result.update({'rms': None, 'max-abs': None, 'rel': None, 'passed': False,
+                       'message': 'Shape mismatch: reference {ref}, output {out}'.format(
+                                    ref=ref_data.shape, out=out_data.shape)})
+
+        return result
+
+    abs_diff = np.abs(out_data - ref_data)
+    abs_ref = np.abs(ref_data)
+
+    if abs_diff.size:
+
+        rms = math.sqrt(np.square(abs_diff).mean())
+        max_abs = float(abs_diff.max())
+        ref_max = float(abs_ref.max())
+
+    else:
+
+        rms = max_abs = ref_max = 0.0
+
+    if ref_max > 0:
+        rel = max_abs/ref_max
+    elif max_abs == 0:
+        rel = 0.0
+    else:
+        rel = float('inf')
+
+    if atol is None and rtol is None:
+
+        passed = True
+
+    else:
+
+        passed = bool(np.all(abs_diff <= (atol or 0.0) + (rtol or 0.0)*abs_ref))
+
+    result.update({'rms': rms, 'max-abs': max_abs, 'rel': rel, 'passed': passed})
+
+    if not passed:
+
+        result['message'] = 'Max abs. difference {d:.6g} (rel. {r:.6g}) exceeds tolerance (atol={a}, rtol={t})'.format(
+                              d=max_abs, r=rel, a=atol, t=rtol)
+
+    return result
+
+
+def to_json_safe(value):
+    """
+    Replace non-finite numbers (which aren't valid JSON) with None,
+    recursively through lists and dicts
+    """
+
+    if isinstance(value,float) and (math.isinf(value) or math.isnan(value)):
+
+        return None
+
+    if isinstance(value,dict):
+
+        return dict((k, to_json_safe(v)) for k, v in value.items())
+
+    if isinstance(value,(list,tuple)):
+
+        return [to_json_safe(v) for v in value]
+
+    return value
+
+
+def write_check_reports(job_dir,job_name,reference,results,reference_created=False):
+    """
+    Write regression check results for a job as JSON (check-report.json)
+    and JUnit XML (check-report.xml) in the job directory
+    (non-finite values, e.g. an infinite relative difference, are written as null)
+
+    If reference_created, the reference was missing and has been created from this
+    run, so nothing was checked: this is reported as skipped rather than passed.
+    """
+
+    nfail = sum(1 for r in results if not r['passed'])
+
+    if reference_created:
+        status = 'reference-created'
+    elif nfail:
+        status = 'failed'
+    else:
+        status = 'passed'
+
+    report = {'job': job_name,
+              'reference': reference,
+              'status': status,
+              'passed': status == 'passed',
+              'failures': nfail,
+              'results': results}
+
+    with open(join(job_dir,'check-report.json'),'w') as f:
+        json.dump(to_json_safe(report),f,indent=1,sort_keys=True,allow_nan=False)
+
+    suites = ET.Element('testsuites')
+
+    if reference_created:
+
+        suite = ET.SubElement(suites,'testsuite',name=job_name,tests='1',failures='0',skipped='1')
+
+        case = ET.SubElement(suite,'testcase',classname=job_name,name='reference')
+
+        ET.SubElement(case,'skipped',message='Reference {ref} not found: created from this run'.format(ref=reference))
+
+        ET.ElementTree(suites).write(join(job_dir,'check-report.xml'),encoding='utf-8')
+
+        return
+
+    suite = ET.SubElement(suites,'testsuite',name=job_name,
+                          tests=str(len(results)),failures=str(nfail))
+
+    for r in results:
+
+        case = ET.SubElement(suite,'testcase',classname=job_name,
+                             name='{step}/frame-{frame}/{field}'.format(**r))
+
+        if not r['passed']:
+
+            ET.SubElement(case,'failure',message=r['message'])
+
+        ET.SubElement(case,'system-out').text = 'rms={rms} max-abs={max-abs} rel={rel}'.format(**r)
+
+    ET.ElementTree(suites).write(join(job_dir,'check-report.xml'),encoding='utf-8')
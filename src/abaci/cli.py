@@ -42,13 +42,32 @@ def parse_cli():
     common_group.add_argument('--config',type=str,help='specify a different config file to default ("abaci.toml")',
                         dest='config',default='abaci.toml')
 
+    common_group.add_argument('--update-lock',help='update dependencies to the latest commits matching their versions and rewrite the lock file',
+                        dest='update_lock',action='store_true')
+
     # POST subcommand
     run_command = subparsers.add_parser('post', parents=[common_group],
-                                         help='Run regression checks and post-processing scripts for a completed job',
-                                         description="Run regression checks and post-processing scripts for a completed job")
+                                         help='Run regression checks and post-processing scripts for completed jobs',
+                                         description="Run regression checks and post-processing scripts for completed jobs")
+
+    run_command.add_argument(metavar='job-dir',dest='job_dir',type=str,nargs='+',
+                             help='Path(s) or glob pattern(s) for job output directories, or a parent directory to search')
+
+    run_command.add_argument('-j','--jobs',type=int,help='post-process jobs concurrently, optionally specify a maximum number of concurrent jobs',
+                        nargs='?',dest='njob',action='store',const=None,default=1)
+
+    # CONVERT subcommand
+    convert_command = subparsers.add_parser('convert', parents=[common_group],
+                                         help='Convert a regression check reference file to a different format',
+                                         description="Convert a regression check reference file to a different format, "
+                                                     "chosen by extension: '.pkl' (legacy pickle), '.npz' (compressed) "
+                                                     "or otherwise a directory of memory-mappable arrays")
+
+    convert_command.add_argument(metavar='source',dest='ref_source',type=str,
+                             help='Path to existing reference file')
 
-    run_command.add_argument(metavar='job-dir',dest='job_dir',type=str,
-                             help='Path to job output directory')
+    convert_command.add_argument(metavar='dest',dest='ref_dest',type=str,
+                             help='Path to new reference file')
 
     # INIT subcommand
     init_command = subparsers.add_parser('init', parents=[common_group],
@@ -91,6 +110,12 @@ def parse_cli():
     build_group.add_argument('-s','--screen',help='echo Abaqus output to the screen while running',
                         dest='screen_output',action='store_true')
 
+    build_group.add_argument('--no-cache',help='don\'t use the compilation cache shared between projects',
+                        dest='no_cache',action='store_true')
+
+    build_group.add_argument('--refresh-abaqus',help='re-detect Abaqus instead of using cached details',
+                        dest='refresh_abaqus',action='store_true')
+
     # SUBMIT subcommand
     submit_command = subparsers.add_parser('submit', parents=[common_group,build_group],
                                          help='Compile user subroutines and submit jobs to cluster (SLURM)',
@@ -105,6 +130,15 @@ def parse_cli():
 
     submit_command.add_argument('-n','--no-submit',help='prepare job files, but don\'t submit the batch job',
                         dest='no_submit',action='store_true')
+
+    submit_command.add_argument('--bundle',type=int,help='run all jobs within a single SLURM allocation of CPUS CPUs on one node (jobs with different partition, account, memory or email settings are bundled separately)',
+                        dest='bundle',metavar='CPUS',action='store',default=None)
+
+    submit_command.add_argument('--no-array',help='submit each job separately instead of grouping jobs with the same cluster settings into job arrays',
+                        dest='no_array',action='store_true')
+
+    submit_command.add_argument('-j','--jobs',type=int,help='compile auxillary sources concurrently, optionally specify a maximum number of concurrent compilations',
+                        nargs='?',dest='njob',action='store',const=None,default=1)
     
     # RUN subcommand
     run_command = subparsers.add_parser('run', parents=[common_group,build_group],
@@ -124,6 +158,20 @@ def parse_cli():
     run_command.add_argument('-j','--jobs',type=int,help='run jobs concurrently, optionally specify a maximum number of concurrently running jobs',
                         nargs='?',dest='njob',action='store',const=None,default=1)
 
+    run_command.add_argument('--cpus',type=int,help='total number of CPUs available to concurrently running jobs (default: all)',
+                        dest='cpus',default=None)
+
+    run_command.add_argument('--mem',type=str,help='total memory available to concurrently running jobs, e.g. 64G (default: unlimited)',
+                        dest='mem',default=None)
+
+    run_command.add_argument('--pin',help='pin concurrently running jobs to separate CPU cores (Linux only)',
+                        dest='pin',action='store_true')
+
+    run_command.add_argument('--progress',help='periodically print a table of the progress of running jobs',
+                        dest='progress',action='store_true')
+
+    run_command.add_argument('--bundle-dir',type=str,help='run the jobs prepared by "abaci submit --bundle" in BUNDLE_DIR (used within the SLURM allocation)',
+                        dest='bundle_dir',default=None)
     
     # COMPILE subcommand
     compile_command = subparsers.add_parser('compile', parents=[common_group,build_group],
@@ -133,11 +181,17 @@ def parse_cli():
     compile_command.add_argument('--release',type=str,help='prepare a pre-compiled binary release directory',
                                  dest='release_dir',action='store',default=None)
 
+    compile_command.add_argument('-j','--jobs',type=int,help='compile auxillary sources concurrently, optionally specify a maximum number of concurrent compilations',
+                        nargs='?',dest='njob',action='store',const=None,default=1)
+
     # TEST subcommand
     test_command = subparsers.add_parser('test', parents=[common_group,build_group],
                                          help='Compile user subroutines only and run unit tests',
                                          description="Compile user subroutines only and run unit tests")
 
+    test_command.add_argument('-j','--jobs',type=int,help='compile auxillary sources concurrently, optionally specify a maximum number of concurrent compilations',
+                        nargs='?',dest='njob',action='store',const=None,default=1)
+
     # SHOW subcommand
     show_command = subparsers.add_parser('show', parents=[common_group],
                                      help='Show useful information about this project',
@@ -168,10 +222,18 @@ def parse_cli():
             # No screen output if going into the background
             args.verbose = -1
 
-        # Use number of CPUs if value not given for jobs
-        if not args.njob:
-            args.njob = multiprocessing.cpu_count()
+        # Schedule jobs against all CPUs by default
+        if not args.cpus:
+            args.cpus = multiprocessing.cpu_count()
+
+        if args.pin and os.name == 'nt':
+            print(' (!) CPU pinning (--pin) is not supported on Windows.')
+            exit(1)
+
 
+    # Use number of CPUs if value not given for jobs
+    if hasattr(args,'njob') and not args.njob:
+        args.njob = multiprocessing.cpu_count()
 
     if args.action == 'run' or args.action == 'submit':
 
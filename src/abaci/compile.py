@@ -1,16 +1,24 @@
 import logging
 import os
 import abaqus as abq
-from utils import cwd, mkdir, copyfile, copydir, system_cmd, system_cmd_wait, relpathshort, to_ascii, hashfiles
-from shutil import rmtree
+import subprocess
+from utils import cwd, mkdir, copyfile, copydir, linkfile, system_cmd, system_cmd_wait, relpathshort, to_ascii, hashfile, hashfiles, hashlist
+from utils import recurse_files, parse_memory, get_cache_dir
 from getpass import getuser
 from hashlib import sha1
+from distutils.spawn import find_executable
 import json
 import cPickle as pkl
 import glob
 import itertools
+from abaci.fortran_parsing import fortran_suffixes, parse_fortran_dependencies, parse_fortran_includes
+from abaci.build_graph import get_source_dependencies, get_build_digests, parallel_build
+from abaci.ObjectCache import ObjectCache
 
-fortran_suffixes = ('.f','.f90','.for','.F90')
+_DEFAULT_CACHE_SIZE = '5G'
+
+# Record of the files staged into the compile directory (relative paths)
+_STAGED_FILES = 'staged.pkl'
 
 def compile_user_subroutine(args, output_dir, user_file, compile_conf, dep_list):
     """Perform pre-compilation step using abaqus make"""
@@ -35,13 +43,51 @@ def compile_user_subroutine(args, output_dir, user_file, compile_conf, dep_list)
                       opt_host = compile_conf['opt-host'],
                       noopt = args.noopt)
     
-    if not need_recompile(user_file,includes,aux_sources,dep_list,compile_conf,args,output_dir,compile_dir):
+    recompile, digest = need_recompile(user_file,includes,aux_sources,dep_list,compile_conf,args,output_dir,compile_dir)
+
+    if not recompile:
         log.info('Skipping compilation (source files unchanged)')
         return 0, compile_dir, fflags
 
-    aux_source_list = stage_files(compile_dir, user_file, compile_file, includes, aux_sources, dep_list)
+    # (The digest is only saved once the build succeeds, so a failed build is never skipped)
+    digest_cache = os.path.join(output_dir,'digest.pkl')
+
+    if os.path.isfile(digest_cache):
+        os.remove(digest_cache)
+
+    try:
+
+        stat = build_user_subroutine(args, compile_dir, user_file, compile_file, includes,
+                                     aux_sources, compile_conf, dep_list, fflags)
+
+    except:
+
+        remove_lib_files(compile_dir)
+        raise
+
+    if stat == 0:
+
+        with open(digest_cache,'w') as f:
+            pkl.dump(digest,f)
+
+    else:
+
+        remove_lib_files(compile_dir)
+
+    return stat, compile_dir, fflags
+
+
+def build_user_subroutine(args, compile_dir, user_file, compile_file, includes, aux_sources,
+                          compile_conf, dep_list, fflags):
+    """Stage and compile the user subroutine and auxillary sources, returns the abaqus make status"""
+
+    log = logging.getLogger('abaci')
+
+    cache = get_object_cache(args)
+
+    aux_source_list, include_list = stage_files(compile_dir, user_file, compile_file, includes, aux_sources, dep_list)
 
-    compile_auxillary_sources(compile_dir,compile_conf,args,aux_source_list,fflags)
+    aux_digests = compile_auxillary_sources(compile_dir,compile_conf,args,aux_source_list,fflags,cache,include_list)
 
     log.debug('Flags = %s',fflags)
 
@@ -52,42 +98,73 @@ def compile_user_subroutine(args, output_dir, user_file, compile_conf, dep_list)
 
     spool_env_file(compile_dir,fflags,lflags)
 
-    log.info('Running abaqus make')
+    dep_includes = list(itertools.chain.from_iterable(dep['includes'] for n,dep in dep_list.items()))
 
-    stat = abq.make(dir=compile_dir, lib_file=compile_file, verbosity=(args.verbose + 2*args.screen_output))
-    
-    return stat, compile_dir, fflags
+    make_key = get_make_cache_key(cache, compile_dir, [user_file]+includes+dep_includes,
+                                   fflags, lflags, aux_digests)
 
+    if make_key and cache.fetch(make_key,compile_dir):
 
-def need_recompile(compile_file,includes,aux_sources,dep_list,compile_conf,args,output_dir,compile_dir):
-    """Check if we can skip recompilation because nothing has changed"""
+        log.info('Using cached abaqus make output')
 
-    log = logging.getLogger('abaci')
+        stat = 0
 
-    dep_includes = list(itertools.chain.from_iterable(dep['includes'] for n,dep in dep_list.items()))
-    dep_sources = list(itertools.chain.from_iterable(dep['sources'] for n,dep in dep_list.items()))
+    else:
 
-    files = [compile_file]+includes+aux_sources+dep_includes+dep_sources
+        log.info('Running abaqus make')
+
+        before = get_dir_snapshot(compile_dir)
+
+        stat = abq.make(dir=compile_dir, lib_file=compile_file, verbosity=(args.verbose + 2*args.screen_output))
+
+        if make_key and stat == 0:
+
+            cache.store(make_key,compile_dir,get_changed_files(compile_dir,before))
+
+    if cache:
+
+        log.info('Compilation cache: %s hits, %s misses',cache.hits,cache.misses)
+
+        cache.trim()
+    
+    return stat
+
+
+def get_lib_files(compile_dir):
+    """Get the library files built by abaqus make in the compile directory"""
 
-    # Check for existing lib files
     if os.name == 'nt':
         ext = '.dll'
     else:
         ext = '.so'
-    libfiles = glob.glob(os.path.join(compile_dir,'*'+ext))
 
-    # Need to recompile if there are no library files
-    if not libfiles:
-        return True
+    return glob.glob(os.path.join(compile_dir,'*'+ext))
 
-    # Read previous compilation hash
-    digest_cache = os.path.join(output_dir,'digest.pkl')
-    if not os.path.isfile(digest_cache):
-        old_digest = '0'
-        
-    else:
-        with open(digest_cache,'r') as f:
-            old_digest = pkl.load(f)
+
+def remove_lib_files(compile_dir):
+    """Remove the library files after a failed build, so that jobs can't run with a stale library"""
+
+    log = logging.getLogger('abaci')
+
+    for lib_file in get_lib_files(compile_dir):
+
+        log.debug('Removing library file "%s"',relpathshort(lib_file))
+        os.remove(lib_file)
+
+
+def need_recompile(compile_file,includes,aux_sources,dep_list,compile_conf,args,output_dir,compile_dir):
+    """
+    Check if we can skip recompilation because nothing has changed
+
+    Returns whether to recompile, and the compilation digest to save once compiled
+    """
+
+    log = logging.getLogger('abaci')
+
+    dep_includes = list(itertools.chain.from_iterable(dep['includes'] for n,dep in dep_list.items()))
+    dep_sources = list(itertools.chain.from_iterable(dep['sources'] for n,dep in dep_list.items()))
+
+    files = [compile_file]+includes+aux_sources+dep_includes+dep_sources
 
     compile_args = [args.check, args.debug, args.gcc, args.noopt, args.codecov]
 
@@ -99,15 +176,24 @@ def need_recompile(compile_file,includes,aux_sources,dep_list,compile_conf,args,
     m.update(src_digest)
     digest = m.hexdigest()
 
-    # Cache new compilation hash
-    with open(digest_cache,'w') as f:
-        pkl.dump(digest,f)
+    # Need to recompile if there are no library files
+    if not get_lib_files(compile_dir):
+        return True, digest
+
+    # Read previous compilation hash
+    digest_cache = os.path.join(output_dir,'digest.pkl')
+    if not os.path.isfile(digest_cache):
+        old_digest = '0'
+        
+    else:
+        with open(digest_cache,'r') as f:
+            old_digest = pkl.load(f)
 
     log.debug('Compilation digest: %s',digest)
     log.debug('Previous digest: %s',old_digest)
 
     # Recompile if hashes don't match
-    return old_digest != digest
+    return old_digest != digest, digest
 
 
 def get_mod_dir(compile_dir):
@@ -117,32 +203,48 @@ def get_mod_dir(compile_dir):
 
 
 def stage_files(compile_dir, user_file, compile_file, include_files, aux_sources, dep_list):
-    """Create output compilation directory and move files there"""
+    """
+    Create output compilation directory and copy files there
 
-    log = logging.getLogger('abaci')
+    (Existing compiled objects are kept for incremental rebuilds, but files
+     staged previously that are no longer sources or includes are removed)
 
-    if os.path.exists(compile_dir):
-        log.debug('Removing existing compile directory (%s)',relpathshort(compile_dir))
-        rmtree(compile_dir)
+    Returns the staged auxillary sources and the staged include files
+    """
+
+    log = logging.getLogger('abaci')
 
     mkdir(compile_dir)
 
     mkdir(get_mod_dir(compile_dir))
 
-    copyfile(user_file,compile_file)
+    staged = []
+
+    def stage(src, dest):
+        """Copy a file or directory into the compile directory"""
+
+        if os.path.isdir(src):
+
+            copydir(src,dest)
+
+        else:
+
+            copyfile(src,dest)
+
+        staged.extend(recurse_files(dest))
+
+    stage(user_file,compile_file)
+
+    include_list = []
 
     # Stage additional 'include' files from this project
     for inc in include_files:
 
         dest = os.path.join(compile_dir,os.path.basename(inc))
 
-        if os.path.isdir(inc):
-
-            copydir(inc,dest)
+        stage(inc,dest)
 
-        else:
-
-            copyfile(inc,dest)
+        include_list.extend(recurse_files(dest))
     
     # Stage auxillary source files
     aux_source_list = []
@@ -152,13 +254,7 @@ def stage_files(compile_dir, user_file, compile_file, include_files, aux_sources
 
         aux_source_list.append(dest)
 
-        if os.path.isdir(src):
-
-            copydir(src,dest)
-
-        else:
-
-            copyfile(src,dest)
+        stage(src,dest)
 
     # Stage 'include' files from dependencies
     #  (in subdirectories named by dependency name)
@@ -172,13 +268,9 @@ def stage_files(compile_dir, user_file, compile_file, include_files, aux_sources
 
             dest = os.path.join(dep_dir,os.path.basename(inc))
 
-            if os.path.isdir(inc):
-
-                copydir(inc,dest)
-
-            else:
+            stage(inc,dest)
 
-                copyfile(inc,dest)
+            include_list.extend(recurse_files(dest))
 
         for src in dep['sources']:
 
@@ -186,16 +278,48 @@ def stage_files(compile_dir, user_file, compile_file, include_files, aux_sources
             
             aux_source_list.append(dest)
 
-            if os.path.isdir(src):
+            stage(src,dest)
 
-                copydir(src,dest)
+    remove_stale_files(compile_dir,staged)
 
-            else:
+    return aux_source_list, include_list
+
+
+def remove_stale_files(compile_dir, staged):
+    """Remove files staged by a previous build that aren't staged for this one"""
+
+    log = logging.getLogger('abaci')
+
+    manifest = os.path.join(compile_dir,_STAGED_FILES)
+
+    current = set(os.path.relpath(f,compile_dir) for f in staged)
+
+    previous = set()
+
+    if os.path.isfile(manifest):
+
+        with open(manifest,'rb') as f:
+            previous = pkl.load(f)
+
+    for rel_path in sorted(previous - current):
+
+        path = os.path.join(compile_dir,rel_path)
+
+        if os.path.isfile(path):
+
+            log.debug('Removing stale staged file "%s"',relpathshort(path))
+            os.remove(path)
 
-                copyfile(src,dest)
+        # (Remove directories left empty, e.g. from a removed include directory)
+        parent = os.path.dirname(path)
 
-    return aux_source_list
+        while parent != compile_dir and os.path.isdir(parent) and not os.listdir(parent):
 
+            os.rmdir(parent)
+            parent = os.path.dirname(parent)
+
+    with open(manifest,'wb') as f:
+        pkl.dump(current,f,pkl.HIGHEST_PROTOCOL)
 
 def get_flags(compile_dir,fortran_flags, debug_symbols, runtime_checks, compiletime_checks, codecov,
                opt_host, noopt):
@@ -327,8 +451,180 @@ def get_cflags(use_gcc, c_flags, debug_symbols, compiletime_checks,
     return flags
 
 
-def compile_cpp(use_gcc, cflags, source_file, verbose):
-    """Heler for compiling c/c++ source files"""
+def get_object_file(source_file):
+    """Get the (Abaqus/Standard) object file name for an auxillary source file"""
+
+    obj_file = os.path.basename(source_file).split('.')[0] +'-std.o'
+
+    if os.name == 'nt':
+        obj_file += 'bj'
+
+    return obj_file
+
+
+def get_object_cache(args):
+    """Get the compilation cache shared between projects (None if disabled)"""
+
+    log = logging.getLogger('abaci')
+
+    # (Coverage instrumentation refers to the compile directory so can't be shared)
+    if args.no_cache or args.codecov:
+        return None
+
+    try:
+
+        max_size = parse_memory(os.environ.get('ABACI_CACHE_SIZE',_DEFAULT_CACHE_SIZE))
+
+    except ValueError as e:
+
+        log.warning('(!) %s, using default compilation cache size',e)
+
+        max_size = parse_memory(_DEFAULT_CACHE_SIZE)
+
+    return ObjectCache(os.path.join(get_cache_dir(),'objects'),max_size)
+
+
+def get_compiler_id(cmd):
+    """Identify a compiler (or other tool) installation by its executable path, size and modification time"""
+
+    path = find_executable(cmd)
+
+    if not path:
+        return cmd
+
+    path = os.path.realpath(path)
+
+    st = os.stat(path)
+
+    return [path, st.st_size, st.st_mtime]
+
+
+def get_preprocessed_digest(pp_cmd):
+    """Hash the output of the preprocessor (None if preprocessing fails)"""
+
+    log = logging.getLogger('abaci')
+
+    log.debug('Running command "%s"',' '.join(pp_cmd))
+
+    m = sha1()
+
+    with open(os.devnull,'w') as devnull:
+
+        try:
+
+            p = subprocess.Popen(pp_cmd,stdout=subprocess.PIPE,stderr=devnull)
+
+        except OSError:
+
+            return None
+
+        for chunk in iter(lambda: p.stdout.read(65536), b''):
+            m.update(chunk)
+
+        if p.wait() != 0:
+
+            return None
+
+    return m.hexdigest()
+
+
+def get_include_digests(source_file, visited=None):
+    """Hash the files referenced (recursively) by Fortran include lines and preprocessor includes"""
+
+    if visited is None:
+        visited = set()
+
+    digests = []
+
+    for name in parse_fortran_includes(source_file):
+
+        candidates = [os.path.join(os.path.dirname(source_file),name), name]
+
+        found = [f for f in candidates if os.path.isfile(f)]
+
+        if not found or os.path.realpath(found[0]) in visited:
+
+            digests.append([name, None])
+
+            continue
+
+        visited.add(os.path.realpath(found[0]))
+
+        digests.append([name, hashfile(found[0])])
+
+        digests.extend(get_include_digests(found[0],visited))
+
+    return digests
+
+
+def get_compile_cache_key(cache, build_digest, pp_cmd, includes=()):
+    """
+    Get the compilation cache key for an auxillary source file (None if not cacheable)
+
+    The build digest covers the source, its options and its module dependencies
+    while the preprocessed source covers any preprocessor includes and macros.
+    """
+
+    if not cache or not build_digest:
+        return None
+
+    pp_digest = get_preprocessed_digest(pp_cmd)
+
+    if not pp_digest:
+        return None
+
+    return cache.get_key(['aux', get_compiler_id(pp_cmd[0]), build_digest, pp_digest, list(includes)])
+
+
+def get_make_cache_key(cache, compile_dir, inputs, fflags, lflags, aux_digests):
+    """Get the compilation cache key for the abaqus make step (None if not cacheable)"""
+
+    if not cache:
+        return None
+
+    files = []
+
+    for path in inputs:
+
+        root = os.path.dirname(path)
+
+        for file in sorted(recurse_files(path)):
+
+            files.append([os.path.relpath(file,root).replace(os.sep,'/'), hashfile(file)])
+
+    normalise = lambda flags: [f.replace(compile_dir,'{DIR}') for f in flags]
+
+    objects = sorted([get_object_file(src), digest] for src, digest in aux_digests.items())
+
+    # (Abaqus make output depends on the Abaqus version and its compiler environment)
+    info = abq.get_abaqus_info()
+
+    if info:
+        abaqus_id = [info['path'], info['mtime'], info['version'], info['environment']]
+    else:
+        abaqus_id = get_compiler_id(abq.abaqus_cmd([])[0])
+
+    return cache.get_key(['make', os.name, abaqus_id,
+                          files, normalise(fflags), normalise(lflags), objects])
+
+
+def get_dir_snapshot(dir):
+    """Record the size and modification time of all files in a directory"""
+
+    return dict((f, (os.path.getsize(f), os.path.getmtime(f))) for f in recurse_files(dir))
+
+
+def get_changed_files(dir, snapshot):
+    """List files (relative to dir) that are new or modified since snapshot"""
+
+    new_snapshot = get_dir_snapshot(dir)
+
+    return sorted(os.path.relpath(f,dir) for f in new_snapshot
+                  if snapshot.get(f) != new_snapshot[f])
+
+
+def compile_cpp(use_gcc, cflags, source_file, verbose, cache=None, build_digest=None):
+    """Heler for compiling c/c++ source files (via the compilation cache if given)"""
 
     log = logging.getLogger('abaci')
 
@@ -349,10 +645,20 @@ def compile_cpp(use_gcc, cflags, source_file, verbose):
     cmd = [cc,'-c',os.path.relpath(source_file)]
     cmd.extend(cflags)
 
-    obj_file = base.split('.')[0] +'-std.o'
+    obj_file = get_object_file(source_file)
 
-    if os.name == 'nt':
-        obj_file += 'bj'
+    if cc == 'cl':
+        pp_cmd = [cc,'/EP',os.path.relpath(source_file)] + cflags
+    else:
+        pp_cmd = [cc,'-E','-P',os.path.relpath(source_file)] + cflags
+
+    cache_key = get_compile_cache_key(cache, build_digest, pp_cmd)
+
+    if cache_key and cache.fetch(cache_key,'.'):
+
+        link_object_variants(obj_file)
+
+        return
 
     if cc == 'cl':
 
@@ -372,12 +678,14 @@ def compile_cpp(use_gcc, cflags, source_file, verbose):
 
         raise Exception('(!) Error while compiling auxillary source file')
 
-    copyfile(obj_file,obj_file.replace('-std','-xpl'))
-    copyfile(obj_file,obj_file.replace('-std','-xplD'))
+    if cache_key:
+        cache.store(cache_key,'.',[obj_file])
 
+    link_object_variants(obj_file)
 
-def compile_fortran(use_gcc, fflags, source_file, verbose):
-    """Heler for compiling auxiliary fortran source files"""
+
+def compile_fortran(use_gcc, fflags, source_file, verbose, cache=None, build_digest=None):
+    """Heler for compiling auxiliary fortran source files (via the compilation cache if given)"""
 
     log = logging.getLogger('abaci')
 
@@ -387,15 +695,26 @@ def compile_fortran(use_gcc, fflags, source_file, verbose):
     if use_gcc:
         fc = 'gfortran'
     else:
-        fc = 'ifort'
+        fc = abq.get_fortran_compiler()
         
     cmd = [fc,'-c',os.path.relpath(source_file)]
     cmd.extend(fflags)
 
-    obj_file = base.split('.')[0] +'-std.o'
+    obj_file = get_object_file(source_file)
 
-    if os.name == 'nt':
-        obj_file += 'bj'
+    if use_gcc:
+        pp_cmd = [fc,'-cpp','-E','-P',os.path.relpath(source_file)] + fflags
+    else:
+        pp_cmd = [fc,'-E',os.path.relpath(source_file)] + fflags
+
+    cache_key = get_compile_cache_key(cache, build_digest, pp_cmd,
+                                      cache and get_include_digests(source_file))
+
+    if cache_key and cache.fetch(cache_key,'.'):
+
+        link_object_variants(obj_file)
+
+        return
 
     if os.name == 'nt':
 
@@ -415,17 +734,103 @@ def compile_fortran(use_gcc, fflags, source_file, verbose):
 
         raise Exception('(!) Error while compiling auxillary source file')
 
-    copyfile(obj_file,obj_file.replace('-std','-xpl'))
-    copyfile(obj_file,obj_file.replace('-std','-xplD'))
+    if cache_key:
 
+        # Module files are also outputs, wherever the compiler put them
+        provides, requires = parse_fortran_dependencies(source_file)
 
+        mod_files = [os.path.join(d,mod+'.mod') for mod in sorted(provides) for d in ('mod','.')]
+
+        cache.store(cache_key,'.',[obj_file]+[os.path.normpath(f) for f in mod_files if os.path.isfile(f)])
+
+    link_object_variants(obj_file)
+
+
+
+def link_object_variants(obj_file):
+    """Provide the object file under the names expected for Abaqus/Explicit (-xpl, -xplD)"""
+
+    for variant in ('-xpl','-xplD'):
+
+        dest = obj_file.replace('-std',variant)
+
+        if os.path.exists(dest):
+            os.remove(dest)
+
+        linkfile(obj_file,dest)
+
+
+def load_object_digests(compile_dir):
+    """Load the digests of previously compiled auxillary sources"""
+
+    digest_cache = os.path.join(compile_dir,'objects.pkl')
+
+    if not os.path.isfile(digest_cache):
+
+        return {}
+
+    with open(digest_cache,'rb') as f:
+
+        return pkl.load(f)
+
+
+def save_object_digests(compile_dir,digests):
+    """Save the digests of compiled auxillary sources"""
+
+    digest_cache = os.path.join(compile_dir,'objects.pkl')
+
+    with open(digest_cache,'wb') as f:
+
+        pkl.dump(digests,f,pkl.HIGHEST_PROTOCOL)
+
+
+def remove_stale_objects(compile_dir,old_sources,aux_source_list):
+    """Remove object files for auxillary sources that are no longer compiled"""
+
+    log = logging.getLogger('abaci')
+
+    current = set(get_object_file(src) for src in aux_source_list)
+
+    for src in old_sources:
+
+        obj_file = get_object_file(src)
+
+        if obj_file in current:
+            continue
+
+        for variant in ('-std','-xpl','-xplD'):
+
+            stale = os.path.join(compile_dir,obj_file.replace('-std',variant))
+
+            if os.path.exists(stale):
+
+                log.debug('Removing stale object file "%s"',relpathshort(stale))
+                os.remove(stale)
+
+
+def compile_auxillary_sources(compile_dir,compile_conf,args,aux_source_list,fflags,cache=None,include_files=()):
+    """
+    Perform separate compilation of auxillary sources files
+
+    Only sources that have changed (or whose flags, included files or module
+    dependencies have changed) since they were last compiled are recompiled,
+    fetching the object file from the compilation cache (if given) where possible.
+    Any change to the project or dependency include_files recompiles all sources.
+
+    Returns the build digests of the compiled sources.
+    """
+
+    log = logging.getLogger('abaci')
+
+    old_digests = load_object_digests(compile_dir)
+
+    remove_stale_objects(compile_dir,old_digests.keys(),aux_source_list)
 
-def compile_auxillary_sources(compile_dir,compile_conf,args,aux_source_list,fflags):
-    """Perform separate compilation of auxillary sources files"""
-    
     if not aux_source_list:
 
-        return
+        save_object_digests(compile_dir,{})
+
+        return {}
     
     cflags = get_cflags(use_gcc=args.gcc,
                       c_flags = compile_conf['cflags'],
@@ -434,21 +839,72 @@ def compile_auxillary_sources(compile_dir,compile_conf,args,aux_source_list,ffla
                       opt_host = compile_conf['opt-host'],
                       noopt = args.noopt) 
 
-    log = logging.getLogger('abaci')
+    def compile_source(src):
+        """Compile a single auxillary source file"""
 
-    log.info('Compiling auxillary sources')
+        if src.endswith('.c') or src.endswith('.cpp'):
+            
+            compile_cpp(args.gcc, cflags, src, args.verbose + 2*args.screen_output,
+                        cache, digests[src])
 
-    with cwd(compile_dir):
+        elif src.endswith(fortran_suffixes):
+
+            compile_fortran(args.gcc, fflags, src, args.verbose + 2*args.screen_output,
+                            cache, digests[src])
+
+        new_digests[src] = digests[src]
+
+    def compile_options(src):
+        """Compiler options that affect the object file for src"""
+
+        # (Independent of the project location, so digests can be shared via the cache)
+        if src.endswith(fortran_suffixes):
+            return ['fortran', args.gcc] + [f.replace(compile_dir,'{DIR}') for f in fflags]
+        else:
+            return ['c', args.gcc] + [f.replace(compile_dir,'{DIR}') for f in cflags]
+
+    # (Relative paths, so that digests can still be shared via the cache)
+    include_digest = hashlist([os.path.relpath(f,compile_dir) + hashfile(f) for f in sorted(include_files)])
+
+    def compile_includes(src):
+        """Digests of the files that src may include"""
+
+        return [include_digest] + get_include_digests(src)
+
+    # Fortran sources must be compiled after the sources of any modules they use
+    dependencies = get_source_dependencies(aux_source_list)
+
+    digests = get_build_digests(aux_source_list, dependencies, compile_options, compile_includes)
+
+    outdated = [src for src in aux_source_list if old_digests.get(src) != digests[src] or
+                not os.path.exists(os.path.join(compile_dir,get_object_file(src)))]
+
+    new_digests = dict((src, digests[src]) for src in aux_source_list if src not in outdated)
+
+    if not outdated:
+
+        log.info('Auxillary sources are up to date')
+
+        save_object_digests(compile_dir,new_digests)
+
+        return new_digests
+
+    log.info('Compiling auxillary sources (%s of %s)',len(outdated),len(aux_source_list))
+
+    # (Up-to-date dependencies don't need to be waited for)
+    outdated_deps = dict((src, dependencies[src] & set(outdated)) for src in outdated)
+
+    try:
+
+        with cwd(compile_dir):
 
-        for src in aux_source_list:
+            parallel_build(outdated, outdated_deps, compile_source, args.njob)
 
-            if src.endswith('.c') or src.endswith('.cpp'):
-                
-                compile_cpp(args.gcc, cflags, src, args.verbose + 2*args.screen_output)
+    finally:
 
-            elif src.endswith(fortran_suffixes):
+        save_object_digests(compile_dir,new_digests)
 
-                compile_fortran(args.gcc, fflags, src, args.verbose + 2*args.screen_output)
+    return new_digests
 
 
 def spool_env_file(compile_dir,fflags,lflags):
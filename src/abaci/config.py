@@ -93,16 +93,32 @@ def config_schema():
                            'reference': unicode,
                            'steps': [unicode],
                            Optional('frames', default='last'): Or(u'all',u'last',[int]),
-                           Optional('elements',default='all'): Or(u'all',[int])})
+                           Optional('elements',default='all'): Or(u'all',[int]),
+                           Optional('atol',default=None): Or(float,int,{unicode: Or(float,int)}),
+                           Optional('rtol',default=None): Or(float,int,{unicode: Or(float,int)})})
+
+    extract_schema = Schema({'fields': [unicode],
+                             'steps': [unicode],
+                             Optional('frames', default='last'): Or(u'all',u'last',[int]),
+                             Optional('elements',default='all'): Or(u'all',[int])})
+
+    watchdog_schema = Schema({Optional('max-time',default=None): Or(unicode,int),
+                              Optional('max-cutbacks',default=None): And(int,lambda n: n >= 0),
+                              Optional('min-increment',default=None): Or(float,int),
+                              Optional('stall-time',default=None): Or(unicode,int)})
 
     job_schema = Schema([{'job-file': unicode,
                          Optional('include',default=[]): Or(unicode,[unicode]), 
                          Optional('tags',default=[]): Or(unicode,[unicode]),
                          Optional('name',default=None): unicode,
                          Optional('mp-mode',default='threads'): Or(u'threads',u'mpi',u'disable'),
+                         Optional('cpus',default=None): And(int,lambda n: n > 0),
+                         Optional('memory',default=None): Or(unicode,int),
                          Optional('abq-flags',default=[]): Or(unicode,[unicode]),
                          Optional('post-process',default=[]): Or(unicode,[unicode]),
                          Optional('check',default=None): check_schema,
+                         Optional('extract',default=None): extract_schema,
+                         Optional('watchdog',default=None): watchdog_schema,
                          Optional('cluster',default=None): job_cluster_schema}])
 
     dependency_schema = Schema([{'name': unicode,
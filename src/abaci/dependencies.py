@@ -1,13 +1,41 @@
 import os
+import re
+import json
 import logging
+import threading
+import cPickle as pkl
+from hashlib import sha1
+from shutil import rmtree
+from tempfile import mkdtemp
+from multiprocessing.pool import ThreadPool
 from abaci import git_utils as git
 from abaci.config import load_config
-from abaci.utils import mkdir
+from abaci.utils import mkdir, get_cache_dir
 from abaci.ssh_utils import setup_ssh_agent, is_ssh_url
 
+# Maximum number of dependencies to fetch at once
+_MAX_FETCH_JOBS = 8
 
-def fetch_dependencies(config, config_dir, verbosity):
-    """Breadth-first fetching of project dependencies via git"""
+# Lock file (in the project directory) recording the resolved dependencies
+_LOCK_FILE = 'abaci.lock'
+_LOCK_VERSION = 1
+
+# Cache of parsed dependency configs (in the dependencies directory)
+_CONFIG_CACHE_FILE = '.abaci-config-cache.pkl'
+
+# Mirrors fetched by this process, and a lock for each mirror
+_mirrors_fetched = set()
+_mirror_locks = {}
+_mirror_locks_lock = threading.Lock()
+
+
+def fetch_dependencies(config, config_dir, verbosity, update_lock=False):
+    """
+    Breadth-first fetching of project dependencies via git
+
+    Dependencies are checked out at their locked commits while the lock file matches
+    the project dependencies, unless update_lock is set.
+    """
     
     # Enqueue dependencies from the root project
     dependencies = list(config['dependency'])
@@ -16,29 +44,57 @@ def fetch_dependencies(config, config_dir, verbosity):
 
         return {}
 
+    deps_dir = os.path.join(config_dir,'dependencies')
+
+    lock_file = os.path.join(config_dir,_LOCK_FILE)
+
+    lock = None if update_lock else read_lock_file(lock_file,dependencies)
+
+    # Fast path: use the locked dependencies without any git calls if they are checked out
+    if lock:
+
+        dep_list = get_locked_dependencies(lock,deps_dir)
+
+        if dep_list is not None:
+
+            log = logging.getLogger('abaci')
+
+            log.debug('Dependencies match lock file "%s"',lock_file)
+
+            return dep_list
+
+    locked = dict((dep['name'], dep) for dep in lock['dependencies']) if lock else {}
+
     if not git.have_git:
 
         raise Exception('git not found, cannot continue: git is required to fetch dependencies.')
 
-    deps_dir = os.path.join(config_dir,'dependencies')
-
     if not os.path.isdir(deps_dir):
 
         mkdir(deps_dir)
 
+    config_cache = load_config_cache(deps_dir)
+
     dep_list = {}
 
     while dependencies:
 
-        dep = dependencies.pop(0)
+        # Fetch each level of the dependency graph concurrently
+        level = []
 
-        if dep['name'] not in dep_list:
+        for dep in dependencies:
 
-            dep_path = fetch_dependency(deps_dir,dep['name'],dep['git'],dep['version'],verbosity)
-                
-            dep_config_file = os.path.join(dep_path,'abaci.toml')
+            if dep['name'] not in dep_list and dep['name'] not in [d['name'] for d in level]:
+
+                level.append(dep)
+
+        fetched = fetch_dependency_level(deps_dir,level,locked,verbosity)
+
+        dependencies = []
+
+        for dep, (dep_path, commit) in zip(level,fetched):
 
-            dep_config, dep_config_dir = load_config(dep_config_file, action='None', echo=False)
+            dep_config = get_dep_config(dep_path,config_cache)
 
             # Check specified name matches that in package config
             if dep['name'] != dep_config['name']:
@@ -46,53 +102,381 @@ def fetch_dependencies(config, config_dir, verbosity):
                 raise Exception('Dependency name mismatch for "{n1}", found name="{n2}" in dependency manifest'.format(
                                 n1=dep['name'],n2=dep_config['name']))
 
-            dep_list[dep['name']] = {'local_path': dep_path, 
-                                     'config': dep_config,
-                                     'git': dep['git'],
-                                     'version': dep['version'],
-                                     'includes': dep_config['compile']['include'],
-                                     'sources': dep_config['compile']['sources']}
+            dep_list[dep['name']] = get_dep_entry(dep,dep_path,dep_config,commit)
             
-            # Enqueue dependencies from this dependency
+            # Enqueue dependencies from this dependency for the next level
             dependencies.extend(dep_config['dependency'])
+
+    save_config_cache(deps_dir,config_cache)
+
+    # (Only rewritten if the resolved dependencies differ from the lock file, e.g. when the project
+    #  dependencies change, a dependency's own dependencies change or on request)
+    write_lock_file(lock_file,config['dependency'],dep_list)
     
     return dep_list
 
 
+def get_dep_entry(dep,dep_path,dep_config,commit):
+    """Get the dependency list entry for a fetched dependency"""
+
+    return {'local_path': dep_path, 
+            'config': dep_config,
+            'git': dep['git'],
+            'version': dep['version'],
+            'commit': commit,
+            'includes': dep_config['compile']['include'],
+            'sources': dep_config['compile']['sources']}
+
+
+def get_dep_spec(dep):
+    """Get the fields of a dependency specification that determine what is fetched"""
+
+    return {'name': dep['name'], 'git': dep['git'], 'version': dep['version']}
+
+
+def get_file_digest(path):
+    """Get the sha1 digest of a file, or None if it doesn't exist"""
+
+    if not os.path.isfile(path):
+
+        return None
+
+    with open(path,'rb') as f:
+
+        return sha1(f.read()).hexdigest()
+
+
+def get_head_commit(dep_path):
+    """
+    Get the commit of a detached HEAD by reading the repository directly
+    (None if HEAD is on a branch or the repository layout is not recognised)
+    """
+
+    head_file = os.path.join(dep_path,'.git','HEAD')
+
+    if not os.path.isfile(head_file):
+
+        return None
+
+    with open(head_file,'r') as f:
+
+        head = f.read().strip()
+
+    if len(head) == 40 and all(c in '0123456789abcdef' for c in head):
+
+        return head
+
+    return None
+
+
+def get_dep_config(dep_path,config_cache):
+    """Load the config of a dependency, reusing the parsed config if its file is unchanged"""
+
+    dep_config_file = os.path.join(dep_path,'abaci.toml')
+
+    digest = get_file_digest(dep_config_file)
+
+    cached = config_cache.get(dep_path)
+
+    if cached and cached['digest'] == digest:
+
+        return cached['config']
+
+    dep_config, dep_config_dir = load_config(dep_config_file, action='None', echo=False)
+
+    config_cache[dep_path] = {'digest': digest, 'config': dep_config}
+
+    return dep_config
+
+
+def load_config_cache(deps_dir):
+    """Load the parsed dependency configs cached in the dependencies directory"""
+
+    cache_file = os.path.join(deps_dir,_CONFIG_CACHE_FILE)
+
+    if not os.path.exists(cache_file):
+
+        return {}
+
+    try:
+
+        with open(cache_file,'rb') as f:
+            return pkl.load(f)
+
+    except Exception:
+
+        return {}
+
+
+def get_cached_digests(config_cache):
+    """Get the config file digest of each cached dependency config"""
+
+    return dict((dep_path, cached['digest']) for dep_path, cached in config_cache.items())
+
+
+def save_config_cache(deps_dir,config_cache):
+    """Save the parsed dependency configs to the dependencies directory"""
+
+    with open(os.path.join(deps_dir,_CONFIG_CACHE_FILE),'wb') as f:
+        pkl.dump(config_cache,f,2)
+
+
+def read_lock_file(lock_file,dependencies):
+    """Read the lock file, returning None if it doesn't exist or doesn't match the project dependencies"""
+
+    log = logging.getLogger('abaci')
+
+    if not os.path.exists(lock_file):
+
+        return None
+
+    try:
+
+        with open(lock_file,'r') as f:
+            lock = json.load(f)
+
+    except ValueError:
+
+        log.warning('(!) Warning, ignoring invalid lock file "%s"',lock_file)
+
+        return None
+
+    if lock.get('version') != _LOCK_VERSION:
+
+        return None
+
+    if lock['root'] != [get_dep_spec(dep) for dep in dependencies]:
+
+        log.info('Project dependencies have changed, updating lock file "%s"',lock_file)
+
+        return None
+
+    return lock
+
+
+def get_locked_version(dep,locked):
+    """Get the version of a dependency to check out: its locked commit if its specification is unchanged"""
+
+    entry = locked.get(dep['name'])
+
+    if entry and get_dep_spec(entry) == get_dep_spec(dep):
+
+        return entry['commit']
+
+    return dep['version']
+
+
+def get_locked_dependencies(lock,deps_dir):
+    """
+    Get the dependency list from a lock file, if every locked dependency is
+    checked out at its locked commit with an unchanged config
+
+    Returns None if the dependencies need fetching.
+    """
+
+    config_cache = None
+
+    cached_digests = None
+
+    dep_list = {}
+
+    for dep in lock['dependencies']:
+
+        dep_path = os.path.join(deps_dir,dep['name'])
+
+        if get_head_commit(dep_path) != dep['commit']:
+
+            return None
+
+        if get_file_digest(os.path.join(dep_path,'abaci.toml')) != dep['config-digest']:
+
+            return None
+
+        if config_cache is None:
+
+            config_cache = load_config_cache(deps_dir)
+
+            cached_digests = get_cached_digests(config_cache)
+
+        dep_config = get_dep_config(dep_path,config_cache)
+
+        dep_list[dep['name']] = get_dep_entry(dep,dep_path,dep_config,dep['commit'])
+
+    if get_cached_digests(config_cache) != cached_digests:
+
+        save_config_cache(deps_dir,config_cache)
+
+    return dep_list
+
+
+def write_lock_file(lock_file,dependencies,dep_list):
+    """Record the resolved dependencies in the lock file (if changed)"""
+
+    locked = []
+
+    for name in sorted(dep_list.keys()):
+
+        dep = dep_list[name]
+
+        entry = get_dep_spec(dict(dep,name=name))
+
+        entry['commit'] = dep['commit']
+        entry['config-digest'] = get_file_digest(os.path.join(dep['local_path'],'abaci.toml'))
+
+        locked.append(entry)
+
+    lock = json.dumps({'version': _LOCK_VERSION,
+                       'root': [get_dep_spec(dep) for dep in dependencies],
+                       'dependencies': locked}, indent=1, sort_keys=True)
+
+    if os.path.exists(lock_file):
+
+        with open(lock_file,'r') as f:
+
+            if f.read() == lock:
+
+                return
+
+    with open(lock_file,'w') as f:
+        f.write(lock)
+
+
+def fetch_dependency_level(deps_dir,level,locked,verbosity):
+    """
+    Fetch a list of dependencies concurrently (at their locked commits, if any) and
+    return the path to each local repository with its current commit
+    """
+
+    if not level:
+
+        return []
+
+    # (The ssh agent sets environment variables, so set it up before starting threads)
+    if any(is_ssh_url(dep['git']) for dep in level):
+
+        setup_ssh_agent()
+
+    pool = ThreadPool(min(len(level),_MAX_FETCH_JOBS))
+
+    try:
+
+        return pool.map(lambda dep: fetch_dependency(deps_dir,dep['name'],dep['git'],
+                                                     get_locked_version(dep,locked),verbosity), level)
+
+    finally:
+
+        pool.close()
+        pool.join()
+
+
+def get_mirror_path(dep_git):
+    """Get the path of the shared bare mirror for an upstream repository"""
+
+    name = re.sub(r'[^\w.-]','_',dep_git.rstrip('/\\').split('/')[-1])
+
+    if name.endswith('.git'):
+        name = name[:-4]
+
+    return os.path.join(get_cache_dir(),'git','{name}-{h}.git'.format(
+                                name=name,h=sha1(dep_git.encode('utf-8')).hexdigest()[:16]))
+
+
+def get_mirror(dep_git,dep_version=None):
+    """
+    Get a local bare mirror of an upstream repository, shared between projects,
+    containing dep_version (or the latest upstream changes if dep_version is None)
+
+    Each mirror is fetched at most once per abaci invocation, and not at all if it
+    already contains dep_version (unless it's a branch).
+    Returns None if the mirror can't be used.
+    """
+
+    log = logging.getLogger('abaci')
+
+    mirror = get_mirror_path(dep_git)
+
+    with _mirror_locks_lock:
+
+        lock = _mirror_locks.setdefault(mirror,threading.Lock())
+
+    with lock:
+
+        try:
+
+            if not os.path.isdir(mirror):
+
+                log.debug('Creating mirror of "%s" in "%s"',dep_git,mirror)
+
+                mirror_dir = os.path.dirname(mirror)
+
+                if not os.path.isdir(mirror_dir):
+
+                    os.makedirs(mirror_dir)
+
+                # (Clone to a temporary directory, in case another process is creating the same mirror)
+                temp_dir = mkdtemp(dir=mirror_dir)
+
+                git.clone_mirror(dep_git,temp_dir)
+
+                try:
+
+                    os.rename(temp_dir,mirror)
+
+                except OSError:
+
+                    rmtree(temp_dir,ignore_errors=True)
+
+                _mirrors_fetched.add(mirror)
+
+            elif mirror not in _mirrors_fetched and (dep_version is None or 
+                                                      not git.has_commit(mirror,dep_version) or 
+                                                      git.is_branch(mirror,dep_version)):
+
+                log.debug('Updating mirror of "%s"',dep_git)
+
+                git.fetch(mirror)
+
+                _mirrors_fetched.add(mirror)
+
+        except Exception as e:
+
+            log.debug('Unable to use mirror of "%s": %s',dep_git,e)
+
+            return None
+
+    return mirror
+
+
 def fetch_dependency(deps_dir,dep_name,dep_git,dep_version,verbosity):
-    """Fetch a single dependency via git and return path to local repository"""
+    """Fetch a single dependency via git and return path to local repository with its current commit"""
 
     log = logging.getLogger('abaci')
 
     dep_path = os.path.join(deps_dir,dep_name)
 
-    if is_ssh_url(dep_git):
-            
-        setup_ssh_agent()
-            
     if not os.path.isdir(dep_path):
 
         log.info('Fetching dependency "{dep}" ({ver})'.format(dep=dep_name,ver=dep_version))
 
-        git.clone(dep_git,deps_dir,dep_name,verbosity)
+        # (Objects are copied from the shared mirror, so only missing objects are downloaded)
+        git.clone(dep_git,deps_dir,dep_name,verbosity,reference=get_mirror(dep_git,dep_version))
 
         git.checkout(dep_path,dep_version,verbosity)
 
-    is_dirty = git.is_dirty(dep_path)
-    if is_dirty:
+    # (One git status call gives the commit, branch and modification state)
+    status = git.get_status(dep_path)
+
+    if status['dirty']:
 
         log.warning("(!) Warning, dependency {dep} has modified code - the current configuration is not reproducible.\n\t"
                         "To ensure others to use your changes, commit them to the upstream repository at:\n\t {upstream}".format(dep=dep_name,upstream=dep_git))
 
-    current_tag = git.get_tag(dep_path)
-    current_commit = git.current_commit(dep_path)
-    
-    needs_update = not git.is_head_detached(dep_path) or \
-        (current_commit != dep_version and current_tag != dep_version)
+    needs_update = not status['detached'] or \
+        (status['commit'] != dep_version and git.get_tag(dep_path) != dep_version)
 
     if needs_update:
 
-        if is_dirty:
+        if status['dirty']:
 
             log.warning("(!) Warning, dependency {dep} cannot be updated to version '{ver}' because it contains modified code.\n\t".format(
                         dep=dep_name,ver=dep_version))
@@ -101,22 +485,24 @@ def fetch_dependency(deps_dir,dep_name,dep_git,dep_version,verbosity):
 
             log.info('Updating dependency "{dep}" to {ver}'.format(dep=dep_name,ver=dep_version))
 
+            get_mirror(dep_git)
+
             git.fetch(dep_path)
             git.checkout(dep_path,dep_version,verbosity)
+
+            status = git.get_status(dep_path)
             
             # Merge changes from upstream if on a branch
-            if not git.is_head_detached(dep_path):
+            if not status['detached']:
                 
                 git.merge_remote(dep_path)
 
-    if not git.is_head_detached(dep_path):
-
-        log.warning('(!) Warning, dependency {dep} is not pinned to a specific commit/tag - the current configuration is not reproducible.'.format(dep=dep_name))
-
-    current = git.get_tag(dep_path) or git.current_commit(dep_path)
-    log.debug('Dependency {dep} is at {h}'.format(dep=dep_name,h=current))
+                status = git.get_status(dep_path)
 
-    return dep_path
+    if not status['detached']:
 
+        log.warning('(!) Warning, dependency {dep} is not pinned to a specific commit/tag - the current configuration is not reproducible.'.format(dep=dep_name))
 
+    log.debug('Dependency {dep} is at {h}'.format(dep=dep_name,h=status['commit']))
 
+    return dep_path, status['commit']
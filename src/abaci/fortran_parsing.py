@@ -1,5 +1,7 @@
 import re
 
+fortran_suffixes = ('.f','.f90','.for','.F90')
+
 indent = r'^\s*'
 sep = r'\s+'
 
@@ -17,13 +19,26 @@ end_module_stmt = indent + r'end' + sep + r'module'
 
 end_module_match = re.compile(end_module_stmt,flags=re.IGNORECASE)
 
+use_stmt = indent + r'use' + r'(?:\s*,\s*(intrinsic|non_intrinsic))?' + r'(?:\s*::\s*|\s+)' + ident
+
+use_match = re.compile(use_stmt,flags=re.IGNORECASE)
+
+# (Fortran include lines and preprocessor #include directives)
+include_stmt = indent + r'(?:#\s*)?include' + r'\s*[\'"<]([^\'">]+)[\'">]'
+
+include_match = re.compile(include_stmt,flags=re.IGNORECASE)
+
+# Keywords that can follow 'module' without being a module definition
+not_module_names = ('procedure','subroutine','function')
+
 
 def parse_fortran_line(line):
     """Lightweight parsing of necessary fortran statements"""
 
     stmt_parsers = [('subroutine',sub_match),
                     ('module',module_match),
-                    ('end module',end_module_match)]
+                    ('end module',end_module_match),
+                    ('use',use_match)]
 
     for parser in stmt_parsers:
 
@@ -78,4 +93,57 @@ def parse_fortran_file(file):
             sub_name = matches[0].lower()
             modules[mod_name]['subroutines'].append(sub_name)
 
-    return modules
\ No newline at end of file
+    return modules
+
+
+def parse_fortran_dependencies(file):
+    """
+    Find the modules defined (provides) and used (requires) by a Fortran file
+
+    Intrinsic modules and modules defined in the same file are not included in requires.
+    """
+
+    provides = set()
+    requires = set()
+
+    with open(file,'r') as fh:
+
+        for line in fh:
+
+            parser, matches = parse_fortran_line(line)
+
+            if parser == 'module':
+
+                mod_name = matches[0].lower()
+
+                if mod_name not in not_module_names:
+
+                    provides.add(mod_name)
+
+            elif parser == 'use':
+
+                if matches[0] and matches[0].lower() == 'intrinsic':
+
+                    continue
+
+                requires.add(matches[1].lower())
+
+    return provides, requires - provides
+
+
+def parse_fortran_includes(file):
+    """Find the file names referenced by Fortran include lines or preprocessor includes in a file"""
+
+    includes = []
+
+    with open(file,'r') as fh:
+
+        for line in fh:
+
+            match = include_match.match(line)
+
+            if match:
+
+                includes.append(match.groups()[0])
+
+    return includes
@@ -0,0 +1,101 @@
+from bisect import bisect_left
+
+# (Helpers for odb_diff.py, kept free of odbAccess so they can be tested outside Abaqus python)
+
+# Relative tolerance for matching frame values
+_FRAME_VALUE_TOL = 1e-9
+
+
+def is_increasing(values):
+    """Check if a sequence of values is strictly increasing"""
+
+    return all(a < b for a, b in zip(values,values[1:]))
+
+
+def align_frames(ref_values,out_values,by_value=True):
+    """
+    Match each reference frame with the output frames at the same frame value
+
+    Returns (pairs, unmatched) where pairs is a list of (ref_frame, [(out_frame, weight),...])
+    and the output data is the weighted sum of the output frames: a single frame
+    where the frame values match, otherwise two frames to interpolate between.
+    Reference frames outside the range of output frame values (e.g. from a
+    truncated run) can't be matched and are listed in unmatched.
+
+    Frames are matched by index instead if by_value is False (e.g. for the modes of
+    a frequency or buckle step) or if the output frame values aren't increasing
+    (e.g. in a restarted step).
+    """
+
+    pairs = []
+    unmatched = []
+
+    if not by_value or not is_increasing(out_values):
+
+        for i in range(len(ref_values)):
+
+            if i < len(out_values):
+                pairs.append((i, [(i, 1.0)]))
+            else:
+                unmatched.append(i)
+
+        return pairs, unmatched
+
+    for i, t in enumerate(ref_values):
+
+        tol = _FRAME_VALUE_TOL*max(1.0,abs(t))
+
+        j = bisect_left(out_values,t-tol)
+
+        if j < len(out_values) and abs(out_values[j] - t) <= tol:
+
+            pairs.append((i, [(j, 1.0)]))
+
+        elif 0 < j < len(out_values):
+
+            w = (t - out_values[j-1])/(out_values[j] - out_values[j-1])
+
+            pairs.append((i, [(j-1, 1.0-w), (j, w)]))
+
+        else:
+
+            unmatched.append(i)
+
+    return pairs, unmatched
+
+
+def combine_frames(weights,get_data):
+    """
+    Get the weighted sum of frame data, where get_data(frame) returns the data
+    for an output frame (only called once for an exactly matching frame)
+    """
+
+    data = None
+
+    for j, w in weights:
+
+        frame_data = get_data(j)
+
+        if w == 1.0:
+            return frame_data
+
+        if data is None:
+            data = w*frame_data
+        else:
+            data = data + w*frame_data
+
+    return data
+
+
+def summarise_results(results):
+    """Get the rms of the rms differences and the maximum difference of field results (None if no results)"""
+
+    rms = [r['rms'] for r in results if r['rms'] is not None]
+
+    if not rms:
+        return None, None
+
+    rms_diff = (sum(d**2 for d in rms)/len(rms))**0.5
+    max_diff = max(r['max-abs'] for r in results if r['rms'] is not None)
+
+    return rms_diff, max_diff
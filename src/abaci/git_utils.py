@@ -1,6 +1,8 @@
 import os
 import subprocess
-from abaci.utils import cwd
+
+# (Commands run with cwd= rather than changing directory, so that these
+#  helpers can be called concurrently from worker threads)
 
 
 def have_git():
@@ -20,29 +22,68 @@ def isa_git_repo(git_path):
 
     devnull = open(os.devnull,'w')
 
-    with cwd(git_path, quiet=True):
-
-        git_cmd = ['git', 'status']
-        
-        stat =  subprocess.call(git_cmd,stdout=devnull,stderr=devnull)
+    git_cmd = ['git', 'status']
+    
+    stat =  subprocess.call(git_cmd,stdout=devnull,stderr=devnull,cwd=git_path)
 
     return stat == 0
 
 
-def clone(git_path,working_dir,target_dir,verbosity):
-    """Clone a git repository"""
+def clone(git_path,working_dir,target_dir,verbosity,reference=None):
+    """
+    Clone a git repository, copying objects from a local reference repository (if given)
+    instead of downloading them
+
+    (The clone is dissociated from the reference, so it doesn't depend on the reference
+     repository once cloned)
+    """
     
     devnull = open(os.devnull,'w')
 
-    with cwd(working_dir, quiet=True):
+    git_cmd = ['git', 'clone', git_path, target_dir]
+
+    if reference:
+
+        git_cmd[2:2] = ['--reference', reference, '--dissociate']
+
+    stat = subprocess.call(git_cmd,stdout=devnull,stderr=devnull,cwd=working_dir)
+
+    if stat:
+
+        raise Exception('Error while cloning repository {repo}'.format(repo=git_path))
+
+
+def clone_mirror(git_path,mirror_path):
+    """Clone a bare mirror of a git repository for use as a clone reference"""
+
+    devnull = open(os.devnull,'w')
+
+    subprocess.check_call(['git', 'clone', '--mirror', git_path, mirror_path],
+                            stdout=devnull,stderr=devnull)
+
+
+def has_commit(git_path,git_ref):
+    """Check if a branch/tag/commit exists in a local repository"""
+
+    devnull = open(os.devnull,'w')
+
+    git_cmd = ['git', 'rev-parse', '--verify', '--quiet', git_ref+'^{commit}']
 
-        git_cmd = ['git', 'clone', git_path, target_dir]
+    stat = subprocess.call(git_cmd,stdout=devnull,stderr=devnull,cwd=git_path)
 
-        stat = subprocess.call(git_cmd,stdout=devnull,stderr=devnull)
+    return stat == 0
 
-        if stat:
 
-            raise Exception('Error while cloning repository {repo}'.format(repo=git_path))
+def is_branch(git_path,git_ref):
+    """Check if a reference is a branch in a local repository"""
+
+    devnull = open(os.devnull,'w')
+
+    git_cmd = ['git', 'show-ref', '--verify', '--quiet', 'refs/heads/'+git_ref]
+
+    stat = subprocess.call(git_cmd,stdout=devnull,stderr=devnull,cwd=git_path)
+
+    return stat == 0
 
 
 def checkout(git_path,git_ref,verbosity):
@@ -50,30 +91,68 @@ def checkout(git_path,git_ref,verbosity):
     
     devnull = open(os.devnull,'w')
 
-    with cwd(git_path, quiet=True):
-
-        git_cmd = ['git', 'checkout', git_ref]
-        
-        stat = subprocess.call(git_cmd,stdout=devnull,stderr=devnull)
+    git_cmd = ['git', 'checkout', git_ref]
+    
+    stat = subprocess.call(git_cmd,stdout=devnull,stderr=devnull,cwd=git_path)
 
-        if stat:
+    if stat:
 
-            raise Exception('Error while checking out reference {ref} in {repo}'.format(
-                                ref=git_ref,repo=git_path))
+        raise Exception('Error while checking out reference {ref} in {repo}'.format(
+                            ref=git_ref,repo=git_path))
 
     return stat
 
 
+def get_status(git_path):
+    """
+    Get the state of a local repository
+
+    Returns a dict with:
+     'commit': the commit of HEAD (None before the first commit)
+     'detached': True if HEAD is detached
+     'dirty': True if tracked files have been modified
+    """
+
+    # (Porcelain v1 and rev-parse rather than --porcelain=v2, which needs git >= 2.11)
+    git_cmd = ['git', 'status', '--porcelain', '--branch', '--untracked-files=no']
+
+    output = subprocess.check_output(git_cmd,cwd=git_path)
+
+    status = {'commit': None, 'detached': False, 'dirty': False}
+
+    for line in output.splitlines():
+
+        if line.startswith('## '):
+
+            status['detached'] = line.startswith('## HEAD (no branch)')
+
+        elif line.strip():
+
+            status['dirty'] = True
+
+    devnull = open(os.devnull,'w')
+
+    git_cmd = ['git', 'rev-parse', '--verify', '--quiet', 'HEAD']
+
+    proc = subprocess.Popen(git_cmd,stdout=subprocess.PIPE,stderr=devnull,cwd=git_path)
+
+    commit = proc.communicate()[0].strip()
+
+    if proc.returncode == 0 and commit:
+
+        status['commit'] = commit
+
+    return status
+
+
 def is_head_detached(git_path):
     """Check if HEAD is detached in a local repository"""
 
     devnull = open(os.devnull,'w')
     
-    with cwd(git_path, quiet=True):
-
-        git_cmd = ['git', 'symbolic-ref', '-q', 'HEAD']
-                
-        stat =  subprocess.call(git_cmd,stdout=devnull,stderr=devnull)
+    git_cmd = ['git', 'symbolic-ref', '-q', 'HEAD']
+            
+    stat =  subprocess.call(git_cmd,stdout=devnull,stderr=devnull,cwd=git_path)
 
     return stat != 0
 
@@ -83,11 +162,9 @@ def is_dirty(git_path):
 
     devnull = open(os.devnull,'w')
 
-    with cwd(git_path, quiet=True):
-
-        git_cmd = ['git', 'diff', '--quiet']
-        
-        stat =  subprocess.call(git_cmd,stdout=devnull,stderr=devnull)
+    git_cmd = ['git', 'diff', '--quiet']
+    
+    stat =  subprocess.call(git_cmd,stdout=devnull,stderr=devnull,cwd=git_path)
 
     return stat != 0
 
@@ -95,11 +172,9 @@ def is_dirty(git_path):
 def current_commit(git_path):
     """Get the current commit of HEAD"""
 
-    with cwd(git_path, quiet=True):
-
-        git_cmd = ['git', 'show', '--format=%H', '-s']
-        
-        return subprocess.check_output(git_cmd).strip()
+    git_cmd = ['git', 'show', '--format=%H', '-s']
+    
+    return subprocess.check_output(git_cmd,cwd=git_path).strip()
 
 
 def get_tag(git_path):
@@ -107,14 +182,12 @@ def get_tag(git_path):
 
     devnull = open(os.devnull,'w')
 
-    with cwd(git_path, quiet=True):
-
-        git_cmd = ['git', 'describe', '--tags', 'HEAD']
-        
-        try:
-            return subprocess.check_output(git_cmd,stderr=devnull).strip()
-        except(subprocess.CalledProcessError):
-            return None
+    git_cmd = ['git', 'describe', '--tags', 'HEAD']
+    
+    try:
+        return subprocess.check_output(git_cmd,stderr=devnull,cwd=git_path).strip()
+    except(subprocess.CalledProcessError):
+        return None
 
 
 def init_bare(path):
@@ -122,19 +195,17 @@ def init_bare(path):
 
     devnull = open(os.devnull,'w')
 
-    with cwd(path, quiet=True):
+    try:
 
-        try:
-
-            git_cmd = ['git', 'init', '--bare', '--initial-branch=master']
-            
-            subprocess.check_call(git_cmd,stdout=devnull,stderr=devnull)
+        git_cmd = ['git', 'init', '--bare', '--initial-branch=master']
+        
+        subprocess.check_call(git_cmd,stdout=devnull,stderr=devnull,cwd=path)
 
-        except:
+    except:
 
-            git_cmd.pop(-1)
+        git_cmd.pop(-1)
 
-            subprocess.check_call(git_cmd,stdout=devnull,stderr=devnull)
+        subprocess.check_call(git_cmd,stdout=devnull,stderr=devnull,cwd=path)
 
 
 def add_and_commit(path,message):
@@ -142,19 +213,15 @@ def add_and_commit(path,message):
 
     devnull = open(os.devnull,'w')
 
-    with cwd(path, quiet=True):
-        
-        subprocess.check_call(['git', 'add', '-A'],stdout=devnull,stderr=devnull)
+    subprocess.check_call(['git', 'add', '-A'],stdout=devnull,stderr=devnull,cwd=path)
 
-        subprocess.check_call(['git', 'commit', '-m', message,'--allow-empty'],stdout=devnull,stderr=devnull)
+    subprocess.check_call(['git', 'commit', '-m', message,'--allow-empty'],stdout=devnull,stderr=devnull,cwd=path)
 
 
 def add_tag(path,tag):
     """Helper to tag commit"""
     
-    with cwd(path, quiet=True):
-
-        subprocess.check_call(['git', 'tag', tag])
+    subprocess.check_call(['git', 'tag', tag],cwd=path)
 
 
 def push(path):
@@ -162,9 +229,7 @@ def push(path):
 
     devnull = open(os.devnull,'w')
 
-    with cwd(path, quiet=True):
-
-        subprocess.check_call(['git', 'push','--tags', 'origin', 'master'],stdout=devnull,stderr=devnull)
+    subprocess.check_call(['git', 'push','--tags', 'origin', 'master'],stdout=devnull,stderr=devnull,cwd=path)
 
 
 def fetch(path):
@@ -172,9 +237,7 @@ def fetch(path):
 
     devnull = open(os.devnull,'w')
 
-    with cwd(path, quiet=True):
-
-        subprocess.check_call(['git', 'fetch'],stdout=devnull,stderr=devnull)
+    subprocess.check_call(['git', 'fetch'],stdout=devnull,stderr=devnull,cwd=path)
 
 
 def merge_remote(path):
@@ -182,6 +245,4 @@ def merge_remote(path):
 
     devnull = open(os.devnull,'w')
 
-    with cwd(path, quiet=True):
-
-        subprocess.check_call(['git', 'merge', 'FETCH_HEAD'],stdout=devnull,stderr=devnull)
\ No newline at end of file
+    subprocess.check_call(['git', 'merge', 'FETCH_HEAD'],stdout=devnull,stderr=devnull,cwd=path)
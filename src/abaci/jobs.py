@@ -1,12 +1,28 @@
 import logging
 import os
 import signal
-import time
+import glob
+import multiprocessing
+from multiprocessing.pool import ThreadPool
 from abaci.AbaqusJob import AbaqusJob
-from abaci.utils import get_current_env_modules
+from abaci.ContentStore import ContentStore
+from abaci.ChildWatcher import ChildWatcher
+from abaci.OutputTailer import OutputTailer
+from abaci.JobProgress import ProgressDisplay, JobWatchdog
+from abaci.utils import get_current_env_modules, parse_memory, parse_duration, relpathshort, mkdir
+import abaci.slurm as slurm
 
 import cPickle as pkl
 
+# (A timeout is needed for blocking waits on results to remain interruptible on Python 2)
+_MAX_WAIT = 1e6
+
+# Interval (seconds) between checking running jobs against their watchdog rules
+_WATCHDOG_INTERVAL = 5
+
+# Cluster settings which must be the same for all jobs in a bundle (SLURM option names)
+_BUNDLE_SETTINGS = ['partition', 'account', 'mem_per_cpu', 'email']
+
 def get_jobs(args,config):
     """Get list of jobs to run"""
 
@@ -53,13 +69,57 @@ def get_jobs(args,config):
     return jobs
 
 
-def submit_jobs(compile_dir,jobs,interactive,no_submit):
-    """Submit jobs to cluster job scheduler"""
+def submit_jobs(compile_dir,jobs,interactive,no_submit,no_array=False,bundle=None):
+    """
+    Submit jobs to cluster job scheduler
+
+    Jobs with identical cluster settings are submitted together as a SLURM
+    job array with a single sbatch call, unless no_array is set.
+    If bundle is given, jobs are instead run within a single allocation of bundle
+    CPUs for each group of jobs with the same partition, account, memory and email
+    settings (see submit_bundle).
+    """
 
     modules = get_current_env_modules()
 
     log = logging.getLogger('abaci')
 
+    if bundle is not None:
+
+        bundles = {}
+        bundle_keys = []
+
+        for job in jobs:
+
+            if interactive:
+
+                log.info('Prompt user for job settings for "{j}"'.format(j=job.name))
+                job.cluster_config_interactive_override()
+
+            sbatch_options = job.get_sbatch_options()
+
+            key = tuple(sbatch_options.get(k) for k in _BUNDLE_SETTINGS)
+
+            if key not in bundles:
+
+                bundles[key] = []
+                bundle_keys.append(key)
+
+            bundles[key].append(job)
+
+        if len(bundle_keys) > 1:
+
+            log.info('Jobs have different partition, account, memory or email settings: submitting %s bundles',len(bundle_keys))
+
+        for key in bundle_keys:
+
+            submit_bundle(compile_dir,bundles[key],no_submit,bundle,modules)
+
+        return
+
+    groups = {}
+    group_keys = []
+
     for job in jobs:
 
         if interactive:
@@ -71,65 +131,463 @@ def submit_jobs(compile_dir,jobs,interactive,no_submit):
 
         job.spool_job_script(modules)
 
-        if not no_submit:
+        # (Group by settings now, since jobs can share their cluster settings)
+        key = tuple(sorted(job.get_sbatch_options().items()))
+
+        if key not in groups:
+
+            groups[key] = []
+            group_keys.append(key)
+
+        groups[key].append(job)
+
+    for key in group_keys:
+
+        group = groups[key]
+
+        if no_array or len(group) == 1:
+
+            for job in group:
+
+                if not no_submit:
+
+                    job.submit_job()
+
+            continue
+
+        for i in range(0,len(group),slurm._MAX_ARRAY_SIZE):
+
+            submit_job_array(group[i:i+slurm._MAX_ARRAY_SIZE],dict(key),no_submit)
+
+
+def submit_job_array(jobs,sbatch_options,no_submit):
+    """Prepare and submit a SLURM job array for jobs which have the same cluster settings"""
+
+    log = logging.getLogger('abaci')
+
+    array_dir = get_new_submit_dir(os.path.dirname(jobs[0].job_dir),'slurm-array')
+
+    script = os.path.join(array_dir,'sljob')
+
+    slurm.spool_array_script(script,os.path.join(array_dir,'job-dirs.txt'),
+                             [os.path.abspath(job.job_dir) for job in jobs],jobs[0].job_script,
+                             job_name='abaci-array',**sbatch_options)
+
+    log.info('Prepared SLURM job array for %s jobs in directory "%s"',len(jobs),relpathshort(array_dir))
+
+    if no_submit:
+        return
+
+    log.info('Submitting %s abaqus jobs as a SLURM job array',len(jobs))
+
+    job_id = slurm.submit_job(array_dir,script,[])
+
+    log.info('Job array id is "%s"',job_id)
+
+    for i, job in enumerate(jobs):
+
+        log.debug('Job "%s" is array task %s_%s',job.name,job_id,i)
+
+
+def submit_bundle(compile_dir,jobs,no_submit,ncpu,modules):
+    """
+    Prepare and submit a single SLURM allocation of ncpu CPUs on one node within
+    which the jobs are run by the abaci scheduler (abaci run --bundle-dir)
+
+    The jobs must have the same partition, account, memory and email settings.
+    The time limit is estimated from the time limits of the jobs, packed into the
+    allocation in waves.
+    """
+
+    import abaci.abaqus as abq
+
+    log = logging.getLogger('abaci')
+
+    for job in jobs:
+
+        # (Jobs run locally within the allocation with their cluster number of processors)
+        job.cpus = job.cpus or job.get_cluster_nproc()
+
+        if job.get_cpus(1) > ncpu:
+
+            raise Exception('Job "{j}" needs {n} CPUs, more than the {ncpu} CPUs requested for the bundle'.format(
+                                j=job.name,n=job.get_cpus(1),ncpu=ncpu))
+
+        job.prepare_job(compile_dir)
+
+    job_cpus = [job.get_cpus(1) for job in jobs]
+
+    job_times = [parse_duration(job.get_sbatch_options()['time']) for job in jobs]
+
+    bundle_time = get_bundle_time(job_cpus,job_times,ncpu)
+
+    bundle_dir = get_new_submit_dir(os.path.dirname(jobs[0].job_dir),'slurm-bundle')
+
+    with open(os.path.join(bundle_dir,'job-dirs.txt'),'w') as f:
+
+        for job in jobs:
+
+            f.write(os.path.abspath(job.job_dir)+'\n')
+
+    abaci_main = os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))),'abaci_main.py')
+
+    cmd = abq.abaqus_cmd(['python',abaci_main,'run','--bundle-dir',os.path.abspath(bundle_dir),
+                          '-j','--cpus','${{SLURM_CPUS_PER_TASK:-{n}}}'.format(n=ncpu),'--progress'],noshell=True)
+
+    # (Settings shared by all jobs in the bundle, on a single node)
+    sbatch_options = dict((k, jobs[0].get_sbatch_options().get(k)) for k in _BUNDLE_SETTINGS)
+    sbatch_options.update({'time': slurm.format_time(bundle_time),
+                           'nodes': 1, 'tasks_per_node': 1, 'cpus_per_task': ncpu})
+
+    script = os.path.join(bundle_dir,'sljob')
+
+    slurm.spool_job_script(script,modules,[' '.join(cmd)],job_name='abaci-bundle',**sbatch_options)
+
+    log.info('Prepared SLURM bundle of %s jobs on %s CPUs for %s in directory "%s"',len(jobs),ncpu,
+                sbatch_options['time'],relpathshort(bundle_dir))
+
+    if no_submit:
+        return
+
+    log.info('Submitting %s abaqus jobs as a single SLURM job',len(jobs))
+
+    job_id = slurm.submit_job(bundle_dir,script,[])
+
+    log.info('Job id is "%s"',job_id)
+
+
+def get_bundle_time(job_cpus,job_times,ncpu):
+    """
+    Estimate the time (seconds) to run jobs within ncpu CPUs, assuming each job
+    takes its full time limit and jobs are launched in order (first-fit) as CPUs free up
+    """
+
+    queued = zip(job_cpus,job_times)
+
+    running = []
+
+    now = 0
+
+    while queued:
+
+        cpus_free = ncpu - sum(cpus for cpus, end in running)
+
+        candidates = [j for j in queued if j[0] <= cpus_free]
+
+        if candidates:
+
+            cpus, duration = candidates[0]
+
+            queued.remove(candidates[0])
+
+            running.append((cpus, now + duration))
+
+            continue
+
+        # Wait for the next job to finish
+        now = min(end for cpus, end in running)
+
+        running = [(cpus, end) for cpus, end in running if end > now]
+
+    return max(end for cpus, end in running)
+
+
+def load_bundle(bundle_dir):
+    """Load the jobs prepared by submit_bundle, returns the jobs and their output directory"""
+
+    with open(os.path.join(bundle_dir,'job-dirs.txt'),'r') as f:
+
+        job_dirs = [line.strip() for line in f if line.strip()]
+
+    jobs = []
+
+    for job_dir in job_dirs:
+
+        with open(os.path.join(job_dir,'abaci-cache.pkl'),'r') as f:
+
+            jobs.append(pkl.load(f))
+
+    return jobs, os.path.dirname(os.path.abspath(bundle_dir))
+
+
+def prune_job_store(output_dir):
+    """Remove files from the job file store which are no longer used by any job directory"""
+
+    log = logging.getLogger('abaci')
+
+    store_dir = os.path.join(output_dir,'store')
+
+    if not os.path.isdir(store_dir):
+        return
+
+    try:
+
+        removed = ContentStore(store_dir).prune()
+
+    except (OSError, IOError) as e:
+
+        log.warning('(!) Unable to prune the job file store: %s',e)
+
+        return
+
+    if removed:
+
+        log.info('Removed %s unused files from the job file store',removed)
+
+
+def get_new_submit_dir(output_dir,name):
+    """Create a new directory <output_dir>/<name>_<n> for cluster submission files"""
+
+    stem = os.path.join(output_dir,name+'_{counter}')
+
+    counter = 0
+
+    while os.path.isdir(stem.format(counter=counter)):
+
+        counter = counter + 1
+
+    submit_dir = stem.format(counter=counter)
+
+    mkdir(submit_dir)
+
+    return submit_dir
+
+
+def load_job_history(output_dir):
+    """Load the runtime history (seconds) of previously completed jobs"""
+
+    history_file = os.path.join(output_dir,'job-history.pkl')
+
+    if not os.path.isfile(history_file):
+
+        return {}
+
+    with open(history_file,'rb') as f:
+
+        return pkl.load(f)
+
+
+def save_job_history(output_dir,history):
+    """Save the runtime history of completed jobs"""
+
+    history_file = os.path.join(output_dir,'job-history.pkl')
 
-            job.submit_job()
+    with open(history_file,'wb') as f:
 
+        pkl.dump(history,f,pkl.HIGHEST_PROTOCOL)
 
-def run_jobs(args,compile_dir,jobs):
-    """Launch jobs concurrently and wait for completion"""
 
-    launched = []
+def order_jobs(jobs,job_keys,history):
+    """
+    Order jobs longest-expected-first based on previous runtimes to
+    minimise the total time for concurrent jobs.
+    Jobs with no history are launched first (in their original order).
+    """
+
+    log = logging.getLogger('abaci')
+
+    def expected_duration(job):
+
+        return history.get(job_keys[job],float('inf'))
+
+    ordered = sorted(jobs,key=expected_duration,reverse=True)
+
+    for job in ordered:
+
+        if job_keys[job] in history:
+
+            log.debug('Job "%s" expected duration: %s s',job.name,history[job_keys[job]])
+
+    return ordered
+
+
+def run_jobs(args,compile_dir,jobs,output_dir=None,on_complete=None):
+    """
+    Launch jobs concurrently and wait for completion
+
+    Rather than polling on a fixed interval, the scheduler blocks until a
+    child process exits and then launches the next queued job immediately.
+    Jobs are packed against the CPU (and optionally memory) budget given by
+    args.cpus and args.mem, as well as the maximum number of jobs args.njob.
+    If output_dir is given, jobs are ordered by (and update) the runtime
+    history stored there.
+    Jobs with watchdog rules are checked every few seconds and terminated
+    (freeing their resources for queued jobs) if they break a rule.
+    If given, on_complete(job,stat) is called as soon as each job finishes.
+    Returns the exit status of each job (in the same order as jobs).
+    """
+
+    log = logging.getLogger('abaci')
+
+    running = []
+    stats = {}
+    watchdogs = {}
+    aborted = set()
+
+    job_cpus = dict((job, job.get_cpus(args.nproc)) for job in jobs)
+
+    if output_dir:
+
+        history = load_job_history(output_dir)
+
+        job_keys = dict((job, job.get_history_key(job.cpus or args.nproc)) for job in jobs)
+
+        queued = order_jobs(jobs,job_keys,history)
+
+    else:
+
+        queued = list(jobs)
+
+    mem_budget = parse_memory(args.mem)
+
+    # Core ids available for pinning: (one entry per CPU in the budget)
+    ncore = multiprocessing.cpu_count()
+    free_cores = [i % ncore for i in range(args.cpus)]
+    job_cores = {}
+
+    from distutils.spawn import find_executable
+
+    if args.pin and not find_executable('taskset'):
+        log.warning('(!) Unable to find "taskset" command, jobs will not be pinned to CPU cores')
+        args.pin = False
+
+    def fits(job):
+        """Check if job fits within the remaining resource budget"""
+
+        # (Always allow a job to run on its own, even if over budget)
+        if not running:
+            return True
+
+        cpus_used = sum(job_cpus[j] for j in running)
+
+        if cpus_used + job_cpus[job] > args.cpus:
+            return False
+
+        if mem_budget and job.memory:
+
+            mem_used = sum(j.memory or 0 for j in running)
+
+            if mem_used + job.memory > mem_budget:
+                return False
+
+        return True
 
     def handle_interrupt(signal, frame):
         """Interrupt handler: cancel all jobs"""
-        for job in launched:
+        for job in running:
 
             job.terminate_job(args.verbose)
 
         raise Exception('Job execution interrupted')
 
-    # Launch jobs
-    for job in jobs:
+    # (Screen output is printed by the tailer's own thread, so the scheduler only wakes when a job
+    #  exits, or to check watchdog rules)
+    with ChildWatcher() as watcher, OutputTailer() as tailer, ProgressDisplay() as progress:
 
-        # Wait here if already running maximum number of concurrent jobs
-        while True:
-            n_running = sum([j.poll() for j in launched])
+        while queued or running:
 
-            if n_running < args.njob:
-                break
+            # Check still-running jobs for completion
+            for job in running[:]:
+
+                if not job.poll():
+
+                    running.remove(job)
+
+                    tailer.remove(job)
+                    progress.remove(job)
+
+                    watchdogs.pop(job,None)
+
+                    free_cores.extend(job_cores.pop(job,[]))
+
+                    stats[job] = job.wait(args.verbose)
+
+                    # (Abaqus may exit cleanly when terminated)
+                    if job in aborted and stats[job] == 0:
+                        stats[job] = 1
+
+                    if on_complete:
+                        on_complete(job,stats[job])
+
+            # Launch queued jobs (first-fit) into the free resources
+            while queued and len(running) < args.njob:
+
+                candidates = [j for j in queued if fits(j)]
+
+                if not candidates:
+                    break
+
+                job = candidates[0]
+
+                queued.remove(job)
+
+                cpu_list = None
 
-            time.sleep(0.1)
+                if args.pin:
 
-        job.launch_job(args.nproc,compile_dir)
+                    free_cores.sort()
 
-        launched.append(job)
+                    n = min(job_cpus[job],len(free_cores))
 
-        signal.signal(signal.SIGINT, handle_interrupt)
+                    job_cores[job] = free_cores[:n]
+                    del free_cores[:n]
 
-    stats = []
+                    cpu_list = sorted(set(job_cores[job]))
 
+                job.launch_job(job.cpus or args.nproc,compile_dir,cpu_list)
 
-    # Poll jobs for output and to check for completion time
-    while True:
+                watcher.watch(job.p)
 
-        n_running = sum([j.poll(args.screen_output) for j in launched])
+                if args.screen_output:
+                    tailer.add(job,job.name,job.get_output_files())
 
-        if n_running == 0:
-            break
+                if args.progress:
+                    progress.add(job,job.name,job.get_sta_file(),job.local_job_file)
 
-        time.sleep(0.1)
+                if job.watchdog:
+                    watchdogs[job] = JobWatchdog(job.watchdog,job.get_sta_file())
 
-    # Get job stats
-    for job in launched:
+                running.append(job)
 
-        stats.append( job.wait(args.verbose) )
+                signal.signal(signal.SIGINT, handle_interrupt)
 
-    return stats
+            if running:
+
+                watcher.wait(_WATCHDOG_INTERVAL if watchdogs else None)
+
+            # Abort jobs that have broken their watchdog rules
+            for job, watchdog in list(watchdogs.items()):
+
+                reason = watchdog.check()
+
+                if reason:
+
+                    log.error('(!) Aborting job "%s": %s',job.name,reason)
+
+                    del watchdogs[job]
+
+                    aborted.add(job)
+
+                    job.terminate_job(args.verbose)
+
+    if output_dir:
+
+        for job in jobs:
+
+            if stats[job] == 0:
+
+                history[job_keys[job]] = job.duration.total_seconds()
+
+        save_job_history(output_dir,history)
+
+    return [stats[job] for job in jobs]
 
 
 def post_process(job_dir,verbose):
-    """Post process subcommand for post-processing existing jobs"""
+    """
+    Post process subcommand for post-processing existing jobs
+    Returns non-zero if the regression checks failed.
+    """
 
     cache_file = os.path.join(job_dir,'abaci-cache.pkl')
 
@@ -143,6 +601,157 @@ def post_process(job_dir,verbose):
         with open(cache_file,'r') as f:
             job = pkl.load(f)
 
-        job.run_checks()
+        job.extract_fields()
+
+        passed = job.run_checks()
 
         job.post_process(verbose)
+
+        return 0 if passed else 1
+
+
+def get_post_process_pool(nworker):
+    """
+    Get a worker pool for running regression checks and post-processing
+    concurrently with other jobs (see post_process_job)
+    """
+
+    if os.name == 'nt':
+
+        # (Worker processes can't be forked on Windows, and would have to
+        #  re-launch Abaqus python, so use threads instead)
+        return ThreadPool(nworker)
+
+    return multiprocessing.Pool(nworker,initializer=ignore_interrupt)
+
+
+def ignore_interrupt():
+    """Pool worker initializer: leave handling of interrupts to the parent process"""
+
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def post_process_job(job_dir,verbose):
+    """
+    Run regression checks and post-processing for a completed job (in a worker pool)
+    Returns non-zero if an error occurred.
+    """
+
+    log = logging.getLogger('abaci')
+
+    try:
+
+        return post_process(job_dir,verbose)
+
+    except Exception as e:
+
+        log.error('(!) Error while post-processing job in "%s": %s',relpathshort(job_dir),e)
+
+        return 1
+
+
+def find_job_dirs(paths):
+    """
+    Find job directories (containing abaci-cache.pkl) from a list of job directories,
+    glob patterns or parent directories (e.g. the project output directory)
+    """
+
+    log = logging.getLogger('abaci')
+
+    job_dirs = []
+
+    for path in paths:
+
+        matches = sorted(glob.glob(path))
+
+        if not matches:
+
+            raise Exception('Unable to find job directory "{dir}"'.format(dir=path))
+
+        for match in matches:
+
+            if os.path.isfile(os.path.join(match,'abaci-cache.pkl')):
+
+                job_dirs.append(match)
+
+                continue
+
+            for root, dirs, files in os.walk(match):
+
+                if 'abaci-cache.pkl' in files:
+
+                    job_dirs.append(root)
+
+                    # (Don't search within job directories)
+                    dirs[:] = []
+
+                dirs.sort()
+
+    # Remove duplicates, preserving order
+    seen = set()
+    unique_dirs = []
+
+    for job_dir in job_dirs:
+
+        if os.path.realpath(job_dir) not in seen:
+
+            seen.add(os.path.realpath(job_dir))
+            unique_dirs.append(job_dir)
+
+    log.debug('Found %s job directories',len(unique_dirs))
+
+    return unique_dirs
+
+
+def post_process_jobs(job_dirs,njob,verbose):
+    """
+    Post process subcommand for post-processing many existing jobs concurrently
+    Prints a summary table and returns the number of jobs that failed.
+    """
+
+    log = logging.getLogger('abaci')
+
+    if not job_dirs:
+
+        log.warning('No job directories (containing abaci-cache.pkl) were found')
+
+        return 1
+
+    log.info('Post-processing %s jobs',len(job_dirs))
+
+    pool = get_post_process_pool(min(njob,len(job_dirs)))
+
+    try:
+
+        results = [pool.apply_async(post_process_job,(job_dir,verbose)) for job_dir in job_dirs]
+
+        stats = [result.get(_MAX_WAIT) for result in results]
+
+    except:
+
+        pool.terminate()
+
+        raise
+
+    pool.close()
+    pool.join()
+
+    table = []
+
+    for job_dir, stat in zip(job_dirs,stats):
+
+        table.append([relpathshort(job_dir), 'ok' if stat == 0 else 'FAILED'])
+
+    if verbose >= 0:
+
+        from redist.tabulate import tabulate
+
+        print(tabulate(table,headers=['Job directory','Status'],tablefmt="simple"))
+
+    nfail = sum(1 for stat in stats if stat != 0)
+
+    if nfail:
+
+        log.error('(!) Post-processing failed for %s of %s jobs',nfail,len(job_dirs))
+
+    return nfail
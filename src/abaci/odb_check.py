@@ -2,21 +2,22 @@ import logging
 from odbAccess import openOdb
 import numpy as np
 from utils import to_ascii
-import cPickle
+from reference import ReferenceReader, ReferenceWriter
+from check_results import evaluate_field, get_tolerance
 
 
-def get_step_frames(checks,odb_out,job_name,step):
-    """Get integer array of frames to check in step"""
+def get_step_frames(checks,source,job_name,step):
+    """Get integer array of frames to check in step (of an OdbFields or ReferenceReader source)"""
 
     log = logging.getLogger('abaci')
 
     if checks['frames'] == 'last':
 
-        frames = [len(odb_out.steps[step].frames)-1]
+        frames = source.frames(step)[-1:]
 
     elif checks['frames'] == 'all':
 
-        frames = range(0,len(odb_out.steps[step].frames))
+        frames = source.frames(step)
 
     elif isinstance(checks['frames'],list):
 
@@ -32,19 +33,19 @@ def get_step_frames(checks,odb_out,job_name,step):
     return frames
 
 
-def get_elements(checks,odb_out,job_name,step):
-    """Get integer array of elements to check"""
+def get_elements(checks,job_name):
+    """Get integer array of elements to check (None for all elements)"""
 
     log = logging.getLogger('abaci')
 
     if checks['elements'] == 'all':
 
-        field = to_ascii(checks['fields'][0])
-        elements = range(0,len(odb_out.steps[step].frames[0].fieldOutputs[field].values))
+        elements = None
 
     elif isinstance(checks['elements'],list):
 
-        elements = checks['elements']
+        # (Sorted and unique, matching the order of the field values)
+        elements = np.unique(np.array(checks['elements'],dtype=int))
 
     else:
 
@@ -56,89 +57,171 @@ def get_elements(checks,odb_out,job_name,step):
     return elements
 
 
+def get_field_data(field_output,elements=None):
+    """
+    Extract the values of a field output as a single array using its bulk data blocks,
+    optionally subset to the value indices in elements (out-of-range indices are ignored)
+    """
+
+    blocks = []
+
+    for block in field_output.bulkDataBlocks:
+
+        # (Double precision output is only available via dataDouble)
+        data = block.data
+
+        if data is None or len(data) == 0:
+            data = block.dataDouble
+
+        blocks.append(np.asarray(data))
+
+    if not blocks:
+
+        return np.array([])
+
+    if len(blocks) == 1:
+
+        data = blocks[0]
+
+    else:
+
+        data = np.concatenate(blocks)
+
+    # Scalar fields as a flat array
+    if data.ndim == 2 and data.shape[1] == 1:
+
+        data = data[:,0]
+
+    if elements is not None:
+
+        data = data[elements[(elements >= 0) & (elements < data.shape[0])]]
+
+    return data
+
+
+def open_odb(odb_file):
+    """Open an odb file for reading only"""
+
+    return openOdb(to_ascii(odb_file),readOnly=True)
+
+
+class OdbFields:
+    """
+    Access the field data of an open odb by step, frame and field, with the
+    same interface as ReferenceReader so that either can be checked
+    """
+
+    def __init__(self,odb,elements=None):
+        """Constructor"""
+
+        self.odb = odb
+        self.elements = elements
+
+
+    def frames(self,step):
+
+        return range(0,len(self.odb.steps[step].frames))
+
+
+    def has(self,step,frame=None,field=None):
+
+        if step not in self.odb.steps.keys():
+            return False
+
+        if frame is None:
+            return True
+
+        if frame >= len(self.odb.steps[step].frames):
+            return False
+
+        if field is None:
+            return True
+
+        return field in self.odb.steps[step].frames[frame].fieldOutputs.keys()
+
+
+    def get(self,step,frame,field):
+
+        return get_field_data(self.odb.steps[step].frames[frame].fieldOutputs[field],self.elements)
+
+
 def dump_ref(ref_file,odb_file,job_name,checks):
-    """Construct a slimmed down python dictionary of reference data and pickle to file"""
+    """
+    Extract the checked fields from an odb and write them to a reference file
+    (also used to write the field cache of a job)
+    """
     
     log = logging.getLogger('abaci')
 
-    odb_out = openOdb(to_ascii(odb_file))
+    odb_out = open_odb(odb_file)
 
-    odb_ref_dict = {}
-
-    for step in checks['steps']:
-            
-        step = to_ascii(step)   # Abaqus python doesn't like unicode keys?
+    out = OdbFields(odb_out,get_elements(checks,job_name))
 
-        odb_ref_dict[step] = {}
+    log.info('Job "%s" saving field data to file "%s"',
+                    job_name, ref_file)
 
-        frames = get_step_frames(checks,odb_out,job_name,step)
+    try:
 
-        elements = get_elements(checks,odb_out,job_name,step)
-        
-        for i in frames:
+        with ReferenceWriter(ref_file) as ref:
 
-            odb_ref_dict[step][i] = {}
+            for step in checks['steps']:
+                    
+                step = to_ascii(step)   # Abaqus python doesn't like unicode keys?
 
-            for field in checks['fields']:
+                for i in get_step_frames(checks,out,job_name,step):
 
-                field = to_ascii(field)
-                
-                odb_ref_dict[step][i][field] = np.array([v.data for ii, v in enumerate(odb_out.steps[step].frames[i].fieldOutputs[field].values)
-                                      if ii in elements])
-                
-                log.debug('Job "%s" saving to dict: , Step "%s", Frame %s, Field %s',
-                        job_name, step, i, field)
-
-    log.info('Job "%s" saving reference dict to file "%s"',
-                    job_name, ref_file)
+                    for field in checks['fields']:
 
-    with open(ref_file,'wb') as f:
-        cPickle.dump(odb_ref_dict,f,cPickle.HIGHEST_PROTOCOL)
+                        field = to_ascii(field)
+                        
+                        ref.add(step,i,field,out.get(step,i,field))
+                        
+                        log.debug('Job "%s" saving field data: Step "%s", Frame %s, Field %s',
+                                job_name, step, i, field)
 
+    finally:
 
-def check_odb_structure(ref_file,odb_out_file,job_name,checks):
-    """Check if the structure of each odb matches that expected by checks config"""
+        odb_out.close()
 
-    log = logging.getLogger('abaci')
 
-    odb_out = openOdb(to_ascii(odb_out_file))
+def check_structure(ref,out,ref_file,out_file,job_name,checks):
+    """Check if the structure of the reference and output data matches that expected by checks config"""
 
-    with open(ref_file,'rb') as f:
-        ref_dict = cPickle.load(f)
+    log = logging.getLogger('abaci')
 
     for step in checks['steps']:
             
         step = to_ascii(step)   # Abaqus python doesn't like unicode keys?
 
-        if step not in ref_dict:
+        if not ref.has(step):
 
             log.fatal('Error while checking job "%s", unable to find step "%s" in reference odb (%s)',
                         job_name, step, ref_file)
 
             raise Exception('ODB content mismatch')
 
-        if step not in odb_out.steps.keys():
+        if not out.has(step):
 
             log.fatal('Error while checking job "%s", unable to find step "%s" in output odb (%s)',
-                        job_name, step, odb_out_file)
+                        job_name, step, out_file)
 
             raise Exception('ODB content mismatch')
 
-        frames = get_step_frames(checks,odb_out,job_name,step)
+        frames = get_step_frames(checks,out,job_name,step)
 
         for i in frames:
             
-            if i not in ref_dict[step]:
+            if not ref.has(step,i):
 
                 log.fatal('Error while checking job "%s", frame "%s" not found at step %s in reference odb (%s)',
                         job_name, i, step, ref_file)
 
                 raise Exception('ODB content mismatch')
 
-            if i >= len(odb_out.steps[step].frames):
+            if not out.has(step,i):
 
                 log.fatal('Error while checking job "%s", frame "%s" not found at step %s in output odb (%s)',
-                        job_name, i, step, odb_out_file)
+                        job_name, i, step, out_file)
 
                 raise Exception('ODB content mismatch')
 
@@ -146,40 +229,86 @@ def check_odb_structure(ref_file,odb_out_file,job_name,checks):
 
                 field = to_ascii(field)
 
-                if field not in ref_dict[step][i]:
+                if not ref.has(step,i,field):
 
                     log.fatal('Error while checking job "%s", field "%s" not found in reference odb (%s)',
                         job_name, field, ref_file)
 
                     raise Exception('ODB content mismatch')
 
-                if field not in odb_out.steps[step].frames[i].fieldOutputs.keys():
+                if not out.has(step,i,field):
 
                     log.fatal('Error while checking job "%s", field "%s" not found in output odb (%s)',
-                        job_name, field, odb_out_file)
+                        job_name, field, out_file)
 
                     raise Exception('ODB content mismatch')
 
 
 def compare_odb(ref_file,odb_out_file,job_name,checks):
-    """Run comparison checks on two odb files"""
-    
-    log = logging.getLogger('abaci')
+    """
+    Run comparison checks on two odb files and return the result for each
+    checked field (see compare_frames)
 
-    check_odb_structure(ref_file,odb_out_file,job_name,checks)
+    The output odb is opened once and walked one frame at a time, and reference
+    arrays are read as needed, so only the fields of the current frame are held in memory.
+    """
+
+    odb_out = open_odb(odb_out_file)
+
+    try:
+
+        out = OdbFields(odb_out,get_elements(checks,job_name))
+
+        with ReferenceReader(ref_file) as ref:
+
+            check_structure(ref,out,ref_file,odb_out_file,job_name,checks)
+
+            return compare_frames(ref,out,job_name,checks)
+
+    finally:
+
+        odb_out.close()
 
-    odb_out = openOdb(to_ascii(odb_out_file))
-    
-    with open(ref_file,'rb') as f:
-        ref_dict = cPickle.load(f)
+
+def compare_field_cache(ref_file,cache_file,job_name,checks):
+    """
+    Run comparison checks using the field cache of a job instead of its odb
+    (see cache_covers_checks)
+    """
+
+    with ReferenceReader(cache_file) as out:
+
+        with ReferenceReader(ref_file) as ref:
+
+            check_structure(ref,out,ref_file,cache_file,job_name,checks)
+
+            return compare_frames(ref,out,job_name,checks)
+
+
+def cache_covers_checks(extract,checks):
+    """Check whether a field cache extracted with settings extract contains the data needed for checks"""
+
+    return (set(checks['steps']) <= set(extract['steps']) and
+            set(checks['fields']) <= set(extract['fields']) and
+            extract['frames'] in (checks['frames'],'all') and
+            extract['elements'] == checks['elements'])
+
+
+def compare_frames(ref,out,job_name,checks):
+    """
+    Compare the checked fields of each frame in the output data with the reference data,
+    returning a list of results (dicts) for each step, frame and field
+    """
+
+    log = logging.getLogger('abaci')
+
+    results = []
 
     for step in checks['steps']:
             
         step = to_ascii(step)   # Abaqus python doesn't like unicode keys?
 
-        frames = get_step_frames(checks,odb_out,job_name,step)
-
-        elements = get_elements(checks,odb_out,job_name,step)
+        frames = get_step_frames(checks,out,job_name,step)
         
         for i in frames:
 
@@ -189,19 +318,31 @@ def compare_odb(ref_file,odb_out_file,job_name,checks):
 
                 field = to_ascii(field)
 
-                ref_data = ref_dict[step][i][field]
+                ref_data = ref.get(step,i,field)
+
+                out_data = out.get(step,i,field)
 
-                out_data = np.array([v.data for ii, v in enumerate(odb_out.steps[step].frames[i].fieldOutputs[field].values)
-                                      if ii in elements])
+                result = evaluate_field(ref_data,out_data,
+                                        atol=get_tolerance(checks.get('atol'),field),
+                                        rtol=get_tolerance(checks.get('rtol'),field))
 
-                field_rms = np.sqrt( np.square(ref_data - out_data).mean() )
-                
-                log.debug('Job "%s", Step "%s", Frame %s, Field %s, RMS Delta = %s',
-                        job_name, step, i, field, field_rms)
+                result.update({'step': step, 'frame': i, 'field': field})
 
-                frame_delta = frame_delta + np.square(field_rms)
+                results.append(result)
 
-            frame_rms = np.sqrt( frame_delta.mean() )
+                log.debug('Job "%s", Step "%s", Frame %s, Field %s, RMS Delta = %s, Max Delta = %s',
+                        job_name, step, i, field, result['rms'], result['max-abs'])
+
+                if not result['passed']:
+
+                    log.error('(!) Job "%s", Step "%s", Frame %s, Field %s: %s',
+                        job_name, step, i, field, result['message'])
+
+                if result['rms'] is not None:
+
+                    frame_delta = frame_delta + np.square(result['rms'])
 
             log.info('Job "%s", Step "%s", Frame %s, RMS Delta = %s',
-                        job_name, step, i, frame_delta)
+                        job_name, step, i, np.sqrt(frame_delta))
+
+    return results
@@ -0,0 +1,284 @@
+"""
+Reading and writing of reference data for regression checks
+
+Reference data is a set of arrays keyed by step name, frame number and
+field name. Three formats are supported, chosen by the reference path:
+
+ - '*.pkl': (legacy) a pickled nested dictionary of arrays, always read in full
+ - '*.npz': a zip archive of compressed .npy arrays, read selectively
+ - otherwise: a directory of .npy arrays, memory-mapped when read
+
+The npz and directory formats contain an 'index.json' header mapping
+step/frame/field to array file and can be read by Python 2 or 3.
+
+(This module must not depend on Abaqus so that it can be used standalone)
+"""
+import os
+import io
+import json
+import zipfile
+import numpy as np
+
+try:
+    import cPickle as pkl
+except ImportError:
+    import pickle as pkl
+
+_INDEX_FILE = 'index.json'
+_FORMAT_VERSION = 1
+
+
+def get_reference_format(path):
+    """Get the reference format ('pkl', 'npz' or 'dir') from a reference path"""
+
+    if path.endswith('.pkl'):
+        return 'pkl'
+
+    elif path.endswith('.npz'):
+        return 'npz'
+
+    else:
+        return 'dir'
+
+
+class ReferenceWriter:
+    """Write reference data array by array, so that it needn't all be held in memory"""
+
+    def __init__(self,path):
+        """Constructor"""
+
+        self.path = path
+        self.format = get_reference_format(path)
+        self.index = {}
+        self.count = 0
+
+        if self.format == 'pkl':
+
+            self.data = {}
+
+        elif self.format == 'npz':
+
+            self.zip = zipfile.ZipFile(path,'w',zipfile.ZIP_DEFLATED,allowZip64=True)
+
+        else:
+
+            os.makedirs(path)
+
+
+    def __enter__(self):
+
+        return self
+
+
+    def __exit__(self, exc_type, exc_value, traceback):
+
+        if exc_type is None:
+
+            self.close()
+
+        else:
+
+            self.abort()
+
+
+    def add(self,step,frame,field,data):
+        """Add the array for a field at a step frame"""
+
+        data = np.asarray(data)
+
+        if self.format == 'pkl':
+
+            self.data.setdefault(step,{}).setdefault(frame,{})[field] = data
+
+            return
+
+        array_file = '{n}.npy'.format(n=self.count)
+
+        self.count = self.count + 1
+
+        if self.format == 'npz':
+
+            buf = io.BytesIO()
+            np.lib.format.write_array(buf,data)
+
+            self.zip.writestr(array_file,buf.getvalue())
+
+        else:
+
+            np.save(os.path.join(self.path,array_file),data)
+
+        self.index.setdefault(step,{}).setdefault(str(frame),{})[field] = array_file
+
+
+    def close(self):
+        """Finish writing (the index is written last)"""
+
+        if self.format == 'pkl':
+
+            with open(self.path,'wb') as f:
+                pkl.dump(self.data,f,2)
+
+            return
+
+        index = json.dumps({'version': _FORMAT_VERSION, 'steps': self.index},
+                           sort_keys=True,indent=1)
+
+        if self.format == 'npz':
+
+            self.zip.writestr(_INDEX_FILE,index)
+            self.zip.close()
+
+        else:
+
+            with open(os.path.join(self.path,_INDEX_FILE),'w') as f:
+                f.write(index)
+
+
+    def abort(self):
+        """Remove partially written reference data"""
+
+        from shutil import rmtree
+
+        if self.format == 'npz':
+
+            self.zip.close()
+
+        if self.format == 'dir':
+
+            rmtree(self.path,ignore_errors=True)
+
+        elif os.path.exists(self.path):
+
+            os.remove(self.path)
+
+
+class ReferenceReader:
+    """Read reference data selectively, array by array"""
+
+    def __init__(self,path):
+        """Constructor"""
+
+        self.path = path
+        self.format = get_reference_format(path)
+
+        if self.format == 'pkl':
+
+            with open(path,'rb') as f:
+
+                try:
+                    self.data = pkl.load(f,encoding='latin1')
+                except TypeError:
+                    self.data = pkl.load(f)
+
+            # (Mirror the index structure of the other formats)
+            self.index = dict((step, dict((str(frame), frames[frame]) for frame in frames))
+                              for step, frames in self.data.items())
+
+            return
+
+        if self.format == 'npz':
+
+            self.zip = zipfile.ZipFile(path,'r')
+
+            header = json.loads(self.zip.read(_INDEX_FILE).decode('utf-8'))
+
+        else:
+
+            with open(os.path.join(path,_INDEX_FILE),'r') as f:
+                header = json.load(f)
+
+        if header.get('version',0) > _FORMAT_VERSION:
+
+            raise Exception('Reference file "{path}" was written by a newer version of abaci'.format(
+                             path=path))
+
+        self.index = header['steps']
+
+
+    def __enter__(self):
+
+        return self
+
+
+    def __exit__(self, exc_type, exc_value, traceback):
+
+        self.close()
+
+
+    def steps(self):
+        """List the steps in the reference data"""
+
+        return list(self.index.keys())
+
+
+    def frames(self,step):
+        """List the frame numbers in a step of the reference data"""
+
+        return sorted(int(frame) for frame in self.index[step])
+
+
+    def fields(self,step,frame):
+        """List the fields in a step frame of the reference data"""
+
+        return list(self.index[step][str(frame)].keys())
+
+
+    def has(self,step,frame=None,field=None):
+        """Check if the reference data contains a step (and frame (and field))"""
+
+        if step not in self.index:
+            return False
+
+        if frame is None:
+            return True
+
+        if str(frame) not in self.index[step]:
+            return False
+
+        if field is None:
+            return True
+
+        return field in self.index[step][str(frame)]
+
+
+    def get(self,step,frame,field):
+        """Get the array for a field at a step frame"""
+
+        entry = self.index[step][str(frame)][field]
+
+        if self.format == 'pkl':
+
+            return entry
+
+        if self.format == 'npz':
+
+            return np.lib.format.read_array(io.BytesIO(self.zip.read(entry)))
+
+        return np.load(os.path.join(self.path,entry),mmap_mode='r')
+
+
+    def close(self):
+
+        if self.format == 'npz':
+
+            self.zip.close()
+
+
+def convert_reference(source,dest):
+    """Convert reference data between formats"""
+
+    if os.path.exists(dest):
+
+        raise Exception('Reference output "{dest}" already exists, not overwriting.'.format(dest=dest))
+
+    with ReferenceReader(source) as reader:
+
+        with ReferenceWriter(dest) as writer:
+
+            for step in reader.steps():
+
+                for frame in reader.frames(step):
+
+                    for field in reader.fields(step,frame):
+
+                        writer.add(step,frame,field,reader.get(step,frame,field))
@@ -1,8 +1,6 @@
 from redist import toml
 import os
 from abaci.utils import recurse_files, relpathshort
-from abaci.tests import discover_tests
-from redist.tabulate import tabulate
 from textwrap import wrap
 
 def show_info(args, config, dep_list):
@@ -42,6 +40,8 @@ def show_dependencies(dep_list):
 
         table.append([dep_name,dep['version'],dep['git']])
 
+    from redist.tabulate import tabulate
+
     print(tabulate(table,tablefmt="plain",colalign=("right",)))
 
 
@@ -129,6 +129,8 @@ def show_config_jobs(config,verbose):
         if verbose > 0:
             table.append([None,file_path])
 
+    from redist.tabulate import tabulate
+
     print(tabulate(table,tablefmt="plain",colalign=("right",)))
 
 
@@ -137,6 +139,8 @@ def show_tests(test_dir):
 
     print ' Looking for tests in "{d}"'.format(d=test_dir)
     
+    from abaci.tests import discover_tests
+
     test_sources, testsuites = discover_tests(test_dir)
     
     for suite in testsuites:
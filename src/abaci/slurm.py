@@ -2,6 +2,9 @@ import os
 import subprocess
 from abaci.utils import cwd
 
+# Maximum number of tasks per job array (below the default SLURM MaxArraySize)
+_MAX_ARRAY_SIZE = 1000
+
 def have_slurm():
 
     devnull = open(os.devnull,'w')
@@ -19,9 +22,23 @@ def have_slurm():
     return stat == 0
 
 
+def format_time(seconds):
+    """Format a number of seconds as a SLURM time limit (days-hh:mm:ss)"""
+
+    seconds = int(seconds)
+
+    hms = '{h:02d}:{m:02d}:{s:02d}'.format(h=(seconds//3600)%24,m=(seconds//60)%60,s=seconds%60)
+
+    if seconds >= 86400:
+
+        return '{d}-{hms}'.format(d=seconds//86400,hms=hms)
+
+    return hms
+
+
 def spool_job_script(script_path,modules,cmds,job_name,time,nodes=None,partition=None,
-    tasks_per_node=None,cpus_per_task=None,mem_per_cpu=None,email=None,account=None):
-    """Write out a SLURM job script"""
+    tasks_per_node=None,cpus_per_task=None,mem_per_cpu=None,email=None,account=None,array=None):
+    """Write out a SLURM job script (for a job array if array, e.g. '0-9', is given)"""
 
     with open(script_path,'w') as f:
 
@@ -53,6 +70,9 @@ def spool_job_script(script_path,modules,cmds,job_name,time,nodes=None,partition
         if account:
             f.write('#SBATCH --account={account}\n'.format(account=account))
 
+        if array:
+            f.write('#SBATCH --array={array}\n'.format(array=array))
+
         f.write('')
 
         for mod in modules:
@@ -66,6 +86,28 @@ def spool_job_script(script_path,modules,cmds,job_name,time,nodes=None,partition
             f.write(cmd+'\n')
 
 
+def spool_array_script(script_path,map_file,job_dirs,job_script,job_name,time,**kwargs):
+    """
+    Write out a SLURM job array script which runs job_script in each of job_dirs,
+    with the array index mapped to job directory by the lines of map_file
+    """
+
+    with open(map_file,'w') as f:
+
+        for job_dir in job_dirs:
+
+            f.write(job_dir+'\n')
+
+    cmds = ['JOB_DIR=$(sed -n "$((SLURM_ARRAY_TASK_ID+1))p" "{map}")'.format(map=map_file),
+            'cd "$JOB_DIR" || exit 1',
+            'exec sh ./{script} > "slurm-${{SLURM_ARRAY_JOB_ID}}_${{SLURM_ARRAY_TASK_ID}}.out" 2>&1'.format(
+                script=os.path.basename(job_script))]
+
+    # (Environment modules are loaded by the job scripts)
+    spool_job_script(script_path,[],cmds,job_name,time,
+                     array='0-{n}'.format(n=len(job_dirs)-1),**kwargs)
+
+
 def submit_job(working_dir,script_path,args):
 
     with cwd(working_dir):
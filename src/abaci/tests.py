@@ -7,6 +7,7 @@ from os.path import isfile, join, realpath, dirname, pardir, relpath, basename
 from abaci.fortran_parsing import parse_fortran_file
 from abaci.compile import fortran_suffixes, compile_fortran
 from abaci.utils import system_cmd, system_cmd_wait, copyfile, cwd
+import abaci.abaqus as abq
 
 def discover_tests(test_dir):
     """Find Fortran files in test_dir and parse contents for test subroutines"""
@@ -112,7 +113,7 @@ def compile_tests(args, usub_file, fflags, libdir, test_driver_source, test_mod_
     if args.gcc:
         fc = 'gfortran'
     else:
-        fc = 'ifort'
+        fc = abq.get_fortran_compiler()
     
     out_file = 'test-driver'
 
@@ -6,8 +6,6 @@ import argparse
 from tempfile import mkdtemp
 import logging
 
-from abaci.ssh_utils import is_ssh_url, setup_ssh_agent
-import abaci.git_utils as git
 from abaci.utils import copydir, copyfile, mkdir
 import abaci.cli
 
@@ -67,6 +65,9 @@ def parse_update_arg(value):
 def update_abaci(install_location,upstream,git_ref):
     """Clone abaci into temporary dir and copy sources to local installation"""
 
+    from abaci.ssh_utils import is_ssh_url, setup_ssh_agent
+    import abaci.git_utils as git
+
     log = logging.getLogger('abaci')
     
     if is_ssh_url(upstream):
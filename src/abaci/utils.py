@@ -67,6 +67,34 @@ def copyfile(source,dest):
     copyfile(source,dest)
 
 
+def linkfile(source,dest):
+    """Helper to hardlink a file, falling back to a symlink and then to a copy"""
+    from shutil import copyfile
+
+    log = logging.getLogger('abaci')
+
+    try:
+
+        os.link(source,dest)
+        log.debug('Linked "%s" to "%s"',relpathshort(source), relpathshort(dest))
+        return
+
+    except (OSError, AttributeError):
+        pass
+
+    try:
+
+        os.symlink(source,dest)
+        log.debug('Symlinked "%s" to "%s"',relpathshort(source), relpathshort(dest))
+        return
+
+    except (OSError, AttributeError):
+        pass
+
+    log.debug('Copying "%s" to "%s"',relpathshort(source), relpathshort(dest))
+    copyfile(source,dest)
+
+
 def copydir(source,dest):
     """Helper to copy directory"""
     from distutils.dir_util import copy_tree
@@ -98,11 +126,17 @@ def hashfile(file):
 def hashfiles(files):
     """Helper to return hash of multiple files"""
 
+    return hashlist([hashfile(file) for file in files])
+
+
+def hashlist(digests):
+    """Helper to return a combined hash of multiple hashes"""
+
     m = sha1()
 
-    for file in files:
+    for digest in digests:
         
-        m.update(hashfile(file))
+        m.update(digest)
     
     return m.hexdigest()
 
@@ -146,7 +180,14 @@ def system_cmd(cmd,output=None):
         p.terminate()
         raise Exception('Command interrupted')
 
-    signal.signal(signal.SIGINT, handle_interrupt)
+    try:
+
+        signal.signal(signal.SIGINT, handle_interrupt)
+
+    except ValueError:
+
+        # (Signal handlers can only be set from the main thread)
+        pass
 
     return p, ofile, efile
 
@@ -181,6 +222,99 @@ def system_cmd_wait(p,verbosity,ofile=None,efile=None):
     return p.returncode
 
 
+def parse_memory(mem):
+    """
+        Convert a memory size (e.g. '4000m', '8G' or an integer number
+        of megabytes) into an integer number of megabytes
+    """
+
+    if mem is None:
+        return None
+
+    if isinstance(mem,int):
+        return mem
+
+    units = {'k': 1.0/1024, 'm': 1, 'g': 1024, 't': 1024*1024}
+
+    value = mem.strip().lower()
+
+    if value and value[-1] == 'b':
+        value = value[:-1]
+
+    try:
+
+        if value and value[-1] in units:
+
+            return int(float(value[:-1])*units[value[-1]])
+
+        else:
+
+            return int(float(value))
+
+    except ValueError:
+
+        raise ValueError('Unable to interpret memory size "{mem}"'.format(mem=mem))
+
+
+def parse_duration(duration):
+    """
+        Convert a duration (e.g. '01:30:00', '90:00', '2-12:00:00' or an
+        integer number of minutes) into a number of seconds
+    """
+
+    if duration is None:
+        return None
+
+    if isinstance(duration,int):
+        return 60*duration
+
+    try:
+
+        days, hms = 0, duration.strip()
+
+        if '-' in hms:
+
+            days, hms = hms.split('-',1)
+
+            # (SLURM format: days-hours[:minutes[:seconds]])
+            parts = [int(part) for part in hms.split(':')] + [0, 0]
+
+            return 86400*int(days) + 3600*parts[0] + 60*parts[1] + parts[2]
+
+        seconds = 0
+
+        for part in hms.split(':'):
+
+            seconds = 60*seconds + int(part)
+
+    except ValueError:
+
+        raise ValueError('Unable to interpret duration "{t}" (expected hh:mm:ss)'.format(t=duration))
+
+    if ':' not in duration:
+
+        # (A plain number is in minutes)
+        seconds = 60*seconds
+
+    return seconds
+
+
+def get_cache_dir():
+    """Get the directory for caches shared between projects (overridden by ABACI_CACHE_DIR)"""
+
+    if os.environ.get('ABACI_CACHE_DIR'):
+
+        return os.environ['ABACI_CACHE_DIR']
+
+    if os.name == 'nt':
+
+        return os.path.join(os.environ['LOCALAPPDATA'],'BCI','abaci','cache')
+
+    cache_home = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'),'.cache')
+
+    return os.path.join(cache_home,'abaci')
+
+
 def to_ascii(ustring):
 
     if isinstance(ustring,str):
@@ -1,13 +1,7 @@
 import sys
 from abaci.cli import parse_cli, init_logger, init_logger_file
-from abaci.config import load_config, init_new_config
-from abaci.compile import compile_user_subroutine, prepare_release, collect_cov_report
-from abaci.jobs import get_jobs, run_jobs, submit_jobs, post_process
-from abaci.utils import mkdir, daemonize
-from abaci.dependencies import fetch_dependencies
-from abaci.show_info import show_info
-from abaci.abaqus import check_for_abaqus
-from abaci.tests import discover_tests, gen_test_driver, compile_tests, run_tests
+
+# (Other abaci modules are imported by the subcommands that use them, to keep startup fast)
 
 def main():
     """Main entry point for abaci program"""
@@ -18,12 +12,26 @@ def main():
 
     if args.action == 'post':
 
-        post_process(args.job_dir,args.verbose)
+        from abaci.jobs import find_job_dirs, post_process_jobs
+
+        job_dirs = find_job_dirs(args.job_dir)
+
+        nfail = post_process_jobs(job_dirs,args.njob,args.verbose)
+
+        sys.exit(1 if nfail else 0)
+
+    elif args.action == 'convert':
+
+        from abaci.reference import convert_reference
+
+        convert_reference(args.ref_source,args.ref_dest)
 
         exit()
 
     elif args.action == 'init':
 
+        from abaci.config import init_new_config
+
         init_new_config(args.config,user_sub_file=args.config_usub_file,
                                     output=args.config_output_path,
                                     full=args.full_config,
@@ -31,17 +39,37 @@ def main():
                                     overwrite=args.overwrite_config)
         exit()
 
+    elif args.action == 'run' and args.bundle_dir:
+
+        # (Jobs were prepared by abaci submit --bundle, so nothing needs compiling)
+        from abaci.jobs import load_bundle
+
+        jobs, output_dir = load_bundle(args.bundle_dir)
+
+        init_logger_file(log_dir=output_dir)
+
+        sys.exit(run_local_jobs(args,None,jobs,output_dir))
+
+    from abaci.config import load_config
+    from abaci.dependencies import fetch_dependencies
+
     config, config_dir = load_config(args.config,args.action,False)
          
-    dep_list = fetch_dependencies(config, config_dir, args.verbose)
+    dep_list = fetch_dependencies(config, config_dir, args.verbose, args.update_lock)
 
     if args.action == 'show':
 
+        from abaci.show_info import show_info
+
         show_info(args, config, dep_list)
 
         exit()
+
+    from abaci.abaqus import check_for_abaqus
+    from abaci.utils import mkdir
+    from abaci.compile import compile_user_subroutine, prepare_release, collect_cov_report
     
-    check_for_abaqus()
+    check_for_abaqus(refresh=args.refresh_abaqus)
 
     mkdir(config['output'])
 
@@ -62,6 +90,8 @@ def main():
 
     elif args.action == 'test':
 
+        from abaci.tests import discover_tests, gen_test_driver, compile_tests, run_tests
+
         test_sources, testsuites = discover_tests(config['test-mod-dir'])
         
         if not testsuites:
@@ -80,28 +110,19 @@ def main():
             
         sys.exit(stat)
 
+    from abaci.jobs import get_jobs, submit_jobs, prune_job_store
+
     jobs = get_jobs(args,config)
 
     if args.action == 'run':
 
         if args.background:
+            from abaci.utils import daemonize
             daemonize()
 
-        stats = run_jobs(args,compile_dir,jobs)
-
-        exitstat = 0
-
-        for job, stat in zip(jobs,stats):
-
-            if stat == 0:
-
-                job.run_checks()
-
-                job.post_process(args.verbose)
+        exitstat = run_local_jobs(args,compile_dir,jobs,config['output'])
 
-            else:
-
-                exitstat = 1
+        prune_job_store(config['output'])
 
         if args.codecov:
             
@@ -111,7 +132,51 @@ def main():
         
     elif args.action == 'submit':
 
-        submit_jobs(compile_dir,jobs,args.interactive,args.no_submit)
+        submit_jobs(compile_dir,jobs,args.interactive,args.no_submit,args.no_array,args.bundle)
+
+        prune_job_store(config['output'])
+
+
+def run_local_jobs(args,compile_dir,jobs,output_dir):
+    """Run jobs locally with checks and post-processing, returns the exit status"""
+
+    from abaci.jobs import run_jobs, get_post_process_pool, post_process_job
+
+    # Run checks and post-processing as each job completes, while other jobs are still running
+    pool = get_post_process_pool(args.njob)
+
+    post_results = []
+
+    def on_complete(job,stat):
+
+        if stat == 0 and (job.checks or job.postprocess or job.extract):
+
+            post_results.append(pool.apply_async(post_process_job,(job.job_dir,args.verbose)))
+
+    try:
+
+        stats = run_jobs(args,compile_dir,jobs,output_dir,on_complete)
+
+    except:
+
+        pool.terminate()
+
+        raise
+
+    pool.close()
+    pool.join()
+
+    exitstat = 0
+
+    if any(stat != 0 for stat in stats):
+
+        exitstat = 1
+
+    if any(result.get() != 0 for result in post_results):
+
+        exitstat = 1
+
+    return exitstat
 
 
 if __name__ == "__main__":
@@ -1,113 +1,240 @@
+"""
+Compare the field output of two odb files
+
+usage: abaqus python odb_diff.py [-h] [-j [NJOB]] [--json FILE] odb1 odb2
+
+Frames are matched by their frame value (step time), with the fields of odb2
+linearly interpolated between frames when there is no frame at the same time
+(frames of frequency and buckle steps are matched by mode number).
+With -j, frames are compared concurrently in worker processes which each open
+both odb files read-only.
+Exits with a non-zero status if any step, frame or field of odb1 has no match
+in odb2 (e.g. because the run was truncated).
+"""
 import sys
-import logging
+import json
+import argparse
+import itertools
+import multiprocessing
 from odbAccess import openOdb
-import numpy as np
-# from abaci.utils import to_ascii
+from abaci.odb_check import get_field_data
+from abaci.check_results import evaluate_field, to_json_safe
+from abaci.frame_alignment import align_frames, combine_frames, summarise_results
 
-def compare_fields(odb_ref,odb_out,step,frame,field):
+# Odb files opened by this process (the main process or a worker)
+_odbs = {}
 
-    ref_data = np.array([v.data for v in odb_ref.steps[step].frames[frame].fieldOutputs[field].values])
-    out_data = np.array([v.data for v in odb_out.steps[step].frames[frame].fieldOutputs[field].values])
 
-    rms_diff = np.sqrt( np.square(ref_data - out_data).mean() )
+def parse_args():
 
-    return rms_diff
+    parser = argparse.ArgumentParser(prog='odb_diff',
+                description='Compare the field output of two odb files')
 
+    parser.add_argument(metavar='odb1',dest='ref_file',type=str,
+                        help='reference odb file')
 
-def compare_frames(odb_ref,odb_out,step,frame):
+    parser.add_argument(metavar='odb2',dest='out_file',type=str,
+                        help='odb file to compare with the reference')
 
-    # Check fields
-    for field in odb_ref.steps[step].frames[frame].fieldOutputs.keys():
+    parser.add_argument('-j','--jobs',type=int,help='compare frames concurrently in worker processes, optionally specify the number of workers (default: all CPUs)',
+                        nargs='?',dest='njob',action='store',const=None,default=1)
 
-        if field not in odb_out.steps[step].frames[frame].fieldOutputs.keys():
+    parser.add_argument('--json',type=str,dest='json_file',default=None,metavar='FILE',
+                        help='write a structured diff report to FILE')
 
-            print 'Step "{step}", Frame {frame}, field {field} from $1 not found in $2'.format(
-                step = step, frame=frame, field=field)
+    return parser.parse_args()
 
-            continue
 
-    n = 0
-    rms_diff = 0
-    for field in odb_out.steps[step].frames[frame].fieldOutputs.keys():
+def open_odbs(ref_file,out_file):
+    """Open both odb files read-only in this process"""
 
-        if field not in odb_ref.steps[step].frames[frame].fieldOutputs.keys():
+    _odbs['ref'] = openOdb(ref_file,readOnly=True)
+    _odbs['out'] = openOdb(out_file,readOnly=True)
 
-            print 'Step "{step}", Frame {frame}, field {field} from $1 not found in $2'.format(
-                step = step, frame=frame, field=field)
 
-            continue
+def close_odbs():
+    """Close the odb files opened by this process"""
 
-        n = n + 1
-        rms_diff = rms_diff + np.square(compare_fields(odb_ref,odb_out,step,frame,field))
+    for odb in _odbs.values():
+        odb.close()
 
-    rms_diff = np.sqrt( rms_diff/n )
-    
-    print 'Step "{step}", Frame {frame}, rms diff = {diff}'.format(
-                step = step, frame=frame, diff=rms_diff)
+    _odbs.clear()
 
 
-def compare_steps(odb_ref,odb_out,step):
+def compare_frame(task):
+    """
+    Compare the fields of a reference frame with its aligned output frames
+    (called in a worker process, with the odb files opened by open_odbs)
 
-    # Check frames
-    nref = len(odb_ref.steps[step].frames)
-    nout = len(odb_out.steps[step].frames)
+    Returns the fields not found in both frames, the fields missing from the
+    output and the comparison results.
+    """
 
-    if nref == nout:
+    step, i, weights = task
 
-        print 'Step "{step}": number of frames ({n}) matches'.format(
-               step=step, n=nref)
+    ref_frame = _odbs['ref'].steps[step].frames[i]
+    out_frames = _odbs['out'].steps[step].frames
+
+    ref_fields = ref_frame.fieldOutputs.keys()
+    out_fields = out_frames[weights[0][0]].fieldOutputs.keys()
+
+    results = []
+
+    for field in sorted(set(ref_fields) & set(out_fields)):
+
+        ref_data = get_field_data(ref_frame.fieldOutputs[field])
+
+        out_data = combine_frames(weights,lambda j: get_field_data(out_frames[j].fieldOutputs[field]))
+
+        r = evaluate_field(ref_data,out_data)
+
+        r.update({'frame': i, 'field': field,
+                  'odb2-frames': [[j, w] for j, w in weights]})
+
+        results.append(r)
+
+    return sorted(set(ref_fields) ^ set(out_fields)), sorted(set(ref_fields) - set(out_fields)), results
+
+
+def compare_steps(step,map_frames):
+    """
+    Compare the fields of each aligned frame in a step, where map_frames(compare_frame,tasks)
+    returns the comparison of each frame in order (e.g. from a pool of worker processes)
+
+    Returns a report of the comparison results for the step.
+    """
 
-        frames = range(0,nref)
+    ref_step = _odbs['ref'].steps[step]
+
+    ref_values = [f.frameValue for f in ref_step.frames]
+    out_values = [f.frameValue for f in _odbs['out'].steps[step].frames]
+
+    if len(ref_values) == len(out_values):
+
+        print 'Step "{step}": number of frames ({n}) matches'.format(
+               step=step, n=len(ref_values))
 
     else:
 
         print 'Step "{step}": frame number mismatch'.format(step=step)
-        print '               n1 = {n}'.format(n=nref)
-        print '               n2 = {n}'.format(n=nout)
-        
-        if min(nref,nout) > 0:
-            print '   (Comparing last frame only)'
+        print '               n1 = {n}'.format(n=len(ref_values))
+        print '               n2 = {n}'.format(n=len(out_values))
+        print '   (Comparing frames aligned by frame value)'
+
+    # (Frames of frequency and buckle steps are modes rather than times)
+    pairs, unmatched = align_frames(ref_values,out_values,by_value=str(ref_step.domain) == 'TIME')
+
+    for i in unmatched:
+
+        print 'Step "{step}", Frame {frame} (frame value {value}) from odb1 has no matching frame in odb2'.format(
+            step=step, frame=i, value=ref_values[i])
+
+    step_report = {'frames': [len(ref_values),len(out_values)], 'results': [],
+                   'unmatched-frames': unmatched, 'missing-fields': []}
+
+    tasks = [(step, i, weights) for i, weights in pairs]
+
+    for (step, i, weights), (not_in_both, missing, results) in zip(tasks,map_frames(compare_frame,tasks)):
+
+        for field in not_in_both:
+
+            print 'Step "{step}", Frame {frame}, field {field} not found in both odb files'.format(
+                step=step, frame=i, field=field)
+
+        step_report['missing-fields'].extend([i, field] for field in missing)
 
-            frames = [-1]
+        print_frame_results(step,i,results)
 
-        else:
-            print 'Step "{step}": skipping frame comparison'.format(step=step)
-            return
+        step_report['results'].extend(results)
 
-    for frame in frames:
+    return step_report
+
+
+def print_frame_results(step,frame,results):
+    """Print a summary of the field differences for a frame"""
+
+    for r in results:
+
+        if r['rms'] is None:
+
+            print 'Step "{step}", Frame {frame}, field {field}: {message}'.format(
+                step=step, frame=frame, field=r['field'], message=r['message'])
+
+    rms_diff, max_diff = summarise_results(results)
+
+    if rms_diff is None:
+        return
+
+    print 'Step "{step}", Frame {frame}, rms diff = {diff}, max diff = {max}'.format(
+                step=step, frame=frame, diff=rms_diff, max=max_diff)
 
-        compare_frames(odb_ref,odb_out,step,frame)
 
 def main():
 
-    if len(sys.argv) < 2:
-        raise Exception("Not enough arguments, please specify two odb files.")
+    args = parse_args()
+
+    open_odbs(args.ref_file,args.out_file)
+
+    if args.njob == 1:
+
+        pool = None
+
+        map_frames = itertools.imap
+
+    else:
+
+        pool = multiprocessing.Pool(args.njob,initializer=open_odbs,initargs=(args.ref_file,args.out_file))
 
-    ref_file = sys.argv[1]
-    out_file = sys.argv[2]
+        map_frames = lambda func, tasks: pool.imap(func,tasks)
 
-    odb_ref = openOdb(ref_file)
-    odb_out = openOdb(out_file)
+    report = {'odb1': args.ref_file, 'odb2': args.out_file, 'steps': {}}
+
+    ref_steps = _odbs['ref'].steps.keys()
+    out_steps = _odbs['out'].steps.keys()
 
     # Check steps match
-    for step in odb_ref.steps.keys():
+    for step in ref_steps:
+
+        if step not in out_steps:
+
+            print 'Step "{step}" from odb1 not found in odb2'.format(step=step)
+
+    for step in out_steps:
+
+        if step not in ref_steps:
+
+            print 'Step "{step}" from odb2 not found in odb1'.format(step=step)
+
+    report['missing-steps'] = [s for s in ref_steps if s not in out_steps]
+
+    try:
+
+        for step in [s for s in ref_steps if s in out_steps]:
+
+            report['steps'][step] = compare_steps(step,map_frames)
+
+    finally:
 
-        if step not in odb_out.steps.keys():
+        if pool:
+            pool.terminate()
+            pool.join()
 
-            print 'Step "{step}" from $1 not found in $2'.format(step = step)
+        close_odbs()
 
-            continue
-            
-    for step in odb_out.steps.keys():
+    # (Anything in the reference that couldn't be compared is a failure)
+    report['matched'] = not report['missing-steps'] and \
+        not any(s['unmatched-frames'] or s['missing-fields'] for s in report['steps'].values())
 
-        if step not in odb_ref.steps.keys():
+    if args.json_file:
 
-            print 'Step "{step}" from $1 not found in $2'.format(step = step)
+        with open(args.json_file,'w') as f:
+            json.dump(to_json_safe(report),f,indent=1,sort_keys=True,allow_nan=False)
 
-            continue
+    if not report['matched']:
 
-        compare_steps(odb_ref,odb_out,step)
+        print '(!) Not all steps, frames and fields of odb1 were found in odb2'
 
+        sys.exit(1)
 
 
 if __name__ == "__main__":
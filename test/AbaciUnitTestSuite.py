@@ -23,6 +23,9 @@ class AbaciUnitTestSuite(unittest.TestCase):
             log = logging.getLogger('abaci')
 
         self.output_dir = tempfile.mkdtemp()
+
+        # Keep the shared compilation cache out of the user's home directory
+        os.environ['ABACI_CACHE_DIR'] = tempfile.mkdtemp()
         self.root_dir = os.path.join(os.path.dirname(os.path.realpath(__file__)),'..')
 
 
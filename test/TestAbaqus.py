@@ -0,0 +1,104 @@
+import os
+import stat
+import unittest
+from os.path import join
+
+from AbaciUnitTestSuite import AbaciUnitTestSuite
+
+import abaci.abaqus as abq
+
+class TestAbaqus(AbaciUnitTestSuite):
+
+    def setUp(self):
+        """Put a mock abaqus command on the path that counts its invocations"""
+
+        super(TestAbaqus,self).setUp()
+
+        self.bin_dir = join(self.output_dir,'bin')
+        self.count_file = join(self.output_dir,'count')
+
+        os.mkdir(self.bin_dir)
+
+        with open(join(self.bin_dir,'abaqus'),'w') as f:
+            f.write('#!/bin/sh\n')
+            f.write('echo x >> "{f}"\n'.format(f=self.count_file))
+            f.write('case "$1" in\n')
+            f.write('  information=version) echo "Abaqus 2023.HF4";;\n')
+            f.write('  information=environment) echo "compile_fortran=[\'ifx\', \'-c\', \'-fpp\']";;\n')
+            f.write('esac\n')
+
+        os.chmod(join(self.bin_dir,'abaqus'),stat.S_IRWXU)
+
+        self.path = os.environ['PATH']
+        os.environ['PATH'] = self.bin_dir + os.pathsep + self.path
+
+        self.abaqus_info = abq._abaqus_info
+        abq._abaqus_info = None
+
+
+    def tearDown(self):
+
+        os.environ['PATH'] = self.path
+        abq._abaqus_info = self.abaqus_info
+
+
+    def get_count(self):
+        """Number of times the mock abaqus command has been run"""
+
+        if not os.path.exists(self.count_file):
+            return 0
+
+        with open(self.count_file,'r') as f:
+            return len(f.readlines())
+
+
+    @unittest.skipIf(os.name == 'nt',"mock abaqus command is a shell script")
+    def test_abaqus_info(self):
+        """
+            Test that abaqus detection is cached between invocations
+        """
+
+        info = abq.get_abaqus_info()
+
+        self.assertEquals(info['version'],'2023.HF4')
+        self.assertEquals(info['path'],os.path.realpath(join(self.bin_dir,'abaqus')))
+        self.assertEquals(abq.get_fortran_compiler(),'ifx')
+
+        count = self.get_count()
+        self.assertTrue(count > 0)
+
+        # Check a new invocation uses the cached details
+        abq._abaqus_info = None
+
+        self.assertEquals(abq.get_abaqus_info(),info)
+        self.assertEquals(self.get_count(),count)
+
+        # Check refresh runs abaqus again
+        abq.check_for_abaqus(refresh=True)
+
+        self.assertTrue(self.get_count() > count)
+
+        # Check the cache is invalidated if the executable changes
+        count = self.get_count()
+        abq._abaqus_info = None
+
+        mtime = os.path.getmtime(info['path'])
+        os.utime(info['path'],(mtime+10,mtime+10))
+
+        abq.get_abaqus_info()
+        self.assertTrue(self.get_count() > count)
+
+
+    @unittest.skipIf(os.name == 'nt',"abaqus is found at a fixed path on Windows")
+    def test_abaqus_not_found(self):
+        """
+            Test that a missing abaqus command is reported without running anything
+        """
+
+        os.environ['PATH'] = self.output_dir
+
+        self.assertEquals(abq.get_abaqus_info(),None)
+        self.assertEquals(abq.get_fortran_compiler(),'ifort')
+
+        with self.assertRaises(Exception):
+            abq.check_for_abaqus()
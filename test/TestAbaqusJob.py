@@ -28,7 +28,11 @@ class TestAbaqusJob(AbaciUnitTestSuite):
         job['name'] = 'job-name'
         job['abq-flags'] = []
         job['check'] = self.get_dummy_check()
+        job['extract'] = None
         job['mp-mode'] = 'threads'
+        job['cpus'] = None
+        job['memory'] = None
+        job['watchdog'] = None
         job['post-process'] = None
         job['cluster'] = None
         
@@ -114,6 +118,34 @@ class TestAbaqusJob(AbaciUnitTestSuite):
             os.mkdir(job_dir)
 
 
+    def test_extract_config(self):
+        """
+            Test that the field cache settings default to the check settings
+        """
+        from abaci.AbaqusJob import AbaqusJob
+
+        job_config, job_base_name = self.get_dummy_job()
+
+        job_config['check'].update({'frames': 'last', 'elements': 'all'})
+
+        job = AbaqusJob(self.output_dir,job=job_config)
+
+        self.assertEquals(job.get_extract_config(),
+                          {'fields': ['SDV1','SDV2'], 'steps': ['Step-1'],
+                           'frames': 'last', 'elements': 'all'})
+
+        extract = {'fields': ['U'], 'steps': ['Step-2'], 'frames': 'all', 'elements': 'all'}
+        job_config['extract'] = extract
+
+        job = AbaqusJob(self.output_dir,job=job_config)
+
+        self.assertEquals(job.get_extract_config(),extract)
+
+        job = AbaqusJob(self.output_dir,job_file='myjob')
+
+        self.assertEquals(job.get_extract_config(),None)
+
+
     def test_prepare_job(self):
         """
             Test the AbaqusJob preparation
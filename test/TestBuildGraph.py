@@ -0,0 +1,117 @@
+import unittest
+import tempfile
+import os
+import threading
+import time
+from os.path import join
+
+from AbaciUnitTestSuite import AbaciUnitTestSuite
+
+class TestBuildGraph(AbaciUnitTestSuite):
+
+    def new_source(self,name,code):
+        """Create a source file in the output directory"""
+
+        path = join(self.output_dir,name)
+
+        with open(path,'w') as f:
+            f.write(code)
+
+        return path
+
+
+    def test_source_dependencies(self):
+        """
+            Test dependency graph from Fortran module usage
+        """
+
+        from abaci.build_graph import get_source_dependencies
+
+        a = self.new_source('a.f90','module a\nuse b\nuse c\nend module a\n')
+        b = self.new_source('b.f90','module b\nuse c\nend module b\n')
+        c = self.new_source('c.f90','module c\nuse iso_c_binding\nend module c\n')
+        d = self.new_source('d.c','int d(){return 0;}\n')
+
+        deps = get_source_dependencies([a,b,c,d])
+
+        self.assertEqual(deps[a],set([b,c]))
+        self.assertEqual(deps[b],set([c]))
+        self.assertEqual(deps[c],set())
+        self.assertEqual(deps[d],set())
+
+
+    def test_circular_dependencies(self):
+        """
+            Test exception for circular module usage
+        """
+
+        from abaci.build_graph import get_source_dependencies
+
+        a = self.new_source('a.f90','module a\nuse b\nend module a\n')
+        b = self.new_source('b.f90','module b\nuse a\nend module b\n')
+
+        with self.assertRaises(Exception):
+
+            get_source_dependencies([a,b])
+
+
+    def test_parallel_build_order(self):
+        """
+            Test that sources are built concurrently after their dependencies
+        """
+
+        from abaci.build_graph import parallel_build
+
+        deps = {'a': set(['b','c']), 'b': set(['c']), 'c': set(), 'd': set(), 'e': set()}
+
+        built = []
+        active = [0]
+        max_active = [0]
+        lock = threading.Lock()
+
+        def build(src):
+
+            with lock:
+                # Check dependencies were built first
+                self.assertTrue(deps[src] <= set(built))
+                active[0] += 1
+                max_active[0] = max(max_active[0],active[0])
+
+            time.sleep(0.05)
+
+            with lock:
+                active[0] -= 1
+                built.append(src)
+
+        parallel_build(['a','b','c','d','e'],deps,build,njob=3)
+
+        self.assertEqual(sorted(built),['a','b','c','d','e'])
+        self.assertLess(built.index('c'),built.index('b'))
+        self.assertLess(built.index('b'),built.index('a'))
+        self.assertGreater(max_active[0],1)
+        self.assertLessEqual(max_active[0],3)
+
+
+    def test_parallel_build_failure(self):
+        """
+            Test that build errors are raised and dependents are not built
+        """
+
+        from abaci.build_graph import parallel_build
+
+        deps = {'a': set(['b']), 'b': set()}
+
+        built = []
+
+        def build(src):
+
+            if src == 'b':
+                raise Exception('Build failed')
+
+            built.append(src)
+
+        with self.assertRaises(Exception):
+
+            parallel_build(['a','b'],deps,build,njob=2)
+
+        self.assertEqual(built,[])
@@ -0,0 +1,126 @@
+import unittest
+import os
+import json
+from os.path import join
+import xml.etree.ElementTree as ET
+
+from AbaciUnitTestSuite import AbaciUnitTestSuite
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+class TestCheckResults(AbaciUnitTestSuite):
+
+    @unittest.skipUnless(np is not None,"numpy not available")
+    def test_evaluate_field(self):
+        """
+            Test field comparison metrics and tolerances
+        """
+
+        from abaci.check_results import evaluate_field
+
+        ref = np.array([1.0,-2.0,4.0])
+        out = np.array([1.0,-2.1,4.0])
+
+        result = evaluate_field(ref,out)
+
+        self.assertTrue(result['passed'])
+        self.assertAlmostEqual(result['max-abs'],0.1)
+        self.assertAlmostEqual(result['rms'],np.sqrt(0.01/3))
+        self.assertAlmostEqual(result['rel'],0.1/4.0)
+
+        self.assertTrue(evaluate_field(ref,out,atol=0.11)['passed'])
+        self.assertFalse(evaluate_field(ref,out,atol=0.09)['passed'])
+
+        # Relative tolerance applies to each value
+        self.assertTrue(evaluate_field(ref,out,rtol=0.051)['passed'])
+        self.assertFalse(evaluate_field(ref,out,rtol=0.049)['passed'])
+
+        result = evaluate_field(ref,out[:2],atol=1.0)
+        self.assertFalse(result['passed'])
+        self.assertIn('Shape mismatch',result['message'])
+
+
+    @unittest.skipUnless(np is not None,"numpy not available")
+    def test_get_tolerance(self):
+        """
+            Test scalar and per-field tolerances
+        """
+
+        from abaci.check_results import get_tolerance
+
+        self.assertEqual(get_tolerance(1e-3,'S'),1e-3)
+        self.assertEqual(get_tolerance({'S': 1e-3},'S'),1e-3)
+        self.assertEqual(get_tolerance({'S': 1e-3},'U'),None)
+        self.assertEqual(get_tolerance(None,'S'),None)
+
+
+    @unittest.skipUnless(np is not None,"numpy not available")
+    def test_reports(self):
+        """
+            Test JSON and JUnit report output
+        """
+
+        from abaci.check_results import evaluate_field, write_check_reports
+
+        results = []
+
+        for field, atol in [('S',1.0),('U',0.0)]:
+
+            result = evaluate_field(np.zeros(3),np.ones(3)*0.5,atol=atol)
+            result.update({'step': 'Step-1', 'frame': 2, 'field': field})
+            results.append(result)
+
+        # (Infinite relative difference from a zero reference)
+        self.assertEqual(results[0]['rel'],float('inf'))
+
+        write_check_reports(self.output_dir,'job-1','ref.npz',results)
+
+        with open(join(self.output_dir,'check-report.json'),'r') as f:
+            text = f.read()
+
+        self.assertNotIn('Infinity',text)
+
+        report = json.loads(text)
+
+        self.assertFalse(report['passed'])
+        self.assertEqual(report['failures'],1)
+        self.assertEqual(len(report['results']),2)
+        self.assertIsNone(report['results'][0]['rel'])
+
+        suite = ET.parse(join(self.output_dir,'check-report.xml')).getroot().find('testsuite')
+
+        self.assertEqual(suite.get('tests'),'2')
+        self.assertEqual(suite.get('failures'),'1')
+
+        cases = suite.findall('testcase')
+
+        self.assertEqual([c.get('name') for c in cases],['Step-1/frame-2/S','Step-1/frame-2/U'])
+        self.assertIsNone(cases[0].find('failure'))
+        self.assertIsNotNone(cases[1].find('failure'))
+
+        self.assertEqual(report['status'],'failed')
+
+
+    @unittest.skipUnless(np is not None,"numpy not available")
+    def test_reference_created_report(self):
+        """
+            Test that creating a missing reference is reported as skipped, not passed
+        """
+
+        from abaci.check_results import write_check_reports
+
+        write_check_reports(self.output_dir,'job-1','ref.npz',[],reference_created=True)
+
+        with open(join(self.output_dir,'check-report.json'),'r') as f:
+            report = json.load(f)
+
+        self.assertEqual(report['status'],'reference-created')
+        self.assertFalse(report['passed'])
+
+        suite = ET.parse(join(self.output_dir,'check-report.xml')).getroot().find('testsuite')
+
+        self.assertEqual(suite.get('skipped'),'1')
+        self.assertIsNotNone(suite.find('testcase').find('skipped'))
@@ -0,0 +1,77 @@
+import unittest
+import os
+import sys
+import time
+import subprocess
+
+from AbaciUnitTestSuite import AbaciUnitTestSuite
+
+class TestChildWatcher(AbaciUnitTestSuite):
+
+    def test_wait_child_exit(self):
+        """
+            Test that waiting returns promptly once a child process exits
+        """
+
+        from abaci.ChildWatcher import ChildWatcher
+
+        with ChildWatcher() as watcher:
+
+            start = time.time()
+
+            p = subprocess.Popen([sys.executable,'-c','import time; time.sleep(0.2)'])
+
+            watcher.watch(p)
+
+            while p.poll() is None:
+
+                watcher.wait(timeout=10)
+
+            elapsed = time.time() - start
+
+        self.assertEqual(p.returncode,0)
+        self.assertLess(elapsed,5)
+
+
+    def test_wait_timeout(self):
+        """
+            Test that waiting with no child processes returns after the timeout
+        """
+
+        from abaci.ChildWatcher import ChildWatcher
+
+        with ChildWatcher() as watcher:
+
+            start = time.time()
+
+            watcher.wait(timeout=0.1)
+
+            elapsed = time.time() - start
+
+        self.assertGreaterEqual(elapsed,0.09)
+
+
+    @unittest.skipIf(os.name == 'nt',"no file descriptor waiting on Windows")
+    def test_wait_fds(self):
+        """
+            Test that waiting returns when an extra file descriptor is readable
+        """
+
+        from abaci.ChildWatcher import ChildWatcher
+
+        r, w = os.pipe()
+
+        os.write(w,'x')
+
+        with ChildWatcher() as watcher:
+
+            start = time.time()
+
+            watcher.wait(timeout=10,fds=[r])
+
+            elapsed = time.time() - start
+
+        os.close(r)
+        os.close(w)
+
+        self.assertLess(elapsed,5)
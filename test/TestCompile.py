@@ -0,0 +1,255 @@
+import unittest
+import tempfile
+import os
+import argparse
+from os.path import join, exists
+from distutils.spawn import find_executable
+
+from AbaciUnitTestSuite import AbaciUnitTestSuite
+
+class TestCompile(AbaciUnitTestSuite):
+
+    def get_args(self):
+        """Returns compile command arguments for testing purposes"""
+
+        return argparse.Namespace(gcc=True,debug=False,check=False,noopt=True,
+                                  codecov=False,verbose=-1,screen_output=False,njob=2)
+
+
+    def get_compile_conf(self):
+        """Returns a valid compile config for testing purposes"""
+
+        flags = {'linux': [], 'windows': [], 'gcc': []}
+
+        return {'fflags': flags, 'cflags': flags, 'lflags': flags,
+                'opt-host': False, 'compiletime-checks': False,
+                'sources': [], 'include': []}
+
+
+    def new_source(self,name,code):
+        """Create a source file in the output directory"""
+
+        path = join(self.output_dir,name)
+
+        with open(path,'w') as f:
+            f.write(code)
+
+        return path
+
+
+    def get_mtimes(self,sources):
+        """Get modification times of the object files for sources"""
+
+        from abaci.compile import get_object_file
+
+        return [os.stat(join(self.output_dir,get_object_file(s))).st_mtime for s in sources]
+
+
+    @unittest.skipUnless(find_executable('gfortran') and os.name != 'nt',"gfortran not available")
+    def test_incremental_rebuild(self):
+        """
+            Test that only changed auxillary sources and their dependents are recompiled
+        """
+
+        from abaci.compile import compile_auxillary_sources, get_object_file
+
+        a = self.new_source('a.f90','module mod_a\nuse mod_b\nend module mod_a\n')
+        b = self.new_source('b.f90','module mod_b\nend module mod_b\n')
+        c = self.new_source('c.f90','module mod_c\nend module mod_c\n')
+
+        sources = [a,b,c]
+        fflags = ['-J',self.output_dir]
+
+        compile_auxillary_sources(self.output_dir,self.get_compile_conf(),self.get_args(),sources,fflags)
+
+        for src in sources:
+            self.assertTrue(exists(join(self.output_dir,get_object_file(src))))
+            self.assertTrue(exists(join(self.output_dir,get_object_file(src).replace('-std','-xplD'))))
+
+        # Modify a dependency: dependent must also be recompiled
+        for src in sources:
+            os.utime(join(self.output_dir,get_object_file(src)),(0,0))
+
+        self.new_source('b.f90','module mod_b\ninteger :: x\nend module mod_b\n')
+
+        compile_auxillary_sources(self.output_dir,self.get_compile_conf(),self.get_args(),sources,fflags)
+
+        mtimes = self.get_mtimes(sources)
+        self.assertNotEqual(mtimes[0],0)
+        self.assertNotEqual(mtimes[1],0)
+        self.assertEqual(mtimes[2],0)
+
+        # Nothing modified: nothing recompiled
+        for src in sources:
+            os.utime(join(self.output_dir,get_object_file(src)),(0,0))
+
+        compile_auxillary_sources(self.output_dir,self.get_compile_conf(),self.get_args(),sources,fflags)
+
+        self.assertEqual(self.get_mtimes(sources),[0,0,0])
+
+        # Remove a source: stale object is removed
+        compile_auxillary_sources(self.output_dir,self.get_compile_conf(),self.get_args(),[a,b],fflags)
+
+        self.assertFalse(exists(join(self.output_dir,get_object_file(c))))
+
+
+    @unittest.skipUnless(find_executable('gfortran') and os.name != 'nt',"gfortran not available")
+    def test_object_cache(self):
+        """
+            Test that compiled objects are shared between projects via the cache
+        """
+
+        from abaci.compile import compile_auxillary_sources, get_object_file
+        from abaci.ObjectCache import ObjectCache
+
+        cache = ObjectCache(tempfile.mkdtemp(),max_size=100)
+
+        code = {'a.f90': 'module mod_a\nuse mod_b\nend module mod_a\n',
+                'b.f90': 'module mod_b\nend module mod_b\n'}
+
+        sources = [self.new_source(name,code[name]) for name in sorted(code)]
+
+        compile_auxillary_sources(self.output_dir,self.get_compile_conf(),self.get_args(),
+                                  sources,['-J',self.output_dir],cache)
+
+        self.assertEqual((cache.hits, cache.misses),(0,2))
+
+        # Same sources in another project location
+        self.output_dir = tempfile.mkdtemp()
+
+        sources = [self.new_source(name,code[name]) for name in sorted(code)]
+
+        compile_auxillary_sources(self.output_dir,self.get_compile_conf(),self.get_args(),
+                                  sources,['-J',self.output_dir],cache)
+
+        self.assertEqual((cache.hits, cache.misses),(2,2))
+
+        for src in sources:
+            self.assertTrue(exists(join(self.output_dir,get_object_file(src))))
+
+        self.assertTrue(exists(join(self.output_dir,'mod_a.mod')))
+        self.assertTrue(exists(join(self.output_dir,'mod_b.mod')))
+
+
+    @unittest.skipUnless(find_executable('gcc') and os.name != 'nt',"gcc not available")
+    def test_include_rebuild(self):
+        """
+            Test that changing an include file recompiles the sources and that
+            files no longer included are removed from the compile directory
+        """
+
+        from abaci.compile import stage_files, compile_auxillary_sources, get_object_file
+
+        project_dir = tempfile.mkdtemp()
+        compile_dir = join(self.output_dir,'lib')
+
+        def new_file(name,code):
+            with open(join(project_dir,name),'w') as f:
+                f.write(code)
+            return join(project_dir,name)
+
+        user_file = new_file('usub.f90','')
+        header = new_file('val.h','#define VAL 1\n')
+        extra = new_file('extra.inc','')
+        source = new_file('aux.c','#include "val.h"\nint get_val(void) { return VAL; }\n')
+
+        def build(includes):
+            sources, include_list = stage_files(compile_dir,user_file,join(compile_dir,'usub.f90'),
+                                                includes,[source],{})
+            compile_auxillary_sources(compile_dir,self.get_compile_conf(),self.get_args(),
+                                      sources,[],include_files=include_list)
+
+        obj_file = join(compile_dir,get_object_file(source))
+
+        build([header,extra])
+
+        os.utime(obj_file,(0,0))
+
+        # Unchanged: not recompiled
+        build([header,extra])
+
+        self.assertEqual(os.stat(obj_file).st_mtime,0)
+
+        # Changed header: recompiled
+        new_file('val.h','#define VAL 2\n')
+
+        build([header,extra])
+
+        self.assertNotEqual(os.stat(obj_file).st_mtime,0)
+
+        # Include no longer listed: removed from the compile directory
+        self.assertTrue(exists(join(compile_dir,'extra.inc')))
+
+        build([header])
+
+        self.assertFalse(exists(join(compile_dir,'extra.inc')))
+        self.assertTrue(exists(join(compile_dir,'val.h')))
+        self.assertTrue(exists(obj_file))
+
+
+    def test_failed_build(self):
+        """
+            Test that a failed build is recompiled on the next run instead
+            of leaving jobs to run with the previous library
+        """
+
+        import abaci.compile
+        from abaci.compile import compile_user_subroutine
+
+        args = self.get_args()
+        args.no_cache = True
+
+        project_dir = tempfile.mkdtemp()
+        compile_dir = join(self.output_dir,'lib')
+
+        user_file = join(project_dir,'usub.f90')
+
+        with open(user_file,'w') as f:
+            f.write('! version 1\n')
+
+        make_stats = []
+
+        def make(dir,lib_file,verbosity):
+            """Stand-in for abaqus make, building a library unless it fails"""
+
+            stat = make_stats.pop(0)
+
+            if stat == 0:
+                open(join(dir,'libusub.so'),'w').close()
+
+            return stat
+
+        abq_make = abaci.compile.abq.make
+        abaci.compile.abq.make = make
+
+        try:
+
+            def compile():
+                return compile_user_subroutine(args,self.output_dir,user_file,self.get_compile_conf(),{})[0]
+
+            make_stats.append(0)
+            self.assertEqual(compile(),0)
+
+            # Unchanged: skipped
+            self.assertEqual(compile(),0)
+
+            # Changed source fails to build: previous library removed
+            with open(user_file,'w') as f:
+                f.write('! version 2\n')
+
+            make_stats.append(1)
+            self.assertEqual(compile(),1)
+
+            self.assertFalse(exists(join(compile_dir,'libusub.so')))
+            self.assertFalse(exists(join(self.output_dir,'digest.pkl')))
+
+            # Next run recompiles
+            make_stats.append(0)
+            self.assertEqual(compile(),0)
+
+            self.assertEqual(make_stats,[])
+            self.assertTrue(exists(join(compile_dir,'libusub.so')))
+
+        finally:
+
+            abaci.compile.abq.make = abq_make
@@ -0,0 +1,158 @@
+import unittest
+import tempfile
+import os
+from os.path import join, exists
+
+from AbaciUnitTestSuite import AbaciUnitTestSuite
+
+class TestContentStore(AbaciUnitTestSuite):
+
+    def new_file(self,contents):
+        """Create a temporary file with contents"""
+
+        fh,file_path = tempfile.mkstemp()
+        os.write(fh,contents)
+        os.close(fh)
+
+        return file_path
+
+
+    def test_stage_file(self):
+        """
+            Test staging of files via the store
+        """
+
+        from abaci.ContentStore import ContentStore
+
+        store = ContentStore(join(self.output_dir,'store'))
+
+        source = self.new_file('abc')
+
+        dest1 = join(self.output_dir,'dest1')
+        dest2 = join(self.output_dir,'dest2')
+
+        store.stage_file(source,dest1)
+        store.stage_file(source,dest2)
+
+        # Check staged files have the right contents
+        for dest in [dest1, dest2]:
+
+            with open(dest,'r') as f:
+                self.assertEqual(f.read(),'abc')
+
+        # Check that only one copy is kept in the store
+        digest = store.digest(source)
+        self.assertTrue(exists(join(self.output_dir,'store',digest[0:2],digest)))
+        self.assertEqual(len(os.listdir(join(self.output_dir,'store',digest[0:2]))),1)
+
+        # Check that staged files are linked where possible
+        if hasattr(os,'link'):
+            self.assertEqual(os.stat(dest1).st_ino,os.stat(dest2).st_ino)
+
+
+    def test_digest_cache(self):
+        """
+            Test that file digests are cached and updated on modification
+        """
+
+        from abaci.ContentStore import ContentStore
+        from abaci.utils import hashfile
+
+        store_dir = join(self.output_dir,'store')
+
+        store = ContentStore(store_dir)
+
+        source = self.new_file('abc')
+
+        digest1 = store.digest(source)
+        self.assertEqual(digest1,hashfile(source))
+
+        store.save()
+
+        # Check cached digest is loaded from index
+        store = ContentStore(store_dir)
+        self.assertIn(os.path.realpath(source),store.index)
+
+        # Check digest is updated when file changes
+        with open(source,'w') as f:
+            f.write('abcd')
+
+        digest2 = store.digest(source)
+        self.assertNotEqual(digest1,digest2)
+        self.assertEqual(digest2,hashfile(source))
+
+
+    def test_stage_dir(self):
+        """
+            Test staging of directories via the store
+        """
+
+        from abaci.ContentStore import ContentStore
+
+        store = ContentStore(join(self.output_dir,'store'))
+
+        source = tempfile.mkdtemp()
+        os.mkdir(join(source,'sub'))
+
+        with open(join(source,'a.txt'),'w') as f:
+            f.write('a')
+
+        with open(join(source,'sub','b.txt'),'w') as f:
+            f.write('b')
+
+        dest = join(self.output_dir,'lib')
+
+        store.stage_dir(source,dest)
+
+        self.assertTrue(exists(join(dest,'a.txt')))
+        self.assertTrue(exists(join(dest,'sub','b.txt')))
+
+        with open(join(dest,'sub','b.txt'),'r') as f:
+            self.assertEqual(f.read(),'b')
+
+
+    def test_prune(self):
+        """
+            Test that objects no longer linked from job directories are pruned
+        """
+
+        from abaci.ContentStore import ContentStore
+
+        store_dir = join(self.output_dir,'store')
+
+        store = ContentStore(store_dir)
+
+        source = self.new_file('abc')
+
+        dest = join(self.output_dir,'dest')
+
+        store.stage_file(source,dest)
+
+        digest = store.digest(source)
+        obj_file = join(store_dir,digest[0:2],digest)
+
+        if not hasattr(os,'link') or os.name == 'nt':
+
+            # (Staged by copy: nothing links to the store)
+            self.assertEqual(store.prune(min_age=0),1)
+
+            return
+
+        # Still linked from a job directory
+        self.assertEqual(store.prune(min_age=0),0)
+        self.assertTrue(exists(obj_file))
+
+        os.remove(dest)
+
+        # Recently added objects are kept, in case another process is about to link them
+        self.assertEqual(store.prune(),0)
+
+        self.assertEqual(store.prune(min_age=0),1)
+        self.assertFalse(exists(obj_file))
+
+        # Digests of deleted files are dropped from the index
+        os.remove(source)
+
+        store.prune(min_age=0)
+
+        self.assertNotIn(os.path.realpath(source),ContentStore(store_dir).index)
@@ -1,5 +1,7 @@
 import tempfile
 import os
+import json
+from shutil import rmtree
 from os.path import join, isdir, exists
 
 from AbaciUnitTestSuite import AbaciUnitTestSuite, verbose
@@ -291,11 +293,27 @@ class TestDependencies(AbaciUnitTestSuite):
 
         with cwd(project_path):
 
+            # Check dependency stays at its locked commit, even when fetched from scratch
             fetch_dependencies(config, config_dir, verbosity)
 
-            # Check dependency was updated
+            self.assertEquals(git.get_tag(join('dependencies','dep1')), 'v1')
+
+            rmtree('dependencies')
+
+            fetch_dependencies(config, config_dir, verbosity)
+
+            self.assertEquals(git.get_tag(join('dependencies','dep1')), 'v1')
+
+            # Check dependency was updated on request
+            fetch_dependencies(config, config_dir, verbosity, update_lock=True)
+
             self.assertEquals(git.get_tag(join('dependencies','dep1')), 'v2')
 
+            with open('abaci.lock','r') as f:
+                lock = json.load(f)
+
+            self.assertEquals(lock['dependencies'][0]['commit'],git.current_commit(join('dependencies','dep1')))
+
 
     def test_invalid_dependency(self):
         """
@@ -324,3 +342,180 @@ class TestDependencies(AbaciUnitTestSuite):
 
             fetch_dependencies(config, config_dir, verbosity)
 
+
+
+    def test_git_status(self):
+        """
+            Test querying the commit, branch and modification state of a repository
+        """
+
+        upstream = self.new_temp_project(name="dep1",version="v1",deps=None)
+
+        git.clone(upstream,self.output_dir,'dep1',verbosity=-1)
+
+        repo = join(self.output_dir,'dep1')
+
+        status = git.get_status(repo)
+
+        self.assertEquals(status['commit'],git.current_commit(repo))
+        self.assertFalse(status['detached'])
+        self.assertFalse(status['dirty'])
+
+        # Untracked files do not count as modifications
+        open(join(repo,'untracked.txt'),'w').close()
+
+        self.assertFalse(git.get_status(repo)['dirty'])
+
+        # Detached HEAD
+        git.checkout(repo,'v1',verbosity=-1)
+
+        self.assertTrue(git.get_status(repo)['detached'])
+
+        # Modify a tracked file
+        with open(join(repo,'abaci.toml'),'a') as f:
+            f.write('\n')
+
+        self.assertTrue(git.get_status(repo)['dirty'])
+
+    def test_lock_file(self):
+        """
+            Test that locked dependencies are used without any git calls
+
+            root-->dep1@v1
+                -->dep2@master
+            
+        """
+        import abaci.dependencies
+
+        self.new_temp_project(name="dep1",version="v1",deps=None)
+
+        temp_upstream = self.new_temp_project(name="root",version="v1",
+                              deps=[self.temp_dep(name="dep1",version="v1")])
+
+        project_path, config, config_dir = self.clone_and_load_config(temp_upstream,'root')
+
+        dep_list = fetch_dependencies(config, config_dir, 0)
+
+        # Check the resolved commit has been recorded
+        with open(join(config_dir,'abaci.lock'),'r') as f:
+            lock = json.load(f)
+
+        commit = git.current_commit(join(config_dir,'dependencies','dep1'))
+
+        self.assertEquals(lock['dependencies'][0]['name'],'dep1')
+        self.assertEquals(lock['dependencies'][0]['commit'],commit)
+        self.assertEquals(dep_list['dep1']['commit'],commit)
+
+        # Check no git calls are made while the lock file matches
+        def fail(*args,**kwargs):
+            raise Exception('Unexpected git call')
+
+        get_status = git.get_status
+        git.get_status = fail
+
+        try:
+
+            locked_list = fetch_dependencies(config, config_dir, 0)
+
+        finally:
+
+            git.get_status = get_status
+
+        self.assertEquals(locked_list['dep1']['commit'],commit)
+        self.assertEquals(locked_list['dep1']['config'],dep_list['dep1']['config'])
+
+        # Check dependencies are fetched if the dependency config changes
+        with open(join(config_dir,'dependencies','dep1','abaci.toml'),'a') as f:
+            f.write('\n')
+
+        lock = abaci.dependencies.read_lock_file(join(config_dir,'abaci.lock'),config['dependency'])
+
+        self.assertEquals(abaci.dependencies.get_locked_dependencies(lock,join(config_dir,'dependencies')), None)
+
+
+    def test_lock_file_new_dependency(self):
+        """
+            Test that the lock file is updated when new dependencies are resolved
+
+            root-->dep1-->dep2 (added to the dep1 checkout)
+                -->dep3 (added to the project)
+            
+        """
+        import abaci.dependencies
+
+        self.new_temp_project(name="dep1",version="v1",deps=None)
+        self.new_temp_project(name="dep2",version="v1",deps=None)
+        self.new_temp_project(name="dep3",version="v1",deps=None)
+
+        temp_upstream = self.new_temp_project(name="root",version="v1",
+                              deps=[self.temp_dep(name="dep1",version="v1")])
+
+        project_path, config, config_dir = self.clone_and_load_config(temp_upstream,'root')
+
+        lock_file = join(config_dir,'abaci.lock')
+
+        def locked_names():
+            with open(lock_file,'r') as f:
+                return [dep['name'] for dep in json.load(f)['dependencies']]
+
+        fetch_dependencies(config, config_dir, 0)
+
+        self.assertEqual(locked_names(),['dep1'])
+
+        # New dependency of a dependency (project dependencies unchanged)
+        dep2 = self.temp_dep(name="dep2",version="v1")
+
+        with open(join(config_dir,'dependencies','dep1','abaci.toml'),'a') as f:
+            f.write('[[dependency]]\nname = "dep2"\ngit = \'{git}\'\nversion = "v1"\n'.format(git=dep2['git']))
+
+        fetch_dependencies(config, config_dir, 0)
+
+        self.assertEqual(locked_names(),['dep1','dep2'])
+
+        # Lock file matches again: no git calls
+        lock = abaci.dependencies.read_lock_file(lock_file,config['dependency'])
+
+        self.assertNotEqual(abaci.dependencies.get_locked_dependencies(lock,join(config_dir,'dependencies')),None)
+
+        # New project dependency
+        config['dependency'].append(self.temp_dep(name="dep3",version="v1"))
+
+        dep_list = fetch_dependencies(config, config_dir, 0)
+
+        self.assertEqual(sorted(dep_list.keys()),['dep1','dep2','dep3'])
+        self.assertEqual(locked_names(),['dep1','dep2','dep3'])
+
+
+    def test_dependency_mirror(self):
+        """
+            Test that dependencies are cloned via a shared bare mirror
+
+            root-->dep1@v1
+            
+        """
+        from abaci.dependencies import get_mirror_path
+
+        dep1 = self.new_temp_project(name="dep1",version="v1",deps=None)
+
+        temp_upstream = self.new_temp_project(name="root",version="v1",
+                              deps=[self.temp_dep(name="dep1",version="v1")])
+
+        project_path, config, config_dir = self.clone_and_load_config(temp_upstream,'root')
+
+        fetch_dependencies(config, config_dir, 0)
+
+        # Check the mirror has been created in the cache directory
+        mirror = get_mirror_path(dep1)
+
+        self.assertTrue(mirror.startswith(os.environ['ABACI_CACHE_DIR']))
+        self.assertTrue(git.has_commit(mirror,'v1'))
+
+        # Check the dependency doesn't depend on the mirror once cloned
+        alternates = join(config_dir,'dependencies','dep1','.git','objects','info','alternates')
+
+        self.assertFalse(exists(alternates))
+
+        rmtree(mirror)
+
+        self.assertEquals(git.get_tag(join(config_dir,'dependencies','dep1')), 'v1')
+        self.assertTrue(git.has_commit(join(config_dir,'dependencies','dep1'),'v1'))
@@ -75,6 +75,43 @@ class TestFortranParsing(AbaciUnitTestSuite):
         self.assertIn('test_sub',mods['test_mod']['subroutines'])
         self.assertNotIn('test_asdf',mods['test_mod']['subroutines'])
         self.assertNotIn('lone_sub',mods['test_mod']['subroutines'])
-        
-        
 
+
+    def test_dependency_parsing(self):
+        """
+        Test that module definitions and use statements are found
+        """
+
+        from abaci.fortran_parsing import parse_fortran_dependencies
+
+        fd,fort_file = tempfile.mkstemp()
+        fh = os.fdopen(fd,'w')
+        test_code = """
+        module mod_a
+            use mod_b
+            USE :: mod_c, only: x
+            use, intrinsic :: iso_fortran_env
+            use mod_a2
+            interface
+                module procedure proc
+            end interface
+        end module mod_a
+
+        module mod_a2
+        end module mod_a2
+
+        subroutine lone_sub
+            use mod_d
+            ! use mod_e
+            useful = 1
+        end subroutine lone_sub
+        """
+
+        fh.write(test_code)
+
+        fh.close()
+
+        provides, requires = parse_fortran_dependencies(fort_file)
+
+        self.assertEqual(provides,set(['mod_a','mod_a2']))
+        self.assertEqual(requires,set(['mod_b','mod_c','mod_d']))
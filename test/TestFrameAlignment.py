@@ -0,0 +1,91 @@
+from AbaciUnitTestSuite import AbaciUnitTestSuite
+
+class TestFrameAlignment(AbaciUnitTestSuite):
+
+    def test_align_frames(self):
+        """
+            Test alignment of output frames with reference frames by frame value
+        """
+
+        from abaci.frame_alignment import align_frames
+
+        # Matching frames
+        pairs, unmatched = align_frames([0.0,0.5,1.0],[0.0,0.5,1.0])
+
+        self.assertEqual(pairs,[(0,[(0,1.0)]),(1,[(1,1.0)]),(2,[(2,1.0)])])
+        self.assertEqual(unmatched,[])
+
+        # Interpolated frame
+        pairs, unmatched = align_frames([0.0,0.25,1.0],[0.0,1.0])
+
+        self.assertEqual(pairs[1],(1,[(0,0.75),(1,0.25)]))
+        self.assertEqual(unmatched,[])
+
+        # Truncated output: later reference frames are unmatched
+        pairs, unmatched = align_frames([0.0,0.5,1.0],[0.0,0.5])
+
+        self.assertEqual([i for i, w in pairs],[0,1])
+        self.assertEqual(unmatched,[2])
+
+        # Output starting after the reference
+        pairs, unmatched = align_frames([0.0,1.0],[0.5,1.0])
+
+        self.assertEqual(unmatched,[0])
+
+        # No output frames
+        pairs, unmatched = align_frames([0.0,1.0],[])
+
+        self.assertEqual(pairs,[])
+        self.assertEqual(unmatched,[0,1])
+
+        # Output frame values not increasing (e.g. restarted step): matched by index
+        pairs, unmatched = align_frames([0.0,0.5,1.0],[0.0,0.5,0.5])
+
+        self.assertEqual(pairs,[(0,[(0,1.0)]),(1,[(1,1.0)]),(2,[(2,1.0)])])
+        self.assertEqual(unmatched,[])
+
+        # Modes (e.g. frequency step): matched by index, not frequency
+        pairs, unmatched = align_frames([0.0,10.0,20.0],[0.0,10.5],by_value=False)
+
+        self.assertEqual(pairs,[(0,[(0,1.0)]),(1,[(1,1.0)])])
+        self.assertEqual(unmatched,[2])
+
+
+    def test_combine_frames(self):
+        """
+            Test interpolation of frame data between output frames
+        """
+
+        from abaci.frame_alignment import combine_frames
+
+        data = {0: 2.0, 1: 4.0}
+
+        requested = []
+
+        def get_data(j):
+            requested.append(j)
+            return data[j]
+
+        self.assertEqual(combine_frames([(1,1.0)],get_data),4.0)
+        self.assertEqual(requested,[1])
+
+        self.assertAlmostEqual(combine_frames([(0,0.75),(1,0.25)],get_data),2.5)
+
+
+    def test_summarise_results(self):
+        """
+            Test summary of field differences for a frame
+        """
+
+        from abaci.frame_alignment import summarise_results
+
+        results = [{'rms': 3.0, 'max-abs': 5.0},
+                   {'rms': 4.0, 'max-abs': 6.0},
+                   {'rms': None, 'max-abs': None}]
+
+        rms, max_diff = summarise_results(results)
+
+        self.assertAlmostEqual(rms,(12.5)**0.5)
+        self.assertEqual(max_diff,6.0)
+
+        self.assertEqual(summarise_results(results[2:]),(None,None))
@@ -0,0 +1,248 @@
+import os
+import time
+from os.path import join
+
+from AbaciUnitTestSuite import AbaciUnitTestSuite
+
+_STA_HEADER = """ Abaqus/Standard 2022                  DATE 12-Jan-2024 TIME 10:00:00
+ SUMMARY OF JOB INFORMATION:
+ STEP  INC ATT SEVERE EQUIL TOTAL  TOTAL      STEP       INC OF       DOF    IF
+               DISCON ITERS ITERS  TIME/    TIME/LPF    TIME/LPF    MONITOR RIKS
+               ITERS               FREQ
+"""
+
+_INP = """*Heading
+** Comment
+*Step, name=Step-1, nlgeom=YES
+*Static
+0.1, 2., 1e-05, 0.5
+*End Step
+*Step, name=Step-2
+*Static
+0.1,
+*End Step
+"""
+
+class TestJobProgress(AbaciUnitTestSuite):
+
+    def test_sta_progress(self):
+        """
+            Test incremental parsing of an Abaqus/Standard status file
+        """
+
+        from abaci.JobProgress import StaProgress
+
+        sta_file = join(self.output_dir,'job.sta')
+
+        progress = StaProgress(sta_file)
+
+        # No status file yet
+        self.assertFalse(progress.update())
+
+        with open(sta_file,'w') as f:
+            f.write(_STA_HEADER)
+            f.write('   1     1   1     0     2     2  0.100      0.100      0.1000\n')
+            f.write('   1     2   1U    4     3     7  0.100')
+
+        self.assertTrue(progress.update())
+        self.assertEqual((progress.step,progress.increment,progress.attempt),(1,1,1))
+        self.assertEqual(progress.step_time,0.1)
+        self.assertEqual(progress.cutbacks,0)
+
+        pos = progress.pos
+
+        # Complete the cut-back attempt and add a converged attempt
+        with open(sta_file,'a') as f:
+            f.write('      0.100      0.1000\n')
+            f.write('   1     2   2     0     2     2  0.125      0.125      0.02500\n')
+            f.write(' THE ANALYSIS HAS COMPLETED SUCCESSFULLY\n')
+
+        self.assertTrue(progress.update())
+        self.assertTrue(progress.pos > pos)
+        self.assertEqual((progress.step,progress.increment,progress.attempt),(1,2,2))
+        self.assertEqual(progress.cutbacks,1)
+        self.assertEqual(progress.total_time,0.125)
+        self.assertEqual(progress.inc_size,0.025)
+        self.assertTrue(progress.completed)
+
+        # Nothing new
+        self.assertFalse(progress.update())
+
+
+    def test_step_periods(self):
+        """
+            Test reading step time periods from an input file
+        """
+
+        from abaci.JobProgress import get_step_periods
+
+        inp_file = join(self.output_dir,'job.inp')
+
+        with open(inp_file,'w') as f:
+            f.write(_INP)
+
+        self.assertEqual(get_step_periods(inp_file),[2.0,1.0])
+
+        # Steps without a time period keep their place in the list
+        with open(inp_file,'w') as f:
+            f.write(_INP.replace('*Step, name=Step-2','*Step, name=Frequency, perturbation\n'
+                                                      '*Frequency\n'
+                                                      '10,\n'
+                                                      '*End Step\n'
+                                                      '*Step, name=Step-2'))
+
+        self.assertEqual(get_step_periods(inp_file),[2.0,None,1.0])
+
+        self.assertEqual(get_step_periods(join(self.output_dir,'missing.inp')),None)
+
+
+    def test_progress_table(self):
+        """
+            Test the progress table of running jobs
+        """
+
+        from abaci.JobProgress import ProgressDisplay
+
+        sta_file = join(self.output_dir,'job.sta')
+        inp_file = join(self.output_dir,'job.inp')
+
+        with open(inp_file,'w') as f:
+            f.write(_INP)
+
+        with open(sta_file,'w') as f:
+            f.write(_STA_HEADER)
+            f.write('   1     5   1     0     2     2  1.50       1.50       0.2500\n')
+
+        display = ProgressDisplay(stall_time=300)
+
+        display.add('job','my-job',sta_file,inp_file)
+        display.add('other','other-job',join(self.output_dir,'other.sta'))
+
+        job = display.jobs['job']
+
+        job['progress'].update()
+
+        job['start'] = time.time() - 60
+        job['progress'].last_increment = time.time() - 600
+
+        table = display.get_table()
+
+        display.stop()
+
+        # 1.5 of 3.0 step time in 60s: 60s remaining
+        row = [l for l in table.splitlines() if l.startswith('my-job')][0]
+
+        self.assertIn('0:01:00',row)
+        self.assertIn('stalled',row)
+
+        row = [l for l in table.splitlines() if l.startswith('other-job')][0]
+
+        self.assertIn('starting',row)
+
+
+    def test_progress_display(self):
+        """
+            Test that the progress table is redrawn in place on a terminal, and
+            that otherwise only rows of jobs whose progress changed are printed
+        """
+
+        from StringIO import StringIO
+        from abaci.JobProgress import ProgressDisplay, StaProgress
+
+        sta_file = join(self.output_dir,'job.sta')
+
+        with open(sta_file,'w') as f:
+            f.write(_STA_HEADER)
+            f.write('   1     5   1     0     2     2  1.50       1.50       0.2500\n')
+
+        # Log file: unchanged jobs are not printed again
+        stream = StringIO()
+
+        display = ProgressDisplay(stream=stream,in_place=False)
+
+        display.jobs['job'] = {'name': 'my-job', 'progress': StaProgress(sta_file),
+                               'periods': None, 'start': time.time()}
+        display.jobs['other'] = {'name': 'other-job', 'progress': StaProgress(join(self.output_dir,'other.sta')),
+                                 'periods': None, 'start': time.time()}
+
+        display.display()
+
+        self.assertIn('my-job',stream.getvalue())
+        self.assertIn('other-job',stream.getvalue())
+
+        stream.truncate(0)
+
+        display.display()
+
+        self.assertEqual(stream.getvalue(),'')
+
+        with open(sta_file,'a') as f:
+            f.write('   1     6   1     0     2     2  1.75       1.75       0.2500\n')
+
+        display.display()
+
+        self.assertIn('my-job',stream.getvalue())
+        self.assertNotIn('other-job',stream.getvalue())
+
+        # Terminal: the previous table is cleared before redrawing
+        stream = StringIO()
+
+        display.stream = stream
+        display.in_place = True
+
+        display.display()
+
+        lines = stream.getvalue().count('\n')
+
+        stream.truncate(0)
+
+        display.display()
+
+        self.assertTrue(stream.getvalue().startswith('\r\x1b[{n}A\x1b[J'.format(n=lines)))
+        self.assertIn('other-job',stream.getvalue())
+
+
+    def test_watchdog(self):
+        """
+            Test watchdog rules for aborting diverging jobs
+        """
+
+        from abaci.JobProgress import JobWatchdog
+
+        sta_file = join(self.output_dir,'job.sta')
+
+        rules = {'max-time': None, 'max-cutbacks': 1, 'min-increment': 1e-3, 'stall-time': 300}
+
+        watchdog = JobWatchdog(rules,sta_file)
+
+        self.assertEqual(watchdog.check(),None)
+
+        with open(sta_file,'w') as f:
+            f.write(_STA_HEADER)
+            f.write('   1     1   1     0     2     2  0.100      0.100      0.1000\n')
+            f.write('   1     2   1U    4     3     7  0.100      0.100      0.02500\n')
+
+        self.assertEqual(watchdog.check(),None)
+
+        with open(sta_file,'a') as f:
+            f.write('   1     2   2U    4     3     7  0.100      0.100      0.0006250\n')
+
+        self.assertIn('cutbacks',watchdog.check())
+
+        rules['max-cutbacks'] = None
+
+        self.assertIn('below minimum',watchdog.check())
+
+        rules['min-increment'] = None
+
+        self.assertEqual(watchdog.check(),None)
+
+        watchdog.progress.last_increment = time.time() - 600
+
+        self.assertIn('no new increments',watchdog.check())
+
+        rules['max-time'] = 60
+
+        watchdog.start = time.time() - 120
+
+        self.assertIn('maximum run time',watchdog.check())
@@ -0,0 +1,457 @@
+import unittest
+import os
+import sys
+import time
+import argparse
+import subprocess
+import cPickle as pkl
+from datetime import datetime
+
+from AbaciUnitTestSuite import AbaciUnitTestSuite
+
+class MockJob:
+    """Stand-in for AbaqusJob which runs a short sleep instead of Abaqus"""
+
+    running = []
+    max_cpus = 0
+    launch_order = []
+
+    def __init__(self,name,sleep_time,cpus=None,memory=None,mp_mode='threads',watchdog=None):
+
+        self.name = name
+        self.sleep_time = sleep_time
+        self.duration = None
+        self.cpus = cpus
+        self.memory = memory
+        self.mp_mode = mp_mode
+        self.watchdog = watchdog
+        self.nproc = None
+        self.cpu_list = None
+
+    def get_history_key(self,nproc):
+
+        return (self.name, nproc)
+
+    def get_cpus(self,nproc):
+
+        return self.cpus or nproc
+
+    def launch_job(self,nproc,lib_dir,cpu_list=None):
+
+        self.nproc = nproc
+        self.cpu_list = cpu_list
+        self.start_time = datetime.now()
+
+        MockJob.launch_order.append(self.name)
+
+        self.p = subprocess.Popen([sys.executable,'-c',
+                    'import time; time.sleep({t})'.format(t=self.sleep_time)])
+
+        MockJob.running.append(self)
+        MockJob.max_cpus = max(MockJob.max_cpus,sum(j.nproc for j in MockJob.running))
+
+    def poll(self):
+
+        is_running = self.p.poll() is None
+
+        if not is_running and self in MockJob.running:
+            MockJob.running.remove(self)
+            self.duration = datetime.now() - self.start_time
+
+        return is_running
+
+    def wait(self,verbose):
+
+        return self.p.wait()
+
+    def get_sta_file(self):
+
+        return os.path.join(os.path.dirname(__file__),'{name}.sta'.format(name=self.name))
+
+    def terminate_job(self,verbose):
+
+        if self.poll():
+            self.p.terminate()
+
+
+class MockSubmitJob:
+    """Stand-in for AbaqusJob whose job script records where it was run"""
+
+    def __init__(self,output_dir,name,time='01:00:00',partition=None):
+
+        self.name = name
+        self.job_dir = os.path.join(output_dir,name)
+        self.job_script = None
+        self.time = time
+        self.partition = partition
+        self.cpus = None
+
+    def prepare_job(self,lib_dir):
+
+        os.mkdir(self.job_dir)
+
+        with open(os.path.join(self.job_dir,'abaci-cache.pkl'),'w') as f:
+            pkl.dump(self,f)
+
+    def get_cluster_nproc(self):
+
+        return 2
+
+    def get_cpus(self,nproc):
+
+        return self.cpus or nproc
+
+    def spool_job_script(self,env_modules):
+
+        self.job_script = os.path.join(self.job_dir,'sljob')
+
+        with open(self.job_script,'w') as f:
+            f.write('echo {name} > ran\n'.format(name=self.name))
+
+    def get_sbatch_options(self):
+
+        return {'time': self.time, 'nodes': 1, 'partition': self.partition}
+
+
+class TestJobs(AbaciUnitTestSuite):
+
+    def get_args(self,njob=1,nproc=1,cpus=4,mem=None):
+        """Returns run command arguments for testing purposes"""
+
+        return argparse.Namespace(njob=njob,nproc=nproc,cpus=cpus,mem=mem,
+                                  pin=False,verbose=-1,screen_output=False,progress=False)
+
+
+    def setUp(self):
+
+        super(TestJobs,self).setUp()
+
+        MockJob.running = []
+        MockJob.max_cpus = 0
+        MockJob.launch_order = []
+
+
+    def test_run_jobs_status(self):
+        """
+            Test that job statuses are returned in the original job order
+        """
+
+        from abaci.jobs import run_jobs
+
+        jobs = [MockJob('a',0.2),MockJob('b',0.01),MockJob('c',0.1)]
+
+        stats = run_jobs(self.get_args(njob=3),None,jobs)
+
+        self.assertEqual(stats,[0,0,0])
+
+
+    def test_run_jobs_on_complete(self):
+        """
+            Test that the completion callback is called as each job finishes
+        """
+
+        from abaci.jobs import run_jobs
+
+        jobs = [MockJob('a',0.5),MockJob('b',0.01)]
+
+        completed = []
+
+        def on_complete(job,stat):
+            completed.append((job.name, stat, [j.name for j in MockJob.running]))
+
+        run_jobs(self.get_args(njob=2),None,jobs,on_complete=on_complete)
+
+        # Job 'b' completes first, while 'a' is still running
+        self.assertEqual(completed,[('b',0,['a']),('a',0,[])])
+
+
+    def test_run_jobs_cpu_budget(self):
+        """
+            Test that concurrent jobs are packed within the CPU budget
+        """
+
+        from abaci.jobs import run_jobs
+
+        jobs = [MockJob('a',0.2,cpus=3),MockJob('b',0.2,cpus=2),
+                MockJob('c',0.2,cpus=1),MockJob('d',0.2)]
+
+        stats = run_jobs(self.get_args(njob=4,nproc=2,cpus=4),None,jobs)
+
+        self.assertEqual(stats,[0,0,0,0])
+        self.assertLessEqual(MockJob.max_cpus,4)
+
+        # Check job-specific cpus take precedence over nproc
+        self.assertEqual([j.nproc for j in jobs],[3,2,1,2])
+
+
+    def test_run_jobs_oversized(self):
+        """
+            Test that a job requesting more CPUs than the budget still runs
+        """
+
+        from abaci.jobs import run_jobs
+
+        jobs = [MockJob('a',0.01,cpus=8),MockJob('b',0.01,cpus=1)]
+
+        stats = run_jobs(self.get_args(njob=2,cpus=4),None,jobs)
+
+        self.assertEqual(stats,[0,0])
+        self.assertEqual(MockJob.max_cpus,8)
+
+
+    def test_run_jobs_memory_budget(self):
+        """
+            Test that concurrent jobs are packed within the memory budget
+        """
+
+        from abaci.jobs import run_jobs
+
+        jobs = [MockJob('a',0.2,memory=3000),MockJob('b',0.2,memory=3000)]
+
+        stats = run_jobs(self.get_args(njob=2,cpus=4,mem='4g'),None,jobs)
+
+        self.assertEqual(stats,[0,0])
+
+        # (Jobs can't run concurrently within 4G)
+        self.assertEqual(MockJob.max_cpus,1)
+
+
+    def test_run_jobs_history(self):
+        """
+            Test that jobs are ordered longest-first from runtime history
+        """
+
+        from abaci.jobs import run_jobs, load_job_history
+
+        jobs = [MockJob('short',0.01),MockJob('long',0.3),MockJob('medium',0.1)]
+
+        stats = run_jobs(self.get_args(),None,jobs,self.output_dir)
+
+        self.assertEqual(stats,[0,0,0])
+
+        # First run: no history so original order
+        self.assertEqual(MockJob.launch_order,['short','long','medium'])
+
+        history = load_job_history(self.output_dir)
+
+        self.assertIn(('long',1),history)
+        self.assertGreater(history[('long',1)],history[('short',1)])
+
+        MockJob.launch_order = []
+
+        jobs.append(MockJob('new',0.01))
+
+        stats = run_jobs(self.get_args(),None,jobs,self.output_dir)
+
+        self.assertEqual(stats,[0,0,0,0])
+
+        # Second run: new jobs first, then longest-expected-first
+        self.assertEqual(MockJob.launch_order,['new','long','medium','short'])
+
+        history = load_job_history(self.output_dir)
+
+        self.assertIn(('new',1),history)
+
+
+    def test_parse_memory(self):
+        """
+            Test conversion of memory sizes to megabytes
+        """
+
+        from abaci.utils import parse_memory
+
+        self.assertEqual(parse_memory(None),None)
+        self.assertEqual(parse_memory(100),100)
+        self.assertEqual(parse_memory('4000m'),4000)
+        self.assertEqual(parse_memory('4000'),4000)
+        self.assertEqual(parse_memory('8G'),8192)
+        self.assertEqual(parse_memory('1gb'),1024)
+
+        with self.assertRaises(ValueError):
+            parse_memory('lots')
+
+
+    def test_submit_job_arrays(self):
+        """
+            Test grouping of jobs with the same cluster settings into SLURM job arrays
+        """
+
+        from abaci.jobs import submit_jobs
+
+        jobs = [MockSubmitJob(self.output_dir,'a'),MockSubmitJob(self.output_dir,'b',time='02:00:00'),
+                MockSubmitJob(self.output_dir,'c')]
+
+        submit_jobs(None,jobs,interactive=False,no_submit=True)
+
+        array_dir = os.path.join(self.output_dir,'slurm-array_0')
+
+        self.assertFalse(os.path.exists(os.path.join(self.output_dir,'slurm-array_1')))
+
+        with open(os.path.join(array_dir,'job-dirs.txt')) as f:
+            self.assertEqual(f.read().split(),[jobs[0].job_dir,jobs[2].job_dir])
+
+        with open(os.path.join(array_dir,'sljob')) as f:
+            script = f.read()
+
+        self.assertIn('#SBATCH --array=0-1',script)
+        self.assertIn('#SBATCH --time=01:00:00',script)
+
+        # Run the second array task
+        env = dict(os.environ,SLURM_ARRAY_JOB_ID='7',SLURM_ARRAY_TASK_ID='1')
+
+        subprocess.check_call(['sh',os.path.join(array_dir,'sljob')],env=env)
+
+        self.assertFalse(os.path.exists(os.path.join(jobs[0].job_dir,'ran')))
+
+        with open(os.path.join(jobs[2].job_dir,'ran')) as f:
+            self.assertEqual(f.read().strip(),'c')
+
+        self.assertTrue(os.path.exists(os.path.join(jobs[2].job_dir,'slurm-7_1.out')))
+
+
+    def test_submit_bundle(self):
+        """
+            Test preparation of a single SLURM allocation for running many jobs
+        """
+
+        from abaci.jobs import submit_jobs, load_bundle
+
+        jobs = [MockSubmitJob(self.output_dir,'a'),MockSubmitJob(self.output_dir,'b',time='30:00'),
+                MockSubmitJob(self.output_dir,'c',partition='other')]
+
+        jobs[1].cpus = 3
+
+        submit_jobs(None,jobs,interactive=False,no_submit=True,bundle=5)
+
+        bundle_dir = os.path.join(self.output_dir,'slurm-bundle_0')
+
+        with open(os.path.join(bundle_dir,'sljob')) as f:
+            script = f.read()
+
+        # (Both jobs run at once within the allocation)
+        self.assertIn('#SBATCH --cpus-per-task=5',script)
+        self.assertIn('#SBATCH --time=01:00:00',script)
+        self.assertIn('--bundle-dir {d}'.format(d=bundle_dir),script)
+        self.assertNotIn('--array',script)
+        self.assertNotIn('--partition',script)
+
+        bundle_jobs, output_dir = load_bundle(bundle_dir)
+
+        self.assertEqual([j.name for j in bundle_jobs],['a','b'])
+        self.assertEqual([j.cpus for j in bundle_jobs],[2,3])
+        self.assertEqual(output_dir,os.path.abspath(self.output_dir))
+
+        # Jobs on a different partition are bundled separately
+        with open(os.path.join(self.output_dir,'slurm-bundle_1','sljob')) as f:
+            self.assertIn('#SBATCH --partition=other',f.read())
+
+        self.assertEqual([j.name for j in load_bundle(os.path.join(self.output_dir,'slurm-bundle_1'))[0]],['c'])
+
+        # Jobs needing more CPUs than the allocation
+        with self.assertRaises(Exception):
+            submit_jobs(None,[MockSubmitJob(self.output_dir,'d')],interactive=False,no_submit=True,bundle=1)
+
+
+    def test_bundle_time(self):
+        """
+            Test estimation of the time limit for jobs run within an allocation
+        """
+
+        from abaci.jobs import get_bundle_time
+        from abaci.slurm import format_time
+
+        # All jobs at once
+        self.assertEqual(get_bundle_time([2,3],[3600,1800],5),3600)
+
+        # Second job waits for the first
+        self.assertEqual(get_bundle_time([2,3],[3600,1800],4),5400)
+
+        # Short jobs fill in behind a long job (first-fit)
+        self.assertEqual(get_bundle_time([2,1,1,1],[3600,600,600,600],3),3600)
+
+        self.assertEqual(format_time(5400),'01:30:00')
+        self.assertEqual(format_time(90000),'1-01:00:00')
+
+
+    def test_parse_duration(self):
+        """
+            Test conversion of durations to seconds
+        """
+
+        from abaci.utils import parse_duration
+
+        self.assertEqual(parse_duration(None),None)
+        self.assertEqual(parse_duration(5),300)
+        self.assertEqual(parse_duration('5'),300)
+        self.assertEqual(parse_duration('01:30:00'),5400)
+        self.assertEqual(parse_duration('2:30'),150)
+        self.assertEqual(parse_duration('1-12'),129600)
+        self.assertEqual(parse_duration('2-00:30:00'),174600)
+
+        with self.assertRaises(ValueError):
+            parse_duration('1h')
+
+
+    def test_run_jobs_watchdog(self):
+        """
+            Test that jobs breaking their watchdog rules are aborted,
+            freeing their slot for queued jobs
+        """
+
+        import abaci.jobs
+        from abaci.jobs import run_jobs
+
+        rules = {'max-time': 0.2, 'max-cutbacks': None, 'min-increment': None, 'stall-time': None}
+
+        jobs = [MockJob('stuck',30,watchdog=rules),MockJob('ok',0.01)]
+
+        interval = abaci.jobs._WATCHDOG_INTERVAL
+
+        abaci.jobs._WATCHDOG_INTERVAL = 0.05
+
+        try:
+
+            t0 = time.time()
+
+            stats = run_jobs(self.get_args(njob=1),None,jobs)
+
+        finally:
+
+            abaci.jobs._WATCHDOG_INTERVAL = interval
+
+        self.assertLess(time.time() - t0,10)
+        self.assertNotEqual(stats[0],0)
+        self.assertEqual(stats[1],0)
+        self.assertEqual(MockJob.launch_order,['stuck','ok'])
+
+
+    def test_find_job_dirs(self):
+        """
+            Test discovery of job directories for post-processing
+        """
+
+        from abaci.jobs import find_job_dirs
+
+        for name in ['job-a','job-b',os.path.join('nested','job-c')]:
+
+            job_dir = os.path.join(self.output_dir,name)
+            os.makedirs(os.path.join(job_dir,'lib'))
+            open(os.path.join(job_dir,'abaci-cache.pkl'),'w').close()
+
+        os.makedirs(os.path.join(self.output_dir,'lib'))
+
+        # Parent directory
+        job_dirs = find_job_dirs([self.output_dir])
+
+        self.assertEqual([os.path.relpath(d,self.output_dir) for d in job_dirs],
+                         ['job-a','job-b',os.path.join('nested','job-c')])
+
+        # Glob pattern and duplicate directories
+        job_dirs = find_job_dirs([os.path.join(self.output_dir,'job-*'),
+                                  os.path.join(self.output_dir,'job-a')])
+
+        self.assertEqual([os.path.relpath(d,self.output_dir) for d in job_dirs],
+                         ['job-a','job-b'])
+
+        with self.assertRaises(Exception):
+            find_job_dirs([os.path.join(self.output_dir,'missing')])
@@ -0,0 +1,86 @@
+import unittest
+import tempfile
+import os
+from os.path import join, exists
+
+from AbaciUnitTestSuite import AbaciUnitTestSuite
+
+class TestObjectCache(AbaciUnitTestSuite):
+
+    def new_file(self,name,contents):
+        """Create a file with contents in the output directory"""
+
+        path = join(self.output_dir,name)
+
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+
+        with open(path,'w') as f:
+            f.write(contents)
+
+        return path
+
+
+    def test_store_fetch(self):
+        """
+            Test that stored files are restored on a cache hit
+        """
+
+        from abaci.ObjectCache import ObjectCache
+
+        cache = ObjectCache(join(self.output_dir,'cache'),max_size=1)
+
+        key = cache.get_key(['gfortran',['-O3'],'abc'])
+
+        self.assertFalse(cache.fetch(key,self.output_dir))
+
+        self.new_file('a-std.o','object')
+        self.new_file(join('mod','mod_a.mod'),'module')
+
+        cache.store(key,self.output_dir,['a-std.o',join('mod','mod_a.mod')])
+
+        dest_dir = tempfile.mkdtemp()
+
+        self.assertTrue(cache.fetch(key,dest_dir))
+
+        with open(join(dest_dir,'a-std.o'),'r') as f:
+            self.assertEqual(f.read(),'object')
+
+        with open(join(dest_dir,'mod','mod_a.mod'),'r') as f:
+            self.assertEqual(f.read(),'module')
+
+        self.assertEqual(cache.hits,1)
+        self.assertEqual(cache.misses,1)
+
+        # Different key parts give a different key
+        self.assertNotEqual(key,cache.get_key(['gfortran',['-O0'],'abc']))
+
+
+    def test_trim(self):
+        """
+            Test least-recently-used eviction
+        """
+
+        from abaci.ObjectCache import ObjectCache
+
+        cache = ObjectCache(join(self.output_dir,'cache'),max_size=1)
+
+        self.new_file('obj','x'*400*1024)
+
+        keys = [cache.get_key([i]) for i in range(3)]
+
+        for i, key in enumerate(keys):
+
+            cache.store(key,self.output_dir,['obj'])
+
+            manifest = join(cache.get_entry_dir(key),'manifest.json')
+            os.utime(manifest,(i,i))
+
+        # Use the oldest entry
+        self.assertTrue(cache.fetch(keys[0],tempfile.mkdtemp()))
+
+        cache.trim()
+
+        self.assertTrue(exists(cache.get_entry_dir(keys[0])))
+        self.assertFalse(exists(cache.get_entry_dir(keys[1])))
+        self.assertTrue(exists(cache.get_entry_dir(keys[2])))
@@ -0,0 +1,91 @@
+import os
+import time
+from os.path import join
+from StringIO import StringIO
+
+from AbaciUnitTestSuite import AbaciUnitTestSuite
+
+class TestOutputTailer(AbaciUnitTestSuite):
+
+    def wait_for_output(self,stream,text,timeout=5):
+        """Wait until text appears in the tailer output"""
+
+        start = time.time()
+
+        while text not in stream.getvalue() and time.time() - start < timeout:
+
+            time.sleep(0.01)
+
+        return text in stream.getvalue()
+
+
+    def test_tail_jobs(self):
+        """
+            Test that output lines are printed with job name prefixes as they are written
+        """
+
+        from abaci.OutputTailer import OutputTailer
+
+        stream = StringIO()
+
+        sta_file = join(self.output_dir,'job-a.sta')
+        msg_file = join(self.output_dir,'job-b.msg')
+
+        with OutputTailer(flush_interval=0.01,stream=stream) as tailer:
+
+            tailer.add('a','job-a',[sta_file])
+            tailer.add('b','job-b',[msg_file])
+
+            # Files are picked up once created
+            with open(sta_file,'w') as f:
+                f.write('STEP 1 INC 1\n')
+
+            self.assertTrue(self.wait_for_output(stream,'[job-a sta] STEP 1 INC 1\n'))
+
+            with open(msg_file,'w') as f:
+                f.write('first message\nincomplete')
+
+            self.assertTrue(self.wait_for_output(stream,'[job-b msg] first message\n'))
+
+            # Incomplete lines are held back until finished
+            self.assertNotIn('incomplete',stream.getvalue())
+
+            with open(msg_file,'a') as f:
+                f.write(' line\n')
+
+            self.assertTrue(self.wait_for_output(stream,'[job-b msg] incomplete line\n'))
+
+            # Remaining output is printed when a job is removed
+            with open(sta_file,'a') as f:
+                f.write('COMPLETED')
+
+            tailer.remove('a')
+
+            self.assertIn('[job-a sta] COMPLETED\n',stream.getvalue())
+
+
+    def test_rate_limit(self):
+        """
+            Test that excess output is summarised instead of printed
+        """
+
+        from abaci.OutputTailer import OutputTailer
+
+        stream = StringIO()
+
+        dat_file = join(self.output_dir,'job.dat')
+
+        with open(dat_file,'w') as f:
+            f.write(''.join('line {i}\n'.format(i=i) for i in range(1000)))
+
+        with OutputTailer(flush_interval=0.01,max_rate=10,stream=stream) as tailer:
+
+            tailer.add('job','job',[dat_file])
+
+            self.assertTrue(self.wait_for_output(stream,'lines not shown'))
+
+        output = stream.getvalue()
+
+        # The most recent lines are shown
+        self.assertIn('[job dat] line 999\n',output)
+        self.assertNotIn('[job dat] line 0\n',output)
@@ -0,0 +1,78 @@
+import unittest
+import os
+from os.path import join
+
+from AbaciUnitTestSuite import AbaciUnitTestSuite
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+class TestReference(AbaciUnitTestSuite):
+
+    def write_reference(self,path):
+        """Write some reference data"""
+
+        from abaci.reference import ReferenceWriter
+
+        with ReferenceWriter(path) as ref:
+
+            ref.add('Step-1',0,'S',np.arange(6.0).reshape(2,3))
+            ref.add('Step-1',3,'S',np.ones((2,3)))
+            ref.add('Step-1',3,'SDV1',np.array([1.0,2.0]))
+
+
+    def check_reference(self,path):
+        """Check reference data written by write_reference"""
+
+        from abaci.reference import ReferenceReader
+
+        with ReferenceReader(path) as ref:
+
+            self.assertEqual(ref.steps(),['Step-1'])
+            self.assertEqual(ref.frames('Step-1'),[0,3])
+            self.assertEqual(sorted(ref.fields('Step-1',3)),['S','SDV1'])
+
+            self.assertTrue(ref.has('Step-1',3,'SDV1'))
+            self.assertFalse(ref.has('Step-1',0,'SDV1'))
+            self.assertFalse(ref.has('Step-1',1))
+            self.assertFalse(ref.has('Step-2'))
+
+            self.assertTrue(np.array_equal(ref.get('Step-1',0,'S'),np.arange(6.0).reshape(2,3)))
+            self.assertTrue(np.array_equal(ref.get('Step-1',3,'SDV1'),np.array([1.0,2.0])))
+
+
+    @unittest.skipUnless(np is not None,"numpy not available")
+    def test_formats(self):
+        """
+            Test writing and reading each reference format
+        """
+
+        for name in ['ref.pkl','ref.npz','ref']:
+
+            path = join(self.output_dir,name)
+
+            self.write_reference(path)
+
+            self.check_reference(path)
+
+
+    @unittest.skipUnless(np is not None,"numpy not available")
+    def test_convert(self):
+        """
+            Test conversion of legacy pickle references
+        """
+
+        from abaci.reference import convert_reference
+
+        self.write_reference(join(self.output_dir,'ref.pkl'))
+
+        convert_reference(join(self.output_dir,'ref.pkl'),join(self.output_dir,'ref.npz'))
+        convert_reference(join(self.output_dir,'ref.npz'),join(self.output_dir,'ref'))
+
+        self.check_reference(join(self.output_dir,'ref'))
+
+        # Don't overwrite existing references
+        with self.assertRaises(Exception):
+            convert_reference(join(self.output_dir,'ref.pkl'),join(self.output_dir,'ref'))
@@ -0,0 +1,37 @@
+import os
+import sys
+import json
+import subprocess
+
+from AbaciUnitTestSuite import AbaciUnitTestSuite
+
+class TestStartup(AbaciUnitTestSuite):
+
+    def get_imported_modules(self,args):
+        """Run abaci with args in a new interpreter and return the abaci/redist modules imported"""
+
+        bench_script = os.path.join(self.root_dir,'test','bench_startup.py')
+
+        output = subprocess.check_output([sys.executable,bench_script,'--modules']+args,
+                                         cwd=self.output_dir)
+
+        return set(json.loads(output))
+
+
+    def test_lazy_imports(self):
+        """
+            Test that subcommands don't import modules they don't use
+        """
+
+        heavy = set(['abaci.compile','abaci.tests','abaci.dependencies','abaci.config',
+                     'redist.toml','redist.schema','redist.tabulate'])
+
+        modules = self.get_imported_modules(['--help'])
+
+        self.assertIn('abaci.cli',modules)
+        self.assertEquals(modules & (heavy | set(['abaci.jobs'])),set())
+
+        modules = self.get_imported_modules(['post',self.output_dir])
+
+        self.assertIn('abaci.jobs',modules)
+        self.assertEquals(modules & heavy,set())
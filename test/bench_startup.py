@@ -0,0 +1,143 @@
+"""
+Startup benchmark for the abaci command line
+
+usage: python test/bench_startup.py [-n REPEAT] [--python CMD]
+
+Times cold-ish starts of abaci for subcommands that shouldn't need the
+compilation, job or dependency modules, and lists the abaci/redist modules
+each one imports. Run with the interpreter used by the launcher
+(e.g. --python "abaqus python") for representative timings.
+"""
+import os
+import sys
+import json
+import time
+import shlex
+import shutil
+import argparse
+import tempfile
+import subprocess
+
+bench_script = os.path.realpath(__file__)
+
+root_dir = os.path.join(os.path.dirname(bench_script),os.pardir)
+
+abaci_main = os.path.realpath(os.path.join(root_dir,'src','abaci_main.py'))
+
+# Subcommands to benchmark
+scenarios = [['--help'],
+             ['show','config'],
+             ['post','.']]
+
+# Target cold start time (seconds) for these subcommands, excluding interpreter startup
+target_time = 0.1
+
+
+def list_modules(args):
+    """Run abaci in this process and print the abaci/redist modules it imported (as json)"""
+
+    sys.path.insert(0,os.path.dirname(abaci_main))
+
+    sys.argv = ['abaci'] + args
+
+    devnull = open(os.devnull,'w')
+    stdout, stderr = sys.stdout, sys.stderr
+    sys.stdout = sys.stderr = devnull
+
+    try:
+
+        import abaci_main as main_module
+
+        main_module.main()
+
+    except (SystemExit, Exception):
+
+        pass
+
+    finally:
+
+        sys.stdout, sys.stderr = stdout, stderr
+
+    modules = sorted(m for m in sys.modules
+                       if m.split('.')[0] in ('abaci','redist') and sys.modules[m] is not None)
+
+    print(json.dumps(modules))
+
+
+def time_command(cmd,repeat):
+    """Return the best wall time of repeat runs of a command"""
+
+    devnull = open(os.devnull,'w')
+
+    times = []
+
+    for i in range(repeat):
+
+        t0 = time.time()
+
+        subprocess.call(cmd,stdout=devnull,stderr=devnull)
+
+        times.append(time.time() - t0)
+
+    return min(times)
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description='Benchmark abaci startup time')
+
+    parser.add_argument('-n',dest='repeat',type=int,default=10,
+                        help='number of repeats per subcommand (default: 10)')
+
+    parser.add_argument('--python',dest='python',type=str,default=sys.executable,
+                        help='python command to benchmark with (default: this interpreter)')
+
+    parser.add_argument('--modules',dest='modules',nargs=argparse.REMAINDER,
+                        help=argparse.SUPPRESS)
+
+    args = parser.parse_args()
+
+    if args.modules is not None:
+
+        list_modules(args.modules)
+
+        return
+
+    python = shlex.split(args.python)
+
+    # A minimal project for subcommands that load a config file
+    project_dir = tempfile.mkdtemp()
+
+    with open(os.path.join(project_dir,'abaci.toml'),'w') as f:
+        f.write("name = 'bench'\n")
+
+    cwd = os.getcwd()
+    os.chdir(project_dir)
+
+    try:
+
+        baseline = time_command(python + ['-c','pass'],args.repeat)
+
+        print('Interpreter startup: {t:.3f}s'.format(t=baseline))
+        print('Target: {t:.3f}s above interpreter startup\n'.format(t=target_time))
+
+        for scenario in scenarios:
+
+            t = time_command(python + [abaci_main] + scenario,args.repeat)
+
+            modules = json.loads(subprocess.check_output(python + [bench_script,'--modules'] + scenario).decode())
+
+            print('abaci {cmd}: {t:.3f}s ({d:+.3f}s) {ok}'.format(cmd=' '.join(scenario),t=t,d=t-baseline,
+                                                    ok='' if t - baseline <= target_time else '(!) above target'))
+
+            print('  imports: {m}\n'.format(m=', '.join(modules)))
+
+    finally:
+
+        os.chdir(cwd)
+
+        shutil.rmtree(project_dir,ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
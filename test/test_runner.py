@@ -20,5 +20,18 @@ if __name__ == '__main__':
     from TestDependencies import TestDependencies
     from TestConfig import TestConfig
     from TestFortranParsing import TestFortranParsing
+    from TestChildWatcher import TestChildWatcher
+    from TestJobs import TestJobs
+    from TestContentStore import TestContentStore
+    from TestBuildGraph import TestBuildGraph
+    from TestCompile import TestCompile
+    from TestObjectCache import TestObjectCache
+    from TestReference import TestReference
+    from TestCheckResults import TestCheckResults
+    from TestStartup import TestStartup
+    from TestAbaqus import TestAbaqus
+    from TestOutputTailer import TestOutputTailer
+    from TestJobProgress import TestJobProgress
+    from TestFrameAlignment import TestFrameAlignment
 
     unittest.main()
\ No newline at end of file